@@ -0,0 +1,52 @@
+'''
+On-disk checkpoint store for iteration results.
+
+Each completed iteration's (output, result) is written to its own file in the checkpoint directory as soon as the
+iteration finishes, so that a run that is interrupted (solver failure, crash, OOM kill) can be restarted and skip the
+iterations that already completed:
+
+    store = CheckpointStore("ireland_year.checkpoint")
+    output, result = all_island_iterations.model(case, solver, checkpoint = store)
+
+Files are written to a temporary name and renamed into place, so a store never holds a partially written iteration.
+'''
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+
+class CheckpointStore:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents = True, exist_ok = True)
+
+    def _path(self, iteration):
+        #Iteration labels may be timestamps or contain characters unsuitable for filenames
+        return self.directory / (hashlib.sha1(repr(iteration).encode()).hexdigest() + ".pkl")
+
+    def __contains__(self, iteration):
+        return self._path(iteration).exists()
+
+    def save(self, iteration, output, result):
+        '''Writes the output and result of a completed iteration.'''
+        path = self._path(iteration)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((iteration, output, result), f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load(self, iteration):
+        '''Returns the (output, result) saved for an iteration.'''
+        with open(self._path(iteration), "rb") as f:
+            _, output, result = pickle.load(f)
+        return output, result
+
+    def completed(self):
+        '''Returns the iterations held in the store.'''
+        iterations = []
+        for path in self.directory.glob("*.pkl"):
+            with open(path, "rb") as f:
+                iterations.append(pickle.load(f)[0])
+        return iterations
@@ -0,0 +1,138 @@
+'''
+Curtailment and constraint volumes of the DCOPF outputs of a run, attributed over all iterations at once.
+
+The cached PGmax, PG_MARKET, PG_SECURE and pG values of each iteration's DCOPF InstanceCache are gathered into
+iterations x generators arrays, from which the volumes of every iteration are calculated together:
+ - V_Surplus: the non-synchronous availability not dispatched by the market, PGmax - PG_MARKET.
+ - V_SNSP: the non-synchronous market dispatch above the SNSP limit of the total market dispatch.
+ - V_MUON: the remainder of the redispatch of the non-synchronous generators by the secure stage,
+   PG_MARKET - PG_SECURE, less V_SNSP.
+ - V_Constraint: the redispatch of the non-synchronous generators by the DCOPF stage, PG_SECURE - pG.
+V_MUON is divided between the non-synchronous generators pro-rata to their market dispatch (the share x_MUON), and
+V_SNSP as the share x_SNSP, 1 - SNSP_LIMIT, of their market dispatch. V_Surplus and V_Constraint are given by
+generator directly. Synchronous generators are given zero volumes. The results are written back to each
+InstanceCache, as the V_*, x_* and per generator v_*_g attributes read by pyomo_print:
+
+    volumes = curtailment.attribute(output)
+    volumes.to_dataframe()
+'''
+
+from dataclasses import dataclass
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+#Limit on the share of non-synchronous generation in the market dispatch
+SNSP_LIMIT = 0.75
+
+
+def _divide(a, b):
+    '''a / b, with zero where b is not positive.'''
+    return np.divide(a, b, out = np.zeros(np.broadcast(a, b).shape), where = b > 0)
+
+
+@dataclass(slots=True)
+class CurtailmentArrays:
+    '''
+    The DCOPF values the volumes are calculated from, as iterations x generators arrays, and the non-synchronous
+    generators as a mask over the generators (the generator sets being those of the instance, so the same in every
+    iteration).
+    '''
+    iterations: list
+    generators: list
+    non_synchronous: np.ndarray
+    PGmax: np.ndarray
+    PG_MARKET: np.ndarray
+    PG_SECURE: np.ndarray
+    pG: np.ndarray
+
+    @classmethod
+    def capture(cls, caches, iterations = None):
+        '''Gathers the arrays from a list of DCOPF InstanceCaches (of the iterations given, or numbered in order).'''
+        generators = list(caches[0].G)
+        values = itemgetter(*generators)
+        shape = (len(caches), len(generators))
+        arrays = {name: np.array([values(getattr(cache, name)) for cache in caches], dtype = float).reshape(shape)
+                  for name in ("PGmax", "PG_MARKET", "PG_SECURE", "pG")}
+        non_synchronous = np.isin(generators, list(caches[0].G_ns))
+        return cls(list(iterations) if iterations is not None else list(range(len(caches))), generators,
+                   non_synchronous, **arrays)
+
+
+@dataclass(slots=True)
+class CurtailmentVolumes:
+    '''The volumes of each iteration (arrays over iterations) and generator (iterations x generators arrays).'''
+    iterations: list
+    generators: list
+    non_synchronous: np.ndarray
+    V_Surplus: np.ndarray
+    V_SNSP: np.ndarray
+    x_SNSP: np.ndarray
+    V_MUON: np.ndarray
+    x_MUON: np.ndarray
+    V_Constraint: np.ndarray
+    x_Constraint: np.ndarray
+    v_Surplus_g: np.ndarray
+    v_SNSP_g: np.ndarray
+    v_MUON_g: np.ndarray
+    v_Constraint_g: np.ndarray
+
+    def apply(self, caches):
+        '''Sets the volumes of each iteration on its InstanceCache, in the same order as the arrays.'''
+        for t, cache in enumerate(caches):
+            for name in ("V_Surplus", "V_SNSP", "x_SNSP", "V_MUON", "x_MUON", "V_Constraint"):
+                setattr(cache, name, float(getattr(self, name)[t]))
+            for name in ("v_Surplus_g", "v_SNSP_g", "v_MUON_g", "v_Constraint_g"):
+                setattr(cache, name, dict(zip(self.generators, getattr(self, name)[t].tolist())))
+            cache.x_Constraint = {g: x for g, x, n in zip(self.generators, self.x_Constraint[t].tolist(),
+                                                          self.non_synchronous) if n}
+
+    def to_dataframe(self):
+        '''Return the volumes of each iteration as a row.'''
+        return pd.DataFrame({name: getattr(self, name)
+                             for name in ("V_Surplus", "V_SNSP", "x_SNSP", "V_MUON", "x_MUON", "V_Constraint")},
+                            index = pd.Index(self.iterations, name = "iteration"))
+
+
+def volumes(arrays):
+    '''Calculates the CurtailmentVolumes of CurtailmentArrays (see the module docstring).'''
+    ns = arrays.non_synchronous
+    market = arrays.PG_MARKET
+    surplus = np.where(ns, arrays.PGmax - market, 0)
+    constraint = np.where(ns, arrays.PG_SECURE - arrays.pG, 0)
+    ns_market = np.where(ns, market, 0).sum(axis = 1)
+
+    V_SNSP = np.maximum(0, ns_market - SNSP_LIMIT*market.sum(axis = 1))
+    #The share of SNSP curtailment, sum(G_ns)/sum(G_ns) - SNSP_LIMIT, where there is non-synchronous market dispatch
+    x_SNSP = np.where(ns_market > 0, 1 - SNSP_LIMIT, 0)
+    V_MUON = np.where(ns, market - arrays.PG_SECURE, 0).sum(axis = 1) - V_SNSP
+    x_MUON = _divide(V_MUON, ns_market)
+
+    return CurtailmentVolumes(arrays.iterations, arrays.generators, ns,
+                              V_Surplus = surplus.sum(axis = 1),
+                              V_SNSP = V_SNSP,
+                              x_SNSP = x_SNSP,
+                              V_MUON = V_MUON,
+                              x_MUON = x_MUON,
+                              V_Constraint = constraint.sum(axis = 1),
+                              x_Constraint = np.where(ns, _divide(arrays.PG_SECURE - arrays.pG, arrays.PG_SECURE), 0),
+                              v_Surplus_g = surplus,
+                              v_SNSP_g = np.where(ns, market*x_SNSP[:, None], 0),
+                              v_MUON_g = np.where(ns, market*x_MUON[:, None], 0),
+                              v_Constraint_g = constraint)
+
+
+def attribute(output, stage = "dcopf"):
+    '''
+    Calculates the volumes of every iteration of an (output) dictionary in the format of
+    all_island_iterations_PSCC.model() from its stage outputs, setting them on each InstanceCache. Returns the
+    CurtailmentVolumes (None if the output holds no iterations).
+    '''
+    iterations = [k for k, v in output.items() if k != "format" and stage in v]
+    if not iterations:
+        return None
+    caches = [output[k][stage] for k in iterations]
+    result = volumes(CurtailmentArrays.capture(caches, iterations))
+    result.apply(caches)
+    return result
@@ -29,6 +29,9 @@ class Case(UserDict):
     """
 
     def __getattr__(self, item: str) -> pd.DataFrame:
+        #Internal and dunder lookups (e.g. 'data' while unpickling) must not fall through to the case data
+        if item == 'data' or item.startswith('__'):
+            raise AttributeError(item)
         try:
             return self[item]
         except KeyError as e:
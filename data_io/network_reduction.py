@@ -0,0 +1,217 @@
+'''
+Exact reduction of the network of a case before it is modelled.
+
+Busses with no generators or demands (zero injection busses) are eliminated where that leaves every reported flow
+unchanged:
+ - a zero injection bus with one branch (a radial spur) carries no flow, so the bus and its branch are dropped. As
+   busses are dropped in turn, whole spurs of zero injection busses are removed.
+ - a zero injection bus between two branches of the same kind (two lines or two transformers) carries the same flow
+   through both, so the pair is collapsed into one equivalent branch in series (Kron reduction of the bus), with the
+   sum of their reactances and, in each timestep, the lower of their ratings. Chains collapse into a single branch.
+   Only branches in the ts rating tables (the KVL set) are collapsed.
+
+Zero injection busses with three or more branches are kept: eliminating them couples the angles of their neighbours
+through equivalent branches that no longer carry the limits of the branches they replace. Radial branches that feed
+generation or demand are also kept, as their limits depend on the dispatch.
+
+The reduced case is solved as any other, and the flows and angles of the eliminated branches and busses are mapped
+back onto the output of each iteration:
+
+    reduction = NetworkReduction(case)
+    output, result = all_island_iterations.model(reduction.case, solver)
+    reduction.expand(output)
+    reduction.summary()
+'''
+
+import copy
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+#Case table and ts rating table of each kind of branch, and the variables of its flow and angle difference
+_KINDS = {"line": ("branches", "ts_Lmax", "pL", "deltaL"),
+          "transformer": ("transformers", "ts_TLmax", "pLT", "deltaLT")}
+
+#Rating columns of the case tables, of which an equivalent branch takes the lowest of its members
+_RATINGS = ["ShortTermRating", "ContinousRating"]
+
+
+@dataclass
+class _Branch:
+    '''A branch of the reduced network: an original branch, or an equivalent of original branches in series.'''
+    name: str
+    kind: str
+    from_bus: str
+    to_bus: str
+    x: float
+    #Original branches the branch is made up of
+    members: list = field(default_factory=list)
+
+    def other(self, bus):
+        return self.to_bus if bus == self.from_bus else self.from_bus
+
+
+@dataclass
+class _Drop:
+    '''A radial spur dropped: branch, from the bus it hung from to the eliminated bus (None for an isolated bus).'''
+    branch: _Branch
+    bus: str
+    eliminated: str
+
+
+@dataclass
+class _Series:
+    '''
+    Two branches collapsed at the eliminated bus into equivalent, which runs from the far end of first to the far end
+    of second. The flow of each branch, in its own direction, is its sign times the flow of the equivalent.
+    '''
+    equivalent: _Branch
+    first: tuple
+    second: tuple
+    eliminated: str
+    #Reactance between the from bus of the equivalent and the eliminated bus
+    x: float
+
+
+class NetworkReduction:
+    '''
+    Reduces the network of a case (see the module docstring). The reduced case is case; the original case is left
+    unchanged. The reductions are held in steps, in the order they were made.
+    '''
+    def __init__(self, case):
+        self.original = case
+        self.branches = {}
+        for kind, (table, ts_table, _, _) in _KINDS.items():
+            for row in getattr(case, table).itertuples(index = False):
+                self.branches[row.name] = _Branch(row.name, kind, row.from_busname, row.to_busname, float(row.x),
+                                                  [row.name])
+        self.steps = []
+        self._reduce()
+        self.case = self._reduced_case()
+
+    def _reduce(self):
+        case = self.original
+        keep = set(case.generators["busname"]) | set(case.demands["busname"]) | \
+               set(case.busses.loc[case.busses["type"] == 3, "name"])
+        in_ts = {kind: set(getattr(case, ts_table).columns) for kind, (_, ts_table, _, _) in _KINDS.items()}
+        collapsible = {name for name, b in self.branches.items() if name in in_ts[b.kind]}
+
+        adjacency = {bus: set() for bus in case.busses["name"]}
+        for name, b in self.branches.items():
+            adjacency.setdefault(b.from_bus, set()).add(name)
+            adjacency.setdefault(b.to_bus, set()).add(name)
+
+        #Busses at the end of a branch but not in the busses table are not eliminated
+        keep |= set(adjacency) - set(case.busses["name"])
+        queue = [bus for bus in adjacency if bus not in keep]
+        while queue:
+            bus = queue.pop()
+            if bus in keep or bus not in adjacency:
+                continue
+            incident = [self.branches[name] for name in sorted(adjacency[bus])]
+
+            if len(incident) <= 1:
+                #Radial spur (or isolated bus): no flow
+                del adjacency[bus]
+                branch = incident[0] if incident else None
+                other = branch.other(bus) if incident else None
+                if branch is not None:
+                    adjacency[other].discard(branch.name)
+                    del self.branches[branch.name]
+                    queue.append(other)
+                self.steps.append(_Drop(branch, other, bus))
+
+            elif len(incident) == 2:
+                #Series branches: collapsed into one equivalent branch from one neighbour to the other
+                p, q = incident
+                u, v = p.other(bus), q.other(bus)
+                if p.kind != q.kind or u == v or u == bus or v == bus \
+                        or not {p.name, q.name} <= collapsible:
+                    continue
+                equivalent = _Branch(f"{p.name}+{q.name}", p.kind, u, v, p.x + q.x, p.members + q.members)
+                del adjacency[bus], self.branches[p.name], self.branches[q.name]
+                adjacency[u] = (adjacency[u] - {p.name}) | {equivalent.name}
+                adjacency[v] = (adjacency[v] - {q.name}) | {equivalent.name}
+                self.branches[equivalent.name] = equivalent
+                collapsible.add(equivalent.name)
+                self.steps.append(_Series(equivalent, (p.name, 1 if p.to_bus == bus else -1),
+                                          (q.name, 1 if q.from_bus == bus else -1), bus, p.x))
+                queue += [u, v]
+
+    @property
+    def eliminated(self):
+        '''The busses eliminated, in order.'''
+        return [step.eliminated for step in self.steps]
+
+    def _reduced_case(self):
+        original = self.original
+        case = copy.copy(original)
+        eliminated = set(self.eliminated)
+        case["busses"] = original.busses.loc[~original.busses["name"].isin(eliminated)].reset_index(drop = True)
+
+        for kind, (table, ts_table, _, _) in _KINDS.items():
+            df = original[table].set_index("name", drop = False)
+            ts = original[ts_table]
+            kept = [b.name for b in self.branches.values() if b.kind == kind and b.members == [b.name]]
+            equivalents = [b for b in self.branches.values() if b.kind == kind and b.members != [b.name]]
+
+            rows = []
+            for b in equivalents:
+                row = df.loc[b.members[0]].copy()
+                row["name"], row["from_busname"], row["to_busname"], row["x"] = b.name, b.from_bus, b.to_bus, b.x
+                row["r"] = df.loc[b.members, "r"].sum()
+                row[_RATINGS] = df.loc[b.members, _RATINGS].min()
+                rows.append(row)
+            case[table] = pd.concat([df.loc[kept], pd.DataFrame(rows, columns = df.columns)])\
+                            .astype(df.dtypes.to_dict()).reset_index(drop = True)
+
+            #Every member of an equivalent is in the ts ratings (see _reduce)
+            columns = {b.name: ts[b.members].min(axis = 1) for b in equivalents}
+            case[ts_table] = pd.concat([ts[[b for b in kept if b in ts.columns]], pd.DataFrame(columns, index = ts.index)],
+                                       axis = 1)
+        return case
+
+    def expand(self, output):
+        '''
+        Adds the flows (pL, pLT) and angle differences (deltaL, deltaLT) of the original branches, and the angles
+        (delta) of the eliminated busses, to the DCOPF output of each iteration solved on the reduced case. The
+        values of the equivalent branches are replaced by those of their members.
+        '''
+        for iteration, stages in output.items():
+            if iteration == "format":
+                continue
+            cache = stages["dcopf"]
+            delta = dict(cache.delta)
+            flows = {kind: dict(getattr(cache, flow)) for kind, (_, _, flow, _) in _KINDS.items()}
+
+            #Undo the reductions, last first, so that the flow and end busses of each branch are known when it is split
+            for step in reversed(self.steps):
+                if isinstance(step, _Drop):
+                    if step.branch is None:
+                        #An isolated bus is the reference of its own island
+                        delta[step.eliminated] = 0.0
+                    else:
+                        flows[step.branch.kind][step.branch.name] = 0.0
+                        delta[step.eliminated] = delta[step.bus]
+                    continue
+                equivalent = step.equivalent
+                flow = flows[equivalent.kind].pop(equivalent.name)
+                for name, sign in (step.first, step.second):
+                    flows[equivalent.kind][name] = sign*flow
+                delta[step.eliminated] = delta[equivalent.from_bus] - step.x*flow
+
+            for kind, (table, _, flow, delta_name) in _KINDS.items():
+                branches = self.original[table]
+                setattr(cache, flow, {name: flows[kind][name] for name in branches["name"]})
+                setattr(cache, delta_name, {name: delta[f] - delta[t] for name, f, t in
+                                            zip(branches["name"], branches["from_busname"], branches["to_busname"])})
+            cache.delta = {bus: delta[bus] for bus in self.original.busses["name"]}
+        return output
+
+    def summary(self):
+        '''Busses, lines and transformers of the original and the reduced case.'''
+        rows = {element: (len(self.original[table]), len(self.case[table]))
+                for element, table in [("busses", "busses"), ("lines", "branches"), ("transformers", "transformers")]}
+        summary = pd.DataFrame.from_dict(rows, orient = "index", columns = ["original", "reduced"])
+        summary["removed"] = summary["original"] - summary["reduced"]
+        return summary
@@ -0,0 +1,71 @@
+'''
+Persistent cross-run cache of solved timesteps.
+
+Each timestep is keyed by a fingerprint of its complete input:
+ - its row of every ts_* table of the case (forward filled, as missing time dependent values keep the value of the
+   previous timestep in the instance),
+ - a hash of the static case tables (busses, demands, branches, transformers, generators, baseMVA),
+ - the active constraint configuration given by the model.
+
+When a study is re-run after changing part of it (a MUON limit, one zone's wind profile), only the timesteps whose
+fingerprint changed are solved again; the stored (output, result) of every other timestep is reused:
+
+    cache = SolveCache("ireland_year.cache")
+    output, result = all_island_iterations.model(case, solver, cache = cache)
+'''
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from data_io.checkpoint import CheckpointStore
+
+
+class SolveCache(CheckpointStore):
+    '''CheckpointStore keyed by timestep fingerprints rather than iteration labels.'''
+
+
+def _token(obj):
+    '''Stable byte representation of a configuration value (including the rules and conditions of MUON constraints).'''
+    if isinstance(obj, dict):
+        return b"{" + b",".join(_token(k) + b":" + _token(v) for k, v in sorted(obj.items(), key=lambda i: repr(i[0]))) + b"}"
+    if isinstance(obj, (list, tuple)):
+        return b"[" + b",".join(_token(v) for v in obj) + b"]"
+    if callable(obj) and hasattr(obj, "__code__"):
+        closure = tuple(cell.cell_contents for cell in obj.__closure__ or ())
+        return obj.__code__.co_code + _token(obj.__code__.co_consts) + _token(obj.__code__.co_names) + _token(closure)
+    return repr(obj).encode()
+
+
+def _frame_token(df):
+    if not isinstance(df, pd.DataFrame):
+        return repr(df).encode()
+    return (repr(list(df.columns)).encode() + repr(list(df.index)).encode()
+            + pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+
+
+def case_hash(case):
+    '''Hash of the static (non ts_*) data of a case.'''
+    h = hashlib.sha1()
+    for key in sorted(k for k in case.keys() if not k.startswith("ts_")):
+        h.update(key.encode())
+        h.update(_frame_token(case[key]))
+    return h.hexdigest()
+
+
+def fingerprints(case, config):
+    '''Returns the fingerprint of each iteration of the case, for the given constraint configuration.'''
+    static = hashlib.sha1(case_hash(case).encode() + _token(config)).digest()
+    ts = {key: case[key].ffill() for key in sorted(k for k in case.keys() if k.startswith("ts_"))}
+
+    result = {}
+    for iteration in case.iterations:
+        h = hashlib.sha1(static)
+        for key, df in ts.items():
+            h.update(key.encode())
+            h.update(repr(list(df.columns)).encode())
+            if iteration in df.index:
+                h.update(np.ascontiguousarray(df.loc[iteration].to_numpy(dtype=float)).tobytes())
+        result[iteration] = h.hexdigest()
+    return result
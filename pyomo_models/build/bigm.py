@@ -0,0 +1,274 @@
+"""Per-timestep tightening of the big-M values of the MUON and pro-rata formulations.
+
+The big-M constraints of the secure and DCOPF stages are built with M values
+that hold for any timestep: the MUON NB Big-M switches
+(``bMparam_M_G_*_L/U``) from the sums of ``PGmin`` and ``PGmax`` of the
+generators they switch on, and the pro-rata minimum (``gen_prorata_xi_min``)
+from the full range of ``xi``. Loose M values weaken the LP relaxation the
+MIP is solved from. Before each solve, :class:`BigMTightening` propagates
+bounds on the generation of each generator through the constraints active in
+the stage, and writes the tightest M values they give into the mutable
+parameters of the constraints:
+
+* commitment: ``pG`` lies between ``0`` and ``PGmin`` or ``PGmax`` (``gen_uc_min``, ``gen_uc_max``).
+* pro-rata curtailment: ``pG`` lies between ``0`` and ``PG_MARKET`` in the
+  secure stage and between ``0`` and ``PG_SECURE`` in the DCOPF stage.
+* MUON limits: each active MW limit on the sum of ``pG`` over a group bounds
+  each member by the limit less the bounds of the other members.
+* network limits (DCOPF stage): the injection of a bus is limited by the
+  ratings of the branches at the bus, which bounds each generator by the
+  ratings plus the demand of the bus, less the bounds of the other
+  generators at the bus.
+
+All bounds are held as arrays over the generators and propagated with
+interval arithmetic on whole arrays. The pro-rata M of a pair is the range
+of ``xi_cg - xi_prorata``, with ``xi_cg`` taken no higher than the highest
+``xi`` of its members (a group's ``xi_cg`` above that can be lowered to it
+without changing the solution). Every M is valid for the stage it is
+written for, so the solutions are those of the untightened formulation.
+
+Example::
+
+    bigm = BigMTightening()
+    output, result = all_island_iterations.model(case, solver, bigm = bigm)
+    bigm.to_dataframe()
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import Constraint, value
+from pyomo.repn import generate_standard_repn
+
+from .network import NetworkMatrices
+
+
+@dataclass(slots=True)
+class BigMRecord:
+    iteration: Any
+    stage: str
+    param: str
+    rows: int
+    tightened: int
+    mean_default: float
+    mean_tightened: float
+    time_s: float
+
+
+def _values(param: Any, index: Iterable[Any], default: float = np.nan) -> np.ndarray:
+    """Values of a parameter (or of the bounds of a variable) over index as an array."""
+
+    values = param.extract_values()
+    return np.array([default if values.get(i) is None else values[i] for i in index], dtype=float)
+
+
+def _active(instance: Any, name: str) -> bool:
+    component = getattr(instance, name, None)
+    return component is not None and component.active
+
+
+def _group_limits(instance: Any, position: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Membership (groups x generators), lower and upper limits of the active MUON limits on sums of pG."""
+
+    rows, lower, upper = [], [], []
+    block = getattr(instance, "MUON", None)
+    if block is None or not block.active:
+        return np.zeros((0, len(position)), dtype=bool), np.zeros(0), np.zeros(0)
+    for row in block.component_data_objects(Constraint, active=True, descend_into=True):
+        repn = generate_standard_repn(row.body, compute_values=True)
+        if not repn.is_linear() or any(v.parent_component().local_name != "pG" or c != 1
+                                       for v, c in zip(repn.linear_vars, repn.linear_coefs)):
+            continue
+        members = np.zeros(len(position), dtype=bool)
+        members[[position[v.index()] for v in repn.linear_vars]] = True
+        rows.append(members)
+        lower.append(-np.inf if row.lower is None else value(row.lower) - repn.constant)
+        upper.append(np.inf if row.upper is None else value(row.upper) - repn.constant)
+    return np.array(rows, dtype=bool).reshape(-1, len(position)), np.array(lower), np.array(upper)
+
+
+def _others(bounds: np.ndarray, members: np.ndarray, infinity: float) -> np.ndarray:
+    """Sum of the bounds of the other members of each group (rows of members), for each (group, generator).
+    Bounds are finite or infinity."""
+
+    finite = np.where(np.isfinite(bounds), bounds, 0)
+    unbounded = (~np.isfinite(bounds)).astype(float)
+    others = (members @ finite)[:, None] - finite[None, :]
+    return np.where((members @ unbounded)[:, None] - unbounded[None, :] > 0, infinity, others)
+
+
+def propagate_groups(lower: np.ndarray, upper: np.ndarray, members: np.ndarray, group_lower: np.ndarray,
+                     group_upper: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Tightens the bounds of each generator by the limits on the sums of the groups (rows of members) it is in."""
+
+    if not len(members):
+        return lower, upper
+    upper = np.minimum(upper, np.where(members, group_upper[:, None] - _others(lower, members, -np.inf),
+                                       np.inf).min(axis=0))
+    lower = np.maximum(lower, np.where(members, group_lower[:, None] - _others(upper, members, np.inf),
+                                       -np.inf).max(axis=0))
+    return lower, upper
+
+
+def sum_bounds(lower: np.ndarray, upper: np.ndarray, mask: np.ndarray, members: np.ndarray,
+               group_lower: np.ndarray, group_upper: np.ndarray) -> tuple[float, float]:
+    """Bounds of the sum of pG over mask, from the bounds of the generators and the limits of the groups."""
+
+    low, high = lower[mask].sum(), upper[mask].sum()
+    inside = members & mask
+    overlap = inside.any(axis=1)
+    if overlap.any():
+        #Generators of mask outside a group at their bounds, and those inside at most the limit of the group less
+        #the bounds of the members not in mask
+        outside, others = mask & ~members, members & ~mask
+        high = min(high, (np.where(outside, upper, 0).sum(axis=1)
+                          + np.minimum(np.where(inside, upper, 0).sum(axis=1),
+                                       group_upper - np.where(others, lower, 0).sum(axis=1)))[overlap].min())
+        low = max(low, (np.where(outside, lower, 0).sum(axis=1)
+                        + np.maximum(np.where(inside, lower, 0).sum(axis=1),
+                                     group_lower - np.where(others, upper, 0).sum(axis=1)))[overlap].max())
+    return float(low), float(high)
+
+
+class BigMTightening:
+    """Writes the tightest valid big-M values of the active big-M constraints into their parameters before a solve.
+
+    ``passes`` is the number of rounds of bound propagation through the MUON
+    and network limits. Each parameter tightened is recorded.
+    """
+
+    def __init__(self, passes: int = 2):
+        self.passes = passes
+        self.records: list[BigMRecord] = []
+        self._network: Optional[NetworkMatrices] = None
+
+    def generator_bounds(self, instance: Any) -> tuple[list, np.ndarray, np.ndarray, tuple]:
+        """The generators of the instance, the bounds on their pG implied by the active constraints, and the
+        active MUON limits as (membership, lower, upper)."""
+
+        generators = list(instance.G)
+        position = {g: i for i, g in enumerate(generators)}
+        PGmin, PGmax = _values(instance.PGmin, generators, 0), _values(instance.PGmax, generators, 0)
+
+        #Commitment: pG is 0 or between PGmin and PGmax
+        lower, upper = np.full(len(generators), -np.inf), np.full(len(generators), np.inf)
+        if _active(instance, "gen_uc_min") and _active(instance, "gen_uc_max"):
+            lower, upper = np.minimum(PGmin, 0), np.maximum(PGmax, 0)
+
+        #Pro-rata curtailment: pG is a fraction of its market (secure stage) or secure (DCOPF stage) dispatch
+        for constraints, dispatch in [(["gen_prorata_curtailment_realpower"], "PG_MARKET"),
+                                      (["gen_prorata_realpower_max_xi", "gen_prorata_realpower_min_xi"], "PG_SECURE")]:
+            if all(_active(instance, c) for c in constraints):
+                prorata = np.array([position[g] for g in instance.G_prorata], dtype=np.int64)
+                fixed = _values(getattr(instance, dispatch), instance.G_prorata, 0)
+                lower[prorata] = np.maximum(lower[prorata], np.minimum(fixed, 0))
+                upper[prorata] = np.minimum(upper[prorata], np.maximum(fixed, 0))
+
+        groups = _group_limits(instance, position)
+        network = self._network_bounds(instance, position)
+        for _ in range(self.passes):
+            lower, upper = propagate_groups(lower, upper, *groups)
+            if network is not None:
+                lower, upper = network(lower, upper)
+        return generators, lower, upper, groups
+
+    def _network_bounds(self, instance: Any, position: dict):
+        """A function tightening the bounds of the generators by the branch ratings and demand of their busses,
+        or None if the network limits are not active."""
+
+        if not all(_active(instance, c) for c in ("line_cont_realpower_max_pstve", "line_cont_realpower_max_ngtve",
+                                                   "transf_continuous_real_max_pstve", "transf_continuous_real_max_ngtve")):
+            return None
+        network = getattr(instance, "network_matrices", None)
+        if network is None:
+            if self._network is None:
+                self._network = NetworkMatrices.from_instance(instance)
+            network = self._network
+
+        n_bus = network.n_bus
+        ratings = [np.abs(_values(instance.line_max_continuous_P, network.lines, np.inf)),
+                   np.abs(_values(instance.transformer_max_continuous_P, network.transformers, np.inf))]
+        capacity = sum(np.bincount(busses, weights=rating, minlength=n_bus)
+                       for busses, rating in [(network.line_from, ratings[0]), (network.line_to, ratings[0]),
+                                              (network.transformer_from, ratings[1]),
+                                              (network.transformer_to, ratings[1])])
+
+        #pD = alpha*PD, with alpha between 0 and 1 (fixed at 1 for negative demands)
+        PD = _values(instance.PD, network.demands, 0)
+        fixed = np.isin(network.demands, list(instance.DNeg))
+        demand_lower = np.bincount(network.demand_bus, weights=np.where(fixed, PD, np.minimum(PD, 0)), minlength=n_bus)
+        demand_upper = np.bincount(network.demand_bus, weights=np.where(fixed, PD, np.maximum(PD, 0)), minlength=n_bus)
+
+        index = np.array([position[g] for g in network.generators], dtype=np.int64)
+        bus = network.generator_bus
+
+        #Generators as groups of the generators at the same bus
+        at_bus = bus[None, :] == bus[:, None]
+
+        def tighten(lower, upper):
+            lower, upper = lower.copy(), upper.copy()
+            others_lower = np.diag(_others(lower[index], at_bus, -np.inf))
+            others_upper = np.diag(_others(upper[index], at_bus, np.inf))
+            upper[index] = np.minimum(upper[index], capacity[bus] + demand_upper[bus] - others_lower)
+            lower[index] = np.maximum(lower[index], demand_lower[bus] - capacity[bus] - others_upper)
+            return lower, upper
+
+        return tighten
+
+    def tighten(self, instance: Any, iteration: Any, stage: str,
+                switches: Iterable[tuple[Any, Any, Any, float]] = ()) -> None:
+        """Writes the big-M values of the active big-M constraints of the stage being solved: those of the MUON NB
+        Big-M switches, given as (lower M param, upper M param, generator set, limit on the sum of pG over the set),
+        and those of gen_prorata_xi_min."""
+
+        start = time.perf_counter()
+        generators, lower, upper, groups = self.generator_bounds(instance)
+        updates = []
+
+        for param_lower, param_upper, members, limit in switches:
+            if not param_lower.parent_block().active:
+                continue
+            mask = np.isin(generators, list(members))
+            low, high = sum_bounds(lower, upper, mask, *groups)
+            #The defaults are those of MUON_NB_BigM_constraints, from the sums of PGmin and PGmax
+            PGmin, PGmax = _values(instance.PGmin, generators, 0), _values(instance.PGmax, generators, 0)
+            updates += [(param_lower, {None: max(0.0, limit - low)}, [limit - PGmin[mask].sum()]),
+                        (param_upper, {None: max(0.0, high - limit)}, [PGmax[mask].sum() - limit])]
+
+        param = getattr(instance, "M_prorata_xi", None)
+        if param is not None and _active(instance, "gen_prorata_xi_min"):
+            position = {g: i for i, g in enumerate(generators)}
+            prorata = list(instance.G_prorata)
+            secure = _values(instance.PG_SECURE, prorata, 0)
+            pg = np.array([position[g] for g in prorata], dtype=np.int64)
+            #xi = pG/PG_SECURE (xi is free within [0, 1] if PG_SECURE is 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                xi_lower = np.where(secure > 0, np.clip(lower[pg]/secure, 0, 1), 0)
+                xi_upper = np.where(secure > 0, np.clip(upper[pg]/secure, 0, 1), 1)
+            pairs = list(instance.G_prorata_pairs)
+            xi = {g: i for i, g in enumerate(prorata)}
+            member = np.array([xi[g] for g, _ in pairs], dtype=np.int64)
+            group, names = pd.factorize(pd.Index([cg for _, cg in pairs]))
+            cg_upper = np.zeros(len(names))
+            np.maximum.at(cg_upper, group, xi_upper[member])
+            M = np.maximum(cg_upper[group] - xi_lower[member], 0)
+            updates.append((param, dict(zip(pairs, M.tolist())), np.ones(len(pairs))))
+
+        elapsed = time.perf_counter() - start
+        for param, values, default in updates:
+            param.store_values(values)
+            default, tightened = np.asarray(default, dtype=float), np.array(list(values.values()), dtype=float)
+            self.records.append(BigMRecord(iteration, stage, param.local_name, len(values),
+                                           int((tightened < default - 1e-9).sum()), float(default.mean()),
+                                           float(tightened.mean()), elapsed))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in solve order."""
+
+        columns = list(BigMRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
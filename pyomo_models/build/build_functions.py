@@ -15,11 +15,14 @@ from typing import Any, Iterable
 from types import SimpleNamespace
 import inspect
 import logging
+import time
+import weakref
 import numpy as np
 from enum import Enum
 
 from pyomo.environ import *  # noqa: F401,F403 - re-export Pyomo classes
 from .names import ComponentName
+from . import profiling
 from .definitions import (
     Sets_Blocks,
     Params_Blocks,
@@ -94,6 +97,25 @@ def _name_to_str(name_obj: Any) -> str:
 
     return name_obj.value if isinstance(name_obj, Enum) else str(name_obj)
 
+def _replace_component(instance: Any, name_str: str, component: Any, kind: str) -> None:
+    """Add ``component`` as ``name_str``, deleting any existing component of that name first.
+
+    Construction of the component happens in ``add_component``, so this is also
+    where build timings are recorded when a :class:`profiling.BuildProfiler` is active.
+    """
+
+    profiler = profiling.get_active_profiler()
+    start = time.perf_counter() if profiler is not None else 0.0
+
+    rebuilt = hasattr(instance, name_str)
+    if rebuilt:
+        instance.del_component(getattr(instance, name_str))
+        logger.info(f"Deleted and redefined {kind} component {name_str}")
+    instance.add_component(name_str, component)
+
+    if profiler is not None:
+        profiler.record(kind, name_str, component, time.perf_counter() - start, rebuilt)
+
 def add_sets_to_instance(instance: Any, set_defs: Iterable[Any]) -> None:
     """Add sets defined by dataclass objects to a model instance."""
 
@@ -109,10 +131,7 @@ def add_sets_to_instance(instance: Any, set_defs: Iterable[Any]) -> None:
             component = Set(within=within, initialize=initialize, dimen=dimen)
 
         name_str = _name_to_str(getattr(set_def, "name"))
-        if hasattr(instance, name_str):
-            instance.del_component(getattr(instance, name_str))
-            logger.info(f"Deleted and redefined set component {name_str}")
-        instance.add_component(name_str, component)
+        _replace_component(instance, name_str, component, "set")
 
 def add_iteration_sets_to_instance(instance: Any, case: Any, set_list: list[Any], iteration: int) -> None:
     set_functions = {
@@ -142,10 +161,7 @@ def add_iteration_sets_to_instance(instance: Any, case: Any, set_list: list[Any]
             else:
                 component = Set(within=within, initialize=initialize, dimen=dimen)
 
-            if hasattr(instance, name):
-                instance.del_component(getattr(instance, name))
-                logger.info(f"Deleted and redefined set component {name}")
-            instance.add_component(name, component)
+            _replace_component(instance, name, component, "set")
 
 
 def add_params_to_instance(instance: Any, param_defs: Iterable[Any]) -> None:
@@ -163,10 +179,7 @@ def add_params_to_instance(instance: Any, param_defs: Iterable[Any]) -> None:
             component = Param(within=within, initialize=initialize, mutable=mutable)
 
         name_str = _name_to_str(getattr(param_def, "name"))
-        if hasattr(instance, name_str):
-            instance.del_component(getattr(instance, name_str))
-            logger.info(f"Deleted and redefined parameter component {name_str}")
-        instance.add_component(name_str, component)
+        _replace_component(instance, name_str, component, "parameter")
 
 def add_iteration_params_to_instance(instance: Any, case: Any, param_list: list[Any], iteration: int) -> None:
     '''
@@ -184,9 +197,13 @@ def add_iteration_params_to_instance(instance: Any, case: Any, param_list: list[
     }
 
 
+    profiler = profiling.get_active_profiler()
     for param in param_list:
         if param in param_functions.keys():
+            start = time.perf_counter() if profiler is not None else 0.0
             getattr(instance, param).store_values(param_functions[param]())
+            if profiler is not None:
+                profiler.record("parameter update", _name_to_str(param), getattr(instance, param), time.perf_counter() - start, False)
         else:
             raise KeyError(f"{param} is not defined as an iterative parameter. Please ensure it is defined in the add_iteration_params_to_instance() functions internal dict")
 
@@ -205,10 +222,7 @@ def add_variables_to_instance(instance: Any, variable_defs: Iterable[Any]) -> No
             component = Var(domain=domain, bounds=bounds, initialize=initialize)
 
         name_str = _name_to_str(getattr(variable_def, "name"))
-        if hasattr(instance, name_str):
-            instance.del_component(getattr(instance, name_str))
-            logger.info(f"Deleted and redefined variable component {name_str}")
-        instance.add_component(name_str, component)
+        _replace_component(instance, name_str, component, "variable")
 
 def add_constraints_to_instance(instance: Any, constraint_defs: Iterable[Any]) -> None:
     """Add constraints defined by dataclass objects to a model instance."""
@@ -223,10 +237,7 @@ def add_constraints_to_instance(instance: Any, constraint_defs: Iterable[Any]) -
             component = Constraint(rule=rule)
 
         name_str = _name_to_str(getattr(constraint_def, "name"))
-        if hasattr(instance, name_str):
-            instance.del_component(getattr(instance, name_str))
-            logger.info(f"Deleted and redefined constraint component {name_str}")
-        instance.add_component(name_str, component)
+        _replace_component(instance, name_str, component, "constraint")
 
 def remove_component_from_instance(instance: Any, component_list: Iterable[str], skip_missing = False) -> None:
     """Remove components from a model instance."""
@@ -241,35 +252,88 @@ def remove_component_from_instance(instance: Any, component_list: Iterable[str],
                 f"Set '{name}' cannot be deleted as it does not exist in the instance"
             )
 
+class _BlockRegistry:
+    """Component definitions from one ``*_Blocks`` object, converted on demand.
+
+    Each requested component is converted into its fields the first time it
+    is asked for, so repeated builds against the same case or instance only
+    pay for the lookup. The ``initialize`` of a component is still resolved
+    on every build, so that edits to the case data are picked up.
+    """
+
+    def __init__(self, blocks: dict[Any, Any]) -> None:
+        self.blocks = blocks
+        self._fields: dict[Any, dict[str, Any]] = {}
+
+    def definitions(self, names: Iterable[Any]) -> list[SimpleNamespace]:
+        defs = []
+        for name in names:
+            fields = self._fields.get(name)
+            if fields is None:
+                fields = self._fields[name] = asdict(self.blocks[name])
+            definition = SimpleNamespace(name=name, **fields)
+            if "initialize" in fields:
+                definition.initialize = _initialize_resolver(fields["initialize"])
+            defs.append(definition)
+        return defs
+
+
+#Registries keyed by (blocks class, id of case/instance). The blocks are built on a weak proxy of their owner, so the
+#registry does not keep it alive, and the entry is evicted when the owner is garbage collected.
+_block_registries: dict[tuple[type, int], tuple[weakref.ref, _BlockRegistry]] = {}
+
+def _get_block_registry(blocks_cls: type, owner: Any) -> _BlockRegistry:
+    """Return the cached registry of ``blocks_cls`` for ``owner``, creating it if required."""
+
+    key = (blocks_cls, id(owner))
+    cached = _block_registries.get(key)
+    if cached is not None and cached[0]() is owner:
+        return cached[1]
+
+    registry = _BlockRegistry(blocks_cls(weakref.proxy(owner)).blocks)
+    _block_registries[key] = (weakref.ref(owner), registry)
+    weakref.finalize(owner, _block_registries.pop, key, None)
+    return registry
+
+def clear_block_registries() -> None:
+    """Discard all cached component registries."""
+
+    _block_registries.clear()
+
 def build_sets(instance: Any, case: Any, setlist: Iterable[Any]) -> Any:
     """Populate ``instance`` with listed components."""
 
-    set_blocks = Sets_Blocks(case).blocks
-    set_defs = [SimpleNamespace(name=n, **asdict(set_blocks[n])) for n in setlist]
+    set_defs = _get_block_registry(Sets_Blocks, case).definitions(setlist)
     add_sets_to_instance(instance, set_defs)
     return instance
 
 def build_params(instance: Any, case: Any, paramlist: Iterable[Any]) -> Any:
     """Populate ``instance`` with listed parameter components."""
 
-    param_blocks = Params_Blocks(case).blocks
-    param_defs = [SimpleNamespace(name=n, **asdict(param_blocks[n])) for n in paramlist]
+    param_defs = _get_block_registry(Params_Blocks, case).definitions(paramlist)
     add_params_to_instance(instance, param_defs)
     return instance
 
+def set_data(case: Any, setlist: Iterable[Any]) -> dict[str, Any]:
+    """Return the initial data of the listed sets, keyed by name, without building components."""
+
+    return {_name_to_str(d.name): d.initialize for d in _get_block_registry(Sets_Blocks, case).definitions(setlist)}
+
+def param_data(case: Any, paramlist: Iterable[Any]) -> dict[str, Any]:
+    """Return the initial values of the listed parameters, keyed by name, without building components."""
+
+    return {_name_to_str(d.name): d.initialize for d in _get_block_registry(Params_Blocks, case).definitions(paramlist)}
+
 def build_variables(instance: Any, varlist: Iterable[Any]) -> Any:
     """Populate ``instance`` with listed variable components."""
 
-    var_blocks = Variables_Blocks(instance).blocks
-    var_defs = [SimpleNamespace(name=n, **asdict(var_blocks[n])) for n in varlist]
+    var_defs = _get_block_registry(Variables_Blocks, instance).definitions(varlist)
     add_variables_to_instance(instance, var_defs)
     return instance
 
 def build_constraints(instance: Any, constraintlist: Iterable[Any]) -> Any:
     """Populate ``instance`` with listed constraint components."""
 
-    constraint_blocks = Constraint_Blocks(instance).blocks
-    constraint_defs = [SimpleNamespace(name=n, **asdict(constraint_blocks[n])) for n in constraintlist]
+    constraint_defs = _get_block_registry(Constraint_Blocks, instance).definitions(constraintlist)
     add_constraints_to_instance(instance, constraint_defs)
     return instance
-
@@ -482,6 +482,13 @@ class Params_Blocks:
                 initialize = 0,
                 mutable = True,
             ),
+            #Big-M of the pro-rata minimum constraint (gen_prorata_xi_min), the range of xi_cg - xi_prorata
+            ComponentName.M_prorata_xi: ParamDef(
+                index = ComponentName.G_prorata_pairs,
+                within = NonNegativeReals,
+                initialize = 1,
+                mutable = True,
+            ),
         }
 
 class Variables_Blocks:
@@ -737,7 +744,7 @@ class Constraint_Blocks:
             ComponentName.gen_prorata_xi_min: ConstraintDef(
                 index=ComponentName.G_prorata_pairs,
                 rule=lambda instance, generator, cg: instance.xi_prorata[generator]
-                >= instance.xi_cg[cg] - (1 - 0) * (1 - instance.beta_prorata[(generator, cg)]),
+                >= instance.xi_cg[cg] - instance.M_prorata_xi[(generator, cg)] * (1 - instance.beta_prorata[(generator, cg)]),
             ),
             #Constraint that ensures that the sum of all of the binary 'zeta_bin' 
             #Should be defined against the set of wind generators
@@ -0,0 +1,153 @@
+"""Commitment-fixing fast mode for the market, secure and DCOPF stages.
+
+Most of the solve time of a stage goes to its binaries (``u_g``,
+``beta_prorata`` and the MUON big-M ``y`` variables), while the commitment
+pattern rarely changes between adjacent timesteps. With a
+:class:`CommitmentFixing` active, each stage is first solved as an LP with
+every binary fixed at its value in the same stage of the previous timestep.
+The fixed solution is kept if it lies within ``tolerance`` (relative, as
+HiGHS' ``mip_rel_gap``) of the bound given by the LP relaxation of the stage.
+If the fixed LP is infeasible, or its objective is outside the tolerance, the
+stage falls back to the full MIP. The MIP, relaxation and fixed LP of a stage
+are all solved with a persistent solver held for that stage, so that after its
+first solve only the changes to the instance (the binaries relaxed or fixed,
+and the parameters and constraints of the timestep) are passed to the solver,
+rather than the whole model.
+
+The path taken by every stage solve is recorded:
+
+* ``mip``: no previous commitment was held for the stage, so the MIP was solved
+* ``fixed_lp``: the fixed LP solution was kept
+* ``mip_infeasible``: the fixed LP was infeasible and the MIP was solved
+* ``mip_gap``: the fixed LP was outside the tolerance and the MIP was solved
+
+Example::
+
+    fastmode = CommitmentFixing(tolerance = 1e-3)
+    output, result = all_island_iterations.model(case, solver, fastmode = fastmode)
+    fastmode.report()
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+import pandas as pd
+from pyomo.common.collections import ComponentMap
+from pyomo.environ import Binary, Objective, UnitInterval, Var, value
+from pyomo.opt import SolverFactory
+
+import pyomo_models.build.pyosolve as pyosolve
+
+@dataclass(slots=True)
+class FastModeRecord:
+    iteration: Any
+    stage: str
+    path: str
+    objective: float
+    relaxation_bound: Optional[float]
+    fixed_objective: Optional[float]
+    solve_time_s: float
+
+
+def relative_gap(objective: float, bound: float) -> float:
+    """Relative gap between an objective value and a lower bound, as HiGHS reports its MIP gap."""
+
+    return (objective - bound) / max(abs(objective), 1.0)
+
+
+def _objective_value(instance) -> float:
+    return value(next(instance.component_data_objects(Objective, active=True)))
+
+
+def _binaries(instance) -> list:
+    return [v for v in instance.component_data_objects(Var, descend_into=True) if v.is_binary()]
+
+
+class CommitmentFixing:
+    """Solves each stage with its binaries fixed at the previous timestep's values, falling back to the MIP."""
+
+    def __init__(self, tolerance: float = 1e-4):
+        self.tolerance = tolerance
+        self.commitment: dict[str, ComponentMap] = {}
+        self.records: list[FastModeRecord] = []
+        self.solvers: dict[str, Any] = {}
+
+    def _solver(self, solver: str, stage: str):
+        """The persistent solver of the stage, created on its first solve."""
+
+        if stage not in self.solvers:
+            #Every variable of the instance is held by the solver, so that rebuilding the constraints of the
+            #timestep does not remove and re-add the variables only they reference
+            self.solvers[stage] = SolverFactory(solver, only_child_vars=True)
+            #Fixed binaries are passed on as bounds, so fixing them does not rebuild the constraints they appear in
+            self.solvers[stage].update_config.treat_fixed_vars_as_params = False
+        return self.solvers[stage]
+
+    def solve(self, instance, solver: str, iteration: Any, stage: str, solve_mip: Callable[[Any], Any]):
+        """Solves a stage of an instance, using solve_mip(opt) to solve the full MIP with the solver object opt, and
+        returns its results."""
+
+        start = time.perf_counter()
+        binaries = _binaries(instance)
+        previous = self.commitment.get(stage)
+        opt = self._solver(solver, stage)
+        bound = fixed_objective = None
+
+        if previous is None:
+            path, result = "mip", solve_mip(opt)
+        else:
+            bound = self._relaxation_bound(instance, solver, opt, binaries)
+            fixed_objective, result = self._fixed_lp(instance, solver, opt, binaries, previous)
+            if fixed_objective is None:
+                path, result = "mip_infeasible", solve_mip(opt)
+            elif relative_gap(fixed_objective, bound) > self.tolerance:
+                path, result = "mip_gap", solve_mip(opt)
+            else:
+                path = "fixed_lp"
+
+        self.commitment[stage] = ComponentMap((v, round(v.value)) for v in binaries if v.value is not None)
+        objective = fixed_objective if path == "fixed_lp" else _objective_value(instance)
+        self.records.append(FastModeRecord(iteration, stage, path, objective, bound, fixed_objective,
+                                           time.perf_counter() - start))
+        return result
+
+    def _relaxation_bound(self, instance, solver, opt, binaries) -> float:
+        for v in binaries:
+            v.domain = UnitInterval
+        try:
+            result = pyosolve.solveinstance(instance, solver=solver, opt=opt)
+        finally:
+            for v in binaries:
+                v.domain = Binary
+        return result.problem.lower_bound
+
+    def _fixed_lp(self, instance, solver, opt, binaries, previous):
+        """Returns the objective and results of the stage with its binaries fixed, or (None, None) if infeasible."""
+
+        fixed = [v for v in binaries if v in previous]
+        for v in fixed:
+            v.fix(previous[v])
+        try:
+            result = pyosolve.solveinstance(instance, solver=solver, log_infeasible=False, opt=opt)
+        except RuntimeError:
+            return None, None
+        finally:
+            for v in fixed:
+                v.unfix()
+        return result.problem.upper_bound, result
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in solve order."""
+
+        columns = list(FastModeRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
+
+    def report(self) -> pd.DataFrame:
+        """The path taken by each stage (columns) of each timestep (rows)."""
+
+        df = self.to_dataframe()
+        return df.pivot(index="iteration", columns="stage", values="path").reindex(
+            index=pd.unique(df["iteration"]), columns=pd.unique(df["stage"]))
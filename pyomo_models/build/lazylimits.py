@@ -0,0 +1,153 @@
+"""Lazy generation of the branch flow limits of the DCOPF stage.
+
+Only a small fraction of the ``line_cont_realpower_max_*`` and
+``transf_continuous_real_max_*`` limits bind in any timestep. With
+:class:`LazyLineLimits`, the DCOPF stage is first solved with only the limits
+of a monitored set of branches (those that bound in the previous timestep).
+The flows of every branch are then checked against ``line_max_continuous_P``
+and ``transformer_max_continuous_P`` at once, the limits of the violated
+branches are added, and the stage is solved again until no limit is
+violated. As the final solve satisfies every limit, its solution is that of
+the full stage.
+
+Only branches in the KVL set (``L_nonzero`` and ``TRANSF_nonzero``) are
+monitored lazily; the limits of the other branches, whose flows are only
+limited by their ratings, stay active. With the PTDF formulation, the PTDF
+flow rows of unmonitored branches are deactivated with their limits (so
+each solve only holds the dense rows of the monitored branches), and their
+flow variables are set from the PTDF flows of the final solution.
+
+Example::
+
+    lazy = LazyLineLimits()
+    output, result = all_island_iterations.model(case, solver, lazy = lazy)
+    lazy.to_dataframe()
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import value
+
+from pyomo_models.build.matrix_constraints import ptdf_branch_flows
+
+#Limit constraints (positive, negative) and PTDF flow rows of each kind of branch
+_BRANCHES = {"line": ("L", "L_nonzero", "pL", "line_max_continuous_P",
+                      ("line_cont_realpower_max_pstve", "line_cont_realpower_max_ngtve"), "PTDF_lines"),
+             "transformer": ("TRANSF", "TRANSF_nonzero", "pLT", "transformer_max_continuous_P",
+                             ("transf_continuous_real_max_pstve", "transf_continuous_real_max_ngtve"), "PTDF_transformer")}
+
+
+@dataclass(slots=True)
+class LazyLimitRecord:
+    iteration: Any
+    rounds: int
+    branches: int
+    monitored: int
+    added: int
+    binding: int
+    solve_time_s: float
+
+
+class LazyLineLimits:
+    """Solves the DCOPF stage with the limits of monitored branches only, adding violated limits until none remain.
+
+    A branch is violated when its flow exceeds its limit by more than
+    ``tolerance`` (per unit), and binding when it is within ``tolerance`` of
+    its limit. The binding set of each timestep is the monitored set of the
+    next, so one instance should be used per run of a case.
+    """
+
+    def __init__(self, tolerance: float = 1e-6, max_rounds: int = 50):
+        self.tolerance = tolerance
+        self.max_rounds = max_rounds
+        self.binding: dict[str, set] = {kind: set() for kind in _BRANCHES}
+        self.records: list[LazyLimitRecord] = []
+
+    def solve(self, instance, iteration: Any, solve: Callable[[], Any]):
+        """Solves the (activated) DCOPF stage of an instance with solve(), returning the results of the final solve."""
+
+        start = time.perf_counter()
+        ptdf = getattr(instance, "network_formulation", "angle") == "ptdf"
+        lazy = {kind: [b for b in getattr(instance, names[0]) if b in getattr(instance, names[1])]
+                for kind, names in _BRANCHES.items()}
+        monitored = {kind: self.binding[kind] & set(lazy[kind]) for kind in _BRANCHES}
+        branches = sum(len(b) for b in lazy.values())
+        initial = sum(len(m) for m in monitored.values())
+
+        for rounds in range(1, self.max_rounds + 1):
+            self._activate(instance, lazy, monitored, ptdf)
+            result = solve()
+            flows, limits = self._flows(instance, lazy, ptdf)
+            violated = {kind: {b for b, f, l in zip(lazy[kind], flows[kind], limits[kind])
+                               if abs(f) > l + self.tolerance and b not in monitored[kind]}
+                        for kind in _BRANCHES}
+            if not any(violated.values()):
+                break
+            for kind in _BRANCHES:
+                monitored[kind] |= violated[kind]
+        else:
+            raise RuntimeError(f"Branch limits still violated after {self.max_rounds} rounds in iteration {iteration}")
+
+        if ptdf:
+            self._set_flows(instance, lazy, monitored, flows)
+        self._activate(instance, lazy, {kind: set(lazy[kind]) for kind in _BRANCHES}, ptdf)
+
+        self.binding = {kind: {b for b, f, l in zip(lazy[kind], flows[kind], limits[kind])
+                               if abs(f) >= l - self.tolerance}
+                        for kind in _BRANCHES}
+        self.records.append(LazyLimitRecord(iteration, rounds, branches, sum(len(m) for m in monitored.values()),
+                                            sum(len(m) for m in monitored.values()) - initial,
+                                            sum(len(b) for b in self.binding.values()), time.perf_counter() - start))
+        return result
+
+    @staticmethod
+    def _activate(instance, lazy, monitored, ptdf) -> None:
+        """Activates the limits (and PTDF rows) of the monitored branches of the KVL set, deactivating the others."""
+
+        for kind, (_, _, _, _, limits, rows) in _BRANCHES.items():
+            components = [getattr(instance, c) for c in limits] + ([getattr(instance, rows)] if ptdf else [])
+            for b in lazy[kind]:
+                for component in components:
+                    if b in monitored[kind]:
+                        component[b].activate()
+                    else:
+                        component[b].deactivate()
+
+    @staticmethod
+    def _flows(instance, lazy, ptdf) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
+        """Flows and limits of the branches of the KVL set in the solution loaded into the instance."""
+
+        flows, limits = {}, {}
+        if ptdf:
+            network = instance.network_matrices
+            all_flows = dict(zip(("line", "transformer"), ptdf_branch_flows(instance)))
+            position = {"line": {b: i for i, b in enumerate(network.lines)},
+                        "transformer": {b: i for i, b in enumerate(network.transformers)}}
+        for kind, (_, _, flow, limit, _, _) in _BRANCHES.items():
+            if ptdf:
+                flows[kind] = all_flows[kind][[position[kind][b] for b in lazy[kind]]]
+            else:
+                flows[kind] = np.array([getattr(instance, flow)[b].value for b in lazy[kind]], dtype=float)
+            limits[kind] = np.array([value(getattr(instance, limit)[b]) for b in lazy[kind]], dtype=float)
+        return flows, limits
+
+    @staticmethod
+    def _set_flows(instance, lazy, monitored, flows) -> None:
+        """Sets the flow variables of the unmonitored branches, whose PTDF rows were not solved, from their flows."""
+
+        for kind, (_, _, flow, _, _, _) in _BRANCHES.items():
+            for b, f in zip(lazy[kind], flows[kind]):
+                if b not in monitored[kind]:
+                    getattr(instance, flow)[b].set_value(float(f), skip_validation=True)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in solve order."""
+
+        columns = list(LazyLimitRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
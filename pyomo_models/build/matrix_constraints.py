@@ -0,0 +1,252 @@
+"""Matrix based construction of the DCOPF network constraints.
+
+Builds ``KCL_networked_realpower_noshunt``, ``volts_line_delta``,
+``volts_transformer_delta``, ``KVL_DCOPF_lines``, ``KVL_DCOPF_transformer`` and
+``volts_reference_bus`` from the sparse incidence and reactance matrices of a
+:class:`~pyomo_models.build.network.NetworkMatrices`, rather than from the
+per-bus and per-line rules in ``Constraint_Blocks``. Each row of the stacked
+matrix ``A @ x == 0`` is emitted directly as a Pyomo ``LinearExpression``, so
+no Python rule iterates over the mapping sets. The resulting components have
+the same names and index sets as the rule based ones, and can be activated,
+deactivated and rebuilt in exactly the same way. The exception is
+``volts_reference_bus``, which fixes the angle of a reference bus in each
+island of the branches in service (the ``b0`` bus in its own island), rather
+than of ``b0`` only, leaving no island with an undetermined angle. Where
+``volts_line_delta`` or ``volts_transformer_delta`` have been presolved out
+(see :mod:`~pyomo_models.build.presolve`), the KVL rows are built on the bus
+angles directly.
+
+``PTDF_lines`` and ``PTDF_transformer`` are the flow constraints of the PTDF
+formulation of the DCOPF stage, which has no rule based equivalent. They
+define the flow of each branch in the KVL set (``L_nonzero`` and
+``TRANSF_nonzero``) as a linear function of the nodal injections, through the
+PTDF matrix of those branches (with the ``b0`` bus as the slack bus), taken
+from the network's :class:`~pyomo_models.build.network.PTDFCache`. The
+injections are the generation, less the demand and the flows of the branches
+outside the KVL set. Where the branches in service
+split the network into islands, each island takes its own reference bus, and
+``PTDF_island_balance`` balances the injections of each island other than that
+of the slack bus (indexed by the island's reference bus).
+"""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any, Iterable
+
+import numpy as np
+import scipy.sparse as sp
+from pyomo.core.expr.numeric_expr import LinearExpression
+
+from .build_functions import _name_to_str, add_constraints_to_instance, build_constraints
+from .names import ComponentName
+from .network import NetworkMatrices
+
+
+def _row_expressions(matrix: sp.csr_matrix, variables: list[Any], index: list[Any]) -> dict[Any, LinearExpression]:
+    """Return ``{index[i]: A[i, :] @ variables}`` for every row of ``matrix``."""
+
+    matrix = matrix.tocsr()
+    matrix.sum_duplicates()
+    matrix.eliminate_zeros()
+    indptr, indices, data = matrix.indptr, matrix.indices, matrix.data.tolist()
+    return {
+        idx: LinearExpression(
+            constant=0,
+            linear_coefs=data[indptr[i]:indptr[i + 1]],
+            linear_vars=[variables[j] for j in indices[indptr[i]:indptr[i + 1]]],
+        )
+        for i, idx in enumerate(index)
+    }
+
+
+def _vars(component: Any, index: Iterable[Any]) -> list[Any]:
+    return [component[i] for i in index]
+
+
+def _kcl(instance: Any, network: NetworkMatrices) -> dict[Any, LinearExpression]:
+    #gen - line/transformer outflow + inflow - demand == 0
+    matrix = sp.hstack([
+        network.generator_incidence(),
+        -network.line_incidence(),
+        -network.transformer_incidence(),
+        -network.demand_incidence(),
+    ])
+    variables = (_vars(instance.pG, network.generators) + _vars(instance.pL, network.lines)
+                 + _vars(instance.pLT, network.transformers) + _vars(instance.pD, network.demands))
+    return _row_expressions(matrix, variables, network.busses)
+
+
+def _volts(branch_delta: Any, branches: list[Any], incidence: sp.csr_matrix, instance: Any, network: NetworkMatrices):
+    #deltaL - (delta_from - delta_to) == 0
+    matrix = sp.hstack([sp.identity(len(branches), format="csr"), -incidence.T])
+    variables = _vars(branch_delta, branches) + _vars(instance.delta, network.busses)
+    return _row_expressions(matrix, variables, branches)
+
+
+def _kvl(instance: Any, network: NetworkMatrices, flow: Any, branch_delta: Any, branches: list[Any],
+         reactance: np.ndarray, active: Any, incidence: sp.csr_matrix):
+    #pL - (1/x) * deltaL == 0, for branches in the active (nonzero rating) set only
+    mask = np.fromiter((b in active for b in branches), dtype=bool, count=len(branches))
+    rows = [b for b, m in zip(branches, mask) if m]
+    n = len(rows)
+    if branch_delta.local_name in getattr(getattr(instance, "presolve", None), "substituted", {}):
+        #deltaL presolved out: pL - (1/x) * (delta_from - delta_to) == 0
+        matrix = sp.hstack([sp.identity(n, format="csr"), -sp.diags(1 / reactance[mask]) @ incidence.T.tocsr()[mask]])
+        variables = _vars(flow, rows) + _vars(instance.delta, network.busses)
+    else:
+        matrix = sp.hstack([sp.identity(n, format="csr"), sp.diags(-1 / reactance[mask])])
+        variables = _vars(flow, rows) + _vars(branch_delta, rows)
+    return _row_expressions(matrix, variables, rows)
+
+
+def _branch_masks(instance: Any, network: NetworkMatrices) -> tuple[np.ndarray, np.ndarray]:
+    """Masks of the lines and transformers in service (with a nonzero rating)."""
+
+    line_mask = np.fromiter((l in instance.L_nonzero for l in network.lines), dtype=bool, count=len(network.lines))
+    transformer_mask = np.fromiter((t in instance.TRANSF_nonzero for t in network.transformers), dtype=bool,
+                                   count=len(network.transformers))
+    return line_mask, transformer_mask
+
+
+def _slack(instance: Any, network: NetworkMatrices) -> int:
+    return network.busses.index(next(iter(instance.b0)))
+
+
+def _references(instance: Any, network: NetworkMatrices) -> dict[Any, LinearExpression]:
+    #delta == 0 at the reference bus of each island of the branches in service
+    line_mask, transformer_mask = _branch_masks(instance, network)
+    references = np.unique(network.references(_slack(instance, network), line_mask, transformer_mask))
+    matrix = sp.identity(network.n_bus, format="csr")[references]
+    return _row_expressions(matrix, _vars(instance.delta, network.busses), [network.busses[r] for r in references])
+
+
+def _injections(instance: Any, network: NetworkMatrices, line_mask: np.ndarray,
+                transformer_mask: np.ndarray) -> tuple[sp.csr_matrix, list[Any]]:
+    """Bus x variable matrix of the nodal injections: generation, less demand and the flows of the branches out of
+    the KVL set (which, as in the angle formulation, are only limited by their ratings)."""
+
+    matrix = sp.hstack([network.generator_incidence(),
+                        -network.demand_incidence(),
+                        -network.line_incidence()[:, ~line_mask],
+                        -network.transformer_incidence()[:, ~transformer_mask]]).tocsr()
+    variables = (_vars(instance.pG, network.generators) + _vars(instance.pD, network.demands)
+                 + _vars(instance.pL, [l for l, m in zip(network.lines, line_mask) if not m])
+                 + _vars(instance.pLT, [t for t, m in zip(network.transformers, transformer_mask) if not m]))
+    return matrix, variables
+
+
+def _ptdf_flows(instance: Any, network: NetworkMatrices, transformers: bool) -> dict[Any, LinearExpression]:
+    #pL - PTDF @ injections == 0, for branches in the KVL (nonzero rating) set only
+    line_mask, transformer_mask = _branch_masks(instance, network)
+    sensitivities = network.sensitivities(_slack(instance, network), line_mask, transformer_mask)
+    ptdf_lines, ptdf_transformers = sensitivities.ptdf_lines, sensitivities.ptdf_transformers
+    if transformers:
+        flow, branches, mask, ptdf = instance.pLT, network.transformers, transformer_mask, ptdf_transformers
+    else:
+        flow, branches, mask, ptdf = instance.pL, network.lines, line_mask, ptdf_lines
+
+    rows = [b for b, m in zip(branches, mask) if m]
+    injections, variables = _injections(instance, network, line_mask, transformer_mask)
+    #PTDF @ injections, computed as (injections.T @ PTDF.T).T to keep the sparse matrix on the left
+    flows = (injections.T @ ptdf[mask].T).T
+    matrix = sp.hstack([sp.identity(len(rows), format="csr"), sp.csr_matrix(-flows)])
+    return _row_expressions(matrix, _vars(flow, rows) + variables, rows)
+
+
+def _island_balance(instance: Any, network: NetworkMatrices) -> dict[Any, LinearExpression]:
+    #injections == 0 within each island other than the slack bus's, for islands with injections
+    line_mask, transformer_mask = _branch_masks(instance, network)
+    slack = _slack(instance, network)
+    references = network.sensitivities(slack, line_mask, transformer_mask).references
+    islands = [r for r in np.unique(references) if r != slack]
+    island_rows = {r: i for i, r in enumerate(islands)}
+    bus_rows = np.array([island_rows.get(r, -1) for r in references])
+    busses = np.flatnonzero(bus_rows >= 0)
+    membership = sp.csr_matrix((np.ones(len(busses)), (bus_rows[busses], busses)), shape=(len(islands), network.n_bus))
+
+    injections, variables = _injections(instance, network, line_mask, transformer_mask)
+    expressions = _row_expressions(membership @ injections, variables, [network.busses[r] for r in islands])
+    return {bus: expression for bus, expression in expressions.items() if expression.nargs() > 0}
+
+
+def ptdf_branch_flows(instance: Any) -> tuple[np.ndarray, np.ndarray]:
+    """Line and transformer flows given by the PTDF of the branches in the KVL set for the injections of the solution
+    loaded into ``instance`` (including branches whose PTDF rows are deactivated). Branches outside the KVL set
+    take the values of their flow variables."""
+
+    network = instance.network_matrices
+    line_mask, transformer_mask = _branch_masks(instance, network)
+    sensitivities = network.sensitivities(_slack(instance, network), line_mask, transformer_mask)
+    injections, variables = _injections(instance, network, line_mask, transformer_mask)
+    nodal = injections @ np.array([v.value for v in variables], dtype=float)
+
+    line_flows = np.where(line_mask, sensitivities.ptdf_lines @ nodal,
+                          np.array([instance.pL[l].value for l in network.lines], dtype=float))
+    transformer_flows = np.where(transformer_mask, sensitivities.ptdf_transformers @ nodal,
+                                 np.array([instance.pLT[t].value for t in network.transformers], dtype=float))
+    return line_flows, transformer_flows
+
+
+_MATRIX_BUILDERS = {
+    ComponentName.KCL_networked_realpower_noshunt: (
+        ComponentName.B, lambda instance, network: _kcl(instance, network)),
+    ComponentName.volts_line_delta: (
+        ComponentName.L, lambda instance, network: _volts(
+            instance.deltaL, network.lines, network.line_incidence(), instance, network)),
+    ComponentName.volts_transformer_delta: (
+        ComponentName.TRANSF, lambda instance, network: _volts(
+            instance.deltaLT, network.transformers, network.transformer_incidence(), instance, network)),
+    ComponentName.KVL_DCOPF_lines: (
+        ComponentName.L_nonzero, lambda instance, network: _kvl(
+            instance, network, instance.pL, instance.deltaL, network.lines, network.line_reactance, instance.L_nonzero,
+            network.line_incidence())),
+    ComponentName.KVL_DCOPF_transformer: (
+        ComponentName.TRANSF_nonzero, lambda instance, network: _kvl(
+            instance, network, instance.pLT, instance.deltaLT, network.transformers, network.transformer_reactance,
+            instance.TRANSF_nonzero, network.transformer_incidence())),
+    #Indexed by the reference busses of the islands (None: the index is that of the rows built)
+    ComponentName.volts_reference_bus: (
+        None, lambda instance, network: _references(instance, network)),
+    ComponentName.PTDF_lines: (
+        ComponentName.L_nonzero, lambda instance, network: _ptdf_flows(instance, network, transformers=False)),
+    ComponentName.PTDF_transformer: (
+        ComponentName.TRANSF_nonzero, lambda instance, network: _ptdf_flows(instance, network, transformers=True)),
+    #Indexed by the reference busses of the islands it balances (None: the index is that of the rows built)
+    ComponentName.PTDF_island_balance: (
+        None, lambda instance, network: _island_balance(instance, network)),
+}
+
+MATRIX_CONSTRAINTS = frozenset(_MATRIX_BUILDERS)
+
+
+def build_matrix_constraints(instance: Any, network: NetworkMatrices, constraintlist: Iterable[Any]) -> Any:
+    """Populate ``instance`` with the listed network constraints, built from ``network`` matrices."""
+
+    constraint_defs = []
+    for name in constraintlist:
+        if name not in _MATRIX_BUILDERS:
+            raise KeyError(f"{_name_to_str(name)} has no matrix definition. Supported constraints: {sorted(MATRIX_CONSTRAINTS)}")
+        index, builder = _MATRIX_BUILDERS[name]
+        rows = builder(instance, network)
+        index = list(rows) if index is None else index
+        constraint_defs.append(SimpleNamespace(name=name, index=index, rule=lambda instance, i, rows=rows: rows[i] == 0))
+    add_constraints_to_instance(instance, constraint_defs)
+    return instance
+
+
+def build_network_constraints(instance: Any, constraintlist: Iterable[Any]) -> Any:
+    """Build constraints from ``instance.network_matrices`` where a matrix definition exists.
+
+    Instances without network matrices, and constraints without a matrix
+    definition, are built from the ``Constraint_Blocks`` rules as usual.
+    """
+
+    network = getattr(instance, "network_matrices", None)
+    constraintlist = list(constraintlist)
+    if network is None:
+        return build_constraints(instance, constraintlist)
+
+    build_matrix_constraints(instance, network, [c for c in constraintlist if c in MATRIX_CONSTRAINTS])
+    build_constraints(instance, [c for c in constraintlist if c not in MATRIX_CONSTRAINTS])
+    return instance
@@ -0,0 +1,322 @@
+"""Closed-form merit-order engine for the copper-plate market stage.
+
+The market stage (``KCL_copperplate``, the demand constraints and
+``gen_uc_min``/``gen_uc_max`` under ``copper_plate_marginal_cost_objective``)
+is a single-node economic dispatch with unit commitment: each generator is
+off (``pG = 0``) or between ``PGmin`` and ``PGmax``, and each demand is served
+at a fraction ``alpha`` of ``PD`` at a cost of ``VOLL`` per unit shed. With a
+:class:`MeritOrderMarket`, the stage is solved without the MIP:
+
+* LP bound: with ``u_g`` relaxed to [0, 1], the cost of each generator is a
+  convex piecewise linear function of its output (the commitment cost spread
+  over its range), so the relaxation is solved exactly by stacking the
+  pieces of every generator and demand in merit order.
+* commitment heuristics: commitments rounded from the relaxation (and the
+  commitment of the previous timestep) are dispatched in merit order and
+  improved by switching single generators on or off while that lowers the
+  cost. All candidate commitments are dispatched at once, as rows of arrays
+  sharing one merit order.
+* certification: the best commitment is kept if it is within ``tolerance``
+  (relative, as HiGHS' ``mip_rel_gap``) of the LP bound. Otherwise, or if the
+  stage holds constraints other than those above, the stage falls back to the
+  MIP.
+
+The costs are read from the objective of the stage, so that its symmetry
+breaking perturbation of ``c_1`` is that of the MIP. The path taken by each
+timestep is recorded:
+
+* ``merit_order``: the merit-order solution was certified and kept
+* ``mip_gap``: the best commitment was outside the tolerance of the LP bound
+* ``mip_infeasible``: no commitment could meet the demand
+* ``mip_unsupported``: the stage holds constraints or variables the engine does not model
+
+Example::
+
+    market = MeritOrderMarket(tolerance = 1e-4)
+    output, result = all_island_iterations.model(case, solver, market = market)
+    market.to_dataframe()
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import Constraint, Objective, minimize
+from pyomo.opt import SolverResults, SolverStatus, TerminationCondition
+from pyomo.repn import generate_standard_repn
+
+#Constraints of the market stage the engine models
+MARKET_CONSTRAINTS = ("KCL_copperplate", "demand_real_alpha_controlled", "demand_alpha_max", "demand_alpha_fixneg",
+                      "gen_uc_max", "gen_uc_min")
+
+#Absolute tolerance (per unit) of the power balance
+_BALANCE_TOLERANCE = 1e-9
+
+
+@dataclass(slots=True)
+class MeritOrderRecord:
+    iteration: Any
+    path: str
+    objective: Optional[float]
+    lp_bound: Optional[float]
+    heuristic_objective: Optional[float]
+    candidates: int
+    solve_time_s: float
+
+
+def dispatch(lower: np.ndarray, upper: np.ndarray, order: np.ndarray, total: float = 0.0) -> np.ndarray:
+    """Least cost values within [lower, upper] summing to total, filling in order (the merit order, cheapest
+    first). lower and upper may hold one row per candidate; rows that cannot sum to total are NaN."""
+
+    lower, upper = np.atleast_2d(lower), np.atleast_2d(upper)
+    residual = total - lower.sum(axis=1, keepdims=True)
+    length = (upper - lower)[:, order]
+    filled = np.clip(residual - (np.cumsum(length, axis=1) - length), 0, length)
+    values = lower.copy()
+    values[:, order] += filled
+    feasible = (residual[:, 0] >= -_BALANCE_TOLERANCE) & (residual[:, 0] <= length.sum(axis=1) + _BALANCE_TOLERANCE)
+    values[~feasible] = np.nan
+    return values
+
+
+def commitment_range(p: np.ndarray, PGmin: np.ndarray, PGmax: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Range of u in [0, 1] with u*PGmin <= p <= u*PGmax, for outputs p between min(0, PGmin) and max(0, PGmax)."""
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lower = np.maximum.reduce([np.zeros_like(p), np.where(PGmin < 0, p/PGmin, 0), np.where(PGmax > 0, p/PGmax, 0)])
+        upper = np.minimum.reduce([np.ones_like(p), np.where(PGmin > 0, p/PGmin, 1), np.where(PGmax < 0, p/PGmax, 1)])
+    return lower, upper
+
+
+class _Stage:
+    """The data of a market stage: generator and demand bounds, and the linear costs of the objective."""
+
+    def __init__(self, instance: Any):
+        self.supported = self._read(instance)
+
+    def _read(self, instance: Any) -> bool:
+        active = {c.local_name for c in instance.component_objects(Constraint, active=True, descend_into=True)}
+        if not active <= set(MARKET_CONSTRAINTS) or not {"KCL_copperplate", "gen_uc_max", "gen_uc_min"} <= active:
+            return False
+        self.generators, self.demands = list(instance.G), list(instance.D)
+        if any(len(getattr(instance, c)) != len(self.generators) or not all(r.active for r in getattr(instance, c).values())
+               for c in ("gen_uc_max", "gen_uc_min")):
+            return False
+        if any(instance.pG[g].fixed or instance.u_g[g].fixed or instance.pG[g].lb is not None or instance.pG[g].ub is not None
+               for g in self.generators) or any(instance.alpha[d].fixed for d in self.demands):
+            return False
+
+        self.PGmin = np.array([instance.PGmin[g].value for g in self.generators], dtype=float)
+        self.PGmax = np.array([instance.PGmax[g].value for g in self.generators], dtype=float)
+        self.PD = np.array([instance.PD[d].value for d in self.demands], dtype=float)
+        if np.any(self.PGmin > self.PGmax):
+            return False
+
+        #alpha is between its bounds, below 1 where demand_alpha_max holds and at 1 where demand_alpha_fixneg holds
+        rows = {c: {i for i, r in getattr(instance, c).items() if r.active} if c in active else set()
+                for c in ("demand_alpha_max", "demand_alpha_fixneg")}
+        self.alpha_lower = np.array([max(instance.alpha[d].lb or 0, 1 if d in rows["demand_alpha_fixneg"] else 0)
+                                     for d in self.demands], dtype=float)
+        self.alpha_upper = np.array([min(np.inf if instance.alpha[d].ub is None else instance.alpha[d].ub,
+                                         1 if d in rows["demand_alpha_max"] | rows["demand_alpha_fixneg"] else np.inf)
+                                     for d in self.demands], dtype=float)
+        if np.any(~np.isfinite(self.alpha_upper) & (self.PD != 0)) or "demand_real_alpha_controlled" not in active:
+            return False
+
+        #Linear costs of pG, u_g and alpha in the objective
+        objective = next(instance.component_data_objects(Objective, active=True))
+        repn = generate_standard_repn(objective.expr, compute_values=True)
+        if not repn.is_linear():
+            return False
+        position = {"pG": {g: i for i, g in enumerate(self.generators)}, "u_g": {g: i for i, g in enumerate(self.generators)},
+                    "alpha": {d: i for i, d in enumerate(self.demands)}}
+        self.cost = {"pG": np.zeros(len(self.generators)), "u_g": np.zeros(len(self.generators)),
+                     "alpha": np.zeros(len(self.demands))}
+        for v, c in zip(repn.linear_vars, repn.linear_coefs):
+            name = v.parent_component().local_name
+            if name not in position:
+                return False
+            self.cost[name][position[name][v.index()]] += c
+        self.constant = float(repn.constant)
+        if objective.sense != minimize:
+            return False
+
+        #Generators that can be on at no output, at no cost
+        self.free = (self.cost["u_g"] <= 0) & (self.PGmin <= 0) & (self.PGmax >= 0)
+
+        #Demand as negative supply y = -alpha*PD, at the cost of alpha per unit of y
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ends = -np.stack([self.alpha_lower, self.alpha_upper])*self.PD
+            self.y_lower, self.y_upper = np.nan_to_num(ends.min(axis=0)), np.nan_to_num(ends.max(axis=0))
+            self.y_price = np.where(self.PD != 0, -self.cost["alpha"]/self.PD, 0)
+        return True
+
+    def objective(self, u: np.ndarray, p: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Objective of solutions (rows of u, p and y), inf where infeasible (NaN)."""
+
+        objective = self.constant + p @ self.cost["pG"] + u @ self.cost["u_g"] + self.alpha_of(y) @ self.cost["alpha"]
+        return np.where(np.isnan(objective), np.inf, objective)
+
+    def alpha_of(self, y: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(self.PD != 0, -y/self.PD, np.clip(1, self.alpha_lower, self.alpha_upper))
+
+    def relaxation(self) -> tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+        """LP bound of the stage (u_g in [0, 1]), with the outputs, commitments and negative demands solving it."""
+
+        PGmin, PGmax, c_pG, c_u = self.PGmin, self.PGmax, self.cost["pG"], self.cost["u_g"]
+        #Breakpoints of the cost of each generator over its range, and the cost at each
+        points = np.sort(np.stack([np.minimum(PGmin, 0), np.zeros_like(PGmin), PGmin, PGmax, np.maximum(PGmax, 0)],
+                                  axis=1), axis=1)
+        low, high = commitment_range(points, PGmin[:, None], PGmax[:, None])
+        cost = c_pG[:, None]*points + c_u[:, None]*np.where(c_u[:, None] >= 0, low, high)
+        length = np.diff(points, axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slope = np.where(length > 0, np.diff(cost, axis=1)/length, 0)
+
+        n = len(self.generators)
+        lower = np.concatenate([np.zeros(length.size), self.y_lower])
+        upper = np.concatenate([length.ravel(), self.y_upper])
+        price = np.concatenate([slope.ravel(), self.y_price])
+        values = dispatch(lower, upper, np.argsort(price, kind="stable"), -points[:, 0].sum())[0]
+        if np.isnan(values).any():
+            return np.nan, None, None, None
+        p = points[:, 0] + values[:length.size].reshape(n, -1).sum(axis=1)
+        y = values[length.size:]
+        bound = self.constant + cost[:, 0].sum() + values[:length.size] @ price[:length.size] \
+                + self.alpha_of(y) @ self.cost["alpha"]
+        low, high = commitment_range(p, PGmin, PGmax)
+        return float(bound), p, np.where(c_u >= 0, low, high), y
+
+    def dispatch(self, commitments: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Merit-order dispatch of each commitment (rows), with the objective of each (inf where infeasible)."""
+
+        n = len(self.generators)
+        commitments = np.atleast_2d(commitments).astype(float)
+        lower = np.concatenate([commitments*self.PGmin,
+                                np.broadcast_to(self.y_lower, (len(commitments), len(self.demands)))], axis=1)
+        upper = np.concatenate([commitments*self.PGmax,
+                                np.broadcast_to(self.y_upper, (len(commitments), len(self.demands)))], axis=1)
+        price = np.concatenate([self.cost["pG"], self.y_price])
+        values = dispatch(lower, upper, np.argsort(price, kind="stable"))
+        p, y = values[:, :n], values[:, n:]
+        return p, y, self.objective(commitments, p, y)
+
+
+class MeritOrderMarket:
+    """Solves the copper-plate market stage in merit order, certified against its LP bound (see the module
+    docstring), falling back to the MIP.
+
+    ``max_passes`` limits the passes of single generator switches that improve
+    a commitment. The commitment of each timestep is a candidate for the
+    next, so one instance should be used per run of a case.
+    """
+
+    def __init__(self, tolerance: float = 1e-4, max_passes: int = 50):
+        self.tolerance = tolerance
+        self.max_passes = max_passes
+        self.commitment: Optional[dict] = None
+        self.records: list[MeritOrderRecord] = []
+
+    def solve(self, instance: Any, iteration: Any, solve_mip: Callable[[], Any]):
+        """Solves the (activated) market stage of an instance, using solve_mip() to solve the MIP, and returns
+        its results."""
+
+        start = time.perf_counter()
+        stage = _Stage(instance)
+        bound = heuristic = None
+        candidates = 0
+        if not stage.supported:
+            path = "mip_unsupported"
+        else:
+            bound, p, u, y = stage.relaxation()
+            if p is None:
+                path = "mip_infeasible"
+            else:
+                commitments = self._candidates(stage, u)
+                candidates = len(commitments)
+                best_u, best_p, best_y, heuristic = self._improve(stage, commitments)
+                if not np.isfinite(heuristic):
+                    path, heuristic = "mip_infeasible", None
+                elif (heuristic - bound)/max(abs(heuristic), 1.0) > self.tolerance:
+                    path = "mip_gap"
+                else:
+                    path = "merit_order"
+
+        if path == "merit_order":
+            self._load(instance, stage, best_u, best_p, best_y)
+            result = _solver_results(heuristic, bound, time.perf_counter() - start)
+        else:
+            result = solve_mip()
+        self.commitment = {g: round(instance.u_g[g].value) for g in instance.G if instance.u_g[g].value is not None}
+        objective = float(next(instance.component_data_objects(Objective, active=True))())
+        self.records.append(MeritOrderRecord(iteration, path, objective, bound, heuristic, candidates,
+                                             time.perf_counter() - start))
+        return result
+
+    def _candidates(self, stage: _Stage, u: np.ndarray) -> np.ndarray:
+        """Commitments rounded from the relaxation, and that of the previous timestep."""
+
+        candidates = [u > 1e-9, u >= 0.5, u >= 1 - 1e-9]
+        if self.commitment is not None:
+            candidates.append(np.array([self.commitment.get(g, 0) == 1 for g in stage.generators]))
+        return np.unique(np.array(candidates) | stage.free, axis=0)
+
+    def _improve(self, stage: _Stage, commitments: np.ndarray):
+        """The best of the commitments after switching single generators while that lowers its cost."""
+
+        p, y, objective = stage.dispatch(commitments)
+        best = int(np.argmin(objective))
+        u, p, y, cost = commitments[best].copy(), p[best], y[best], objective[best]
+        #Generators that can be on at no output and no cost are left on
+        switchable = np.flatnonzero(~stage.free)
+        for _ in range(self.max_passes):
+            if not len(switchable):
+                break
+            flips = np.repeat(u[None, :], len(switchable), axis=0)
+            flips[np.arange(len(switchable)), switchable] ^= True
+            flip_p, flip_y, flip_objective = stage.dispatch(flips)
+            k = int(np.argmin(flip_objective))
+            if not flip_objective[k] < (cost - 1e-9*max(abs(cost), 1.0) if np.isfinite(cost) else np.inf):
+                break
+            u, p, y, cost = flips[k], flip_p[k], flip_y[k], flip_objective[k]
+
+        #Generators left on at no output and no lower commitment cost are switched off
+        idle = u & (p == 0) & (stage.cost["u_g"] >= 0)
+        if idle.any():
+            u = u & ~idle
+            cost = stage.objective(u.astype(float), p, y)
+        return u, p, y, float(cost)
+
+    @staticmethod
+    def _load(instance: Any, stage: _Stage, u: np.ndarray, p: np.ndarray, y: np.ndarray) -> None:
+        """Sets pG, u_g, alpha and pD of the instance to a solution."""
+
+        alpha = stage.alpha_of(y)
+        for g, ug, pg in zip(stage.generators, u, p):
+            instance.u_g[g].set_value(int(ug), skip_validation=True)
+            instance.pG[g].set_value(float(pg), skip_validation=True)
+        for d, a, PD in zip(stage.demands, alpha, stage.PD):
+            instance.alpha[d].set_value(float(a), skip_validation=True)
+            instance.pD[d].set_value(float(a*PD), skip_validation=True)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in solve order."""
+
+        columns = list(MeritOrderRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
+
+
+def _solver_results(objective: float, lower_bound: float, wallclock_time: float) -> SolverResults:
+    result = SolverResults()
+    result.solver.name = "merit_order"
+    result.solver.status = SolverStatus.ok
+    result.solver.termination_condition = TerminationCondition.optimal
+    result.solver.wallclock_time = wallclock_time
+    result.problem.upper_bound = objective
+    result.problem.lower_bound = lower_bound
+    return result
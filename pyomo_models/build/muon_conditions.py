@@ -0,0 +1,102 @@
+"""Per-timestep conditions of the MUON constraints, evaluated for the whole horizon at once.
+
+Some MUON constraints depend on a demand condition: ``S_NBMIN_DUB_L1`` and
+``S_NBMIN_DUB_L2`` on the demand of ``D_ROI``, and the demand switch of the
+``S_NBMIN_CPS`` Big-M constraint on the demand of ``D_NI``. A
+:class:`DemandCondition` holds the set of demands and the limit their total
+must reach. It can be called on an instance, as the condition callables of
+the MUON definitions are, and it can be evaluated on a timesteps x demands
+array.
+
+:meth:`ConditionFlags.from_case` builds the per-unit demand of every
+iteration from ``case.ts_PD``. It applies the carry over of the instance:
+values missing from an iteration's ts data keep those of the previous
+iteration, or the static demand before the first. Every condition is then
+evaluated at once, through a demands x sets membership mask, into an
+iterations x conditions boolean array. The solve loop looks up the row of
+each iteration rather than summing ``PD`` over the sets, and
+:meth:`ConditionFlags.groups` gives the iterations that share the same
+conditions, and so the same constraints:
+
+    flags = ConditionFlags.from_case(case, conditions, zone_sets(case))
+    flags.row("t-1")
+    flags.groups()
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+import numpy as np
+import pandas as pd
+
+from .build_functions import param_data
+from .names import ComponentName
+
+
+class DemandCondition:
+    """Condition that the total per-unit demand ``PD`` over the set of demands named demands is at least limit."""
+
+    def __init__(self, demands: str, limit: float):
+        self.demands = demands
+        self.limit = limit
+
+    def __call__(self, instance: Any) -> bool:
+        return sum(instance.PD[d].value for d in getattr(instance, self.demands)) >= self.limit
+
+    def __repr__(self) -> str:
+        return f"DemandCondition({self.demands!r}, {self.limit!r})"
+
+
+def iteration_demand(case: Any) -> pd.DataFrame:
+    """Per-unit PD of every iteration of the case (iterations x demands), as it is held by the instance."""
+
+    static = param_data(case, [ComponentName.PD])[ComponentName.PD.value]
+    demand = (case.ts_PD/case.baseMVA).round(6).ffill().reindex(case.iterations).ffill()
+    demand = demand.reindex(columns=list(static))
+    return demand.fillna(pd.Series(static, dtype=float))
+
+
+@dataclass(slots=True)
+class ConditionFlags:
+    """Whether each condition is met (flags, iterations x conditions) in each iteration."""
+
+    iterations: list
+    names: list
+    flags: np.ndarray
+    position: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.position = {iteration: t for t, iteration in enumerate(self.iterations)}
+
+    @classmethod
+    def from_case(cls, case: Any, conditions: Mapping[str, DemandCondition],
+                  sets: Mapping[str, list]) -> "ConditionFlags":
+        """Evaluates conditions, {name: DemandCondition}, on the demand of each iteration of the case, with the
+        members of each set of demands given in sets, {set name: demands}."""
+
+        demand = iteration_demand(case)
+        names = list(conditions)
+        mask = np.array([demand.columns.isin(sets[conditions[n].demands]) for n in names], dtype=float)
+        mask = mask.reshape(len(names), len(demand.columns))
+        limits = np.array([conditions[n].limit for n in names], dtype=float)
+        totals = demand.to_numpy(dtype=float) @ mask.T
+        return cls(list(demand.index), names, totals >= limits)
+
+    def row(self, iteration: Any) -> dict[str, bool]:
+        """The flags of an iteration, {condition name: met}."""
+
+        return dict(zip(self.names, self.flags[self.position[iteration]].tolist()))
+
+    def groups(self) -> pd.Series:
+        """The group of each iteration, numbering the distinct combinations of flags in order of appearance."""
+
+        _, first, inverse = np.unique(self.flags, axis=0, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first))
+        return pd.Series(order[inverse.reshape(-1)], index=self.iterations, name="group")
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the flags as a DataFrame, with a row per iteration and a column per condition."""
+
+        return pd.DataFrame(self.flags, index=pd.Index(self.iterations, name="iteration"), columns=self.names)
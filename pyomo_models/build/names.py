@@ -68,6 +68,7 @@ class ComponentName(StrEnum):
     PGMINGEN = "PGMINGEN"
     PG_MARKET = "PG_MARKET"
     SNSP_curtailment = "SNSP_curtailment"
+    M_prorata_xi = "M_prorata_xi"
     c_0 = "c_0"
     c_1 = "c_1"
     c_bid = "c_bid"
@@ -110,6 +111,9 @@ class ComponentName(StrEnum):
     KCL_copperplate = "KCL_copperplate"
     KVL_DCOPF_lines = "KVL_DCOPF_lines"
     KVL_DCOPF_transformer = "KVL_DCOPF_transformer"
+    PTDF_lines = "PTDF_lines"
+    PTDF_transformer = "PTDF_transformer"
+    PTDF_island_balance = "PTDF_island_balance"
     transf_continuous_real_max_pstve = "transf_continuous_real_max_pstve"
     transf_continuous_real_max_ngtve = "transf_continuous_real_max_ngtve"
     volts_line_delta = "volts_line_delta"
@@ -0,0 +1,380 @@
+"""Sparse matrix description of the network topology.
+
+The DCOPF constraints are defined per bus and per branch in
+:mod:`pyomo_models.build.definitions`. :class:`NetworkMatrices` holds the same
+topology as integer index arrays, from which incidence matrices of busses
+against lines, transformers, generators and demands are built with
+``scipy.sparse``, along with the power transfer distribution factors (PTDF)
+of the branches. Index orders follow the corresponding model sets.
+
+The branches in service change between timesteps (a zero ``ts_Lmax`` or
+``ts_TLmax`` takes a branch out of ``L_nonzero`` or ``TRANSF_nonzero``), but
+the distinct outage patterns are few. :class:`PTDFCache` keeps the PTDF and
+island references of each pattern seen, keyed by the mask of the branches in
+service. A pattern with a few more branches out than a cached one (and the
+same islands) is derived from it by a line outage distribution factor (LODF)
+update rather than a new factorisation.
+
+A branch out of service may island part of the network. ``islands`` and
+``references`` find the islands of one pattern with a sparse connected
+components pass; ``topology`` does so once per distinct pattern over all
+timesteps, and ``island_report`` summarises the islands of each timestep of
+a case.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+
+import time
+
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.csgraph as csgraph
+import pandas as pd
+import scipy.sparse.linalg as spla
+from pyomo.environ import value
+
+import data_io.helpers as helpers
+
+#PTDF entries smaller than this are round-off from the factorisation, and are set to zero
+PTDF_TOLERANCE = 1e-10
+
+#Most branch outages from a cached pattern derived by an LODF update rather than a new factorisation
+LODF_MAX_OUTAGES = 10
+
+
+@dataclass
+class NetworkMatrices:
+    busses: list
+    lines: list
+    transformers: list
+    generators: list
+    demands: list
+    line_from: np.ndarray
+    line_to: np.ndarray
+    line_reactance: np.ndarray
+    transformer_from: np.ndarray
+    transformer_to: np.ndarray
+    transformer_reactance: np.ndarray
+    generator_bus: np.ndarray
+    demand_bus: np.ndarray
+    ptdf_cache: Optional["PTDFCache"] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def _from_lists(cls, busses, lines, line_pairs, line_x, transformers, transformer_pairs, transformer_x,
+                    generators, generator_busses, demands, demand_busses) -> "NetworkMatrices":
+        bus_index = {b: i for i, b in enumerate(busses)}
+
+        def _idx(names):
+            return np.fromiter((bus_index[n] for n in names), dtype=np.int64, count=len(names))
+
+        return cls(
+            busses=list(busses),
+            lines=list(lines),
+            transformers=list(transformers),
+            generators=list(generators),
+            demands=list(demands),
+            line_from=_idx([p[0] for p in line_pairs]),
+            line_to=_idx([p[1] for p in line_pairs]),
+            line_reactance=np.asarray(line_x, dtype=float),
+            transformer_from=_idx([p[0] for p in transformer_pairs]),
+            transformer_to=_idx([p[1] for p in transformer_pairs]),
+            transformer_reactance=np.asarray(transformer_x, dtype=float),
+            generator_bus=_idx(generator_busses),
+            demand_bus=_idx(demand_busses),
+        )
+
+    @classmethod
+    def from_case(cls, case: Any) -> "NetworkMatrices":
+        """Build the topology from case data, using the same filters as ``Sets_Blocks``."""
+
+        busses = helpers.get_param_list(case, "busses", "name", "type", "!=", 0)
+        line_pairs = helpers.get_zipped_param_list(case, "branches", "name", ["from_busname", "to_busname"])
+        transformer_pairs = helpers.get_zipped_param_list(case, "transformers", "name", ["from_busname", "to_busname"])
+        line_x = helpers.get_param_dict(case, "branches", "name", "x")
+        transformer_x = helpers.get_param_dict(case, "transformers", "name", "x")
+        generator_busses = helpers.get_param_dict(case, "generators", "name", "busname")
+        demand_busses = helpers.get_param_dict(case, "demands", "name", "busname")
+
+        lines = list(line_pairs)
+        transformers = list(transformer_pairs)
+        generators = list(generator_busses)
+        demands = list(demand_busses)
+        return cls._from_lists(
+            busses,
+            lines, [line_pairs[l] for l in lines], [line_x[l] for l in lines],
+            transformers, [transformer_pairs[t] for t in transformers], [transformer_x[t] for t in transformers],
+            generators, [generator_busses[g] for g in generators],
+            demands, [demand_busses[d] for d in demands],
+        )
+
+    @classmethod
+    def from_instance(cls, instance: Any) -> "NetworkMatrices":
+        """Build the topology from the sets and reactance parameters of a model instance."""
+
+        lines = list(instance.L)
+        transformers = list(instance.TRANSF)
+        generator_busses = {g: b for b in instance.B for g in instance.generator_mapping[b]}
+        demand_busses = {d: b for b in instance.B for d in instance.demand_bus_mapping[b]}
+        generators = [g for g in instance.G if g in generator_busses]
+        demands = [d for d in instance.D if d in demand_busses]
+        return cls._from_lists(
+            list(instance.B),
+            lines, [tuple(instance.line_busses[l]) for l in lines], [value(instance.line_reactance[l]) for l in lines],
+            transformers, [tuple(instance.transformer_busses[t]) for t in transformers],
+            [value(instance.transformer_reactance[t]) for t in transformers],
+            generators, [generator_busses[g] for g in generators],
+            demands, [demand_busses[d] for d in demands],
+        )
+
+    @property
+    def n_bus(self) -> int:
+        return len(self.busses)
+
+    def _incidence(self, from_idx: np.ndarray, to_idx: np.ndarray) -> sp.csr_matrix:
+        n = len(from_idx)
+        rows = np.concatenate([from_idx, to_idx])
+        cols = np.concatenate([np.arange(n), np.arange(n)])
+        vals = np.concatenate([np.ones(n), -np.ones(n)])
+        return sp.csr_matrix((vals, (rows, cols)), shape=(self.n_bus, n))
+
+    def line_incidence(self) -> sp.csr_matrix:
+        """Bus x line matrix with +1 at the from bus and -1 at the to bus of each line."""
+
+        return self._incidence(self.line_from, self.line_to)
+
+    def transformer_incidence(self) -> sp.csr_matrix:
+        """Bus x transformer matrix with +1 at the from bus and -1 at the to bus of each transformer."""
+
+        return self._incidence(self.transformer_from, self.transformer_to)
+
+    def generator_incidence(self) -> sp.csr_matrix:
+        """Bus x generator matrix mapping each generator to its bus."""
+
+        n = len(self.generator_bus)
+        return sp.csr_matrix((np.ones(n), (self.generator_bus, np.arange(n))), shape=(self.n_bus, n))
+
+    def demand_incidence(self) -> sp.csr_matrix:
+        """Bus x demand matrix mapping each demand to its bus."""
+
+        n = len(self.demand_bus)
+        return sp.csr_matrix((np.ones(n), (self.demand_bus, np.arange(n))), shape=(self.n_bus, n))
+
+    def islands(self, line_mask: Optional[np.ndarray] = None,
+                transformer_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Island (connected component) of each bus, over the branches in service selected by the masks."""
+
+        incidence = sp.hstack([self.line_incidence()[:, self._mask(line_mask, len(self.lines))],
+                               self.transformer_incidence()[:, self._mask(transformer_mask, len(self.transformers))]])
+        adjacency = abs(incidence) @ abs(incidence).T
+        return csgraph.connected_components(adjacency, directed=False)[1]
+
+    def references(self, slack: int, line_mask: Optional[np.ndarray] = None,
+                   transformer_mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Reference bus of each island: the ``slack`` bus for its own island, the first bus of each other island."""
+
+        islands = self.islands(line_mask, transformer_mask)
+        _, first = np.unique(islands, return_index=True)
+        references = first[islands]
+        references[islands == islands[slack]] = slack
+        return references
+
+    @staticmethod
+    def _mask(mask: Optional[np.ndarray], n: int) -> np.ndarray:
+        return np.ones(n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+    def ts_branch_masks(self, case: Any) -> tuple[list, np.ndarray, np.ndarray]:
+        """The iterations of a case, with (iterations x lines) and (iterations x transformers) masks of the branches
+        in service in each, i.e. with a rating above zero in ``ts_Lmax`` / ``ts_TLmax`` (as ``L_nonzero`` and
+        ``TRANSF_nonzero``)."""
+
+        iterations = list(case.iterations)
+        line_masks = case.ts_Lmax.reindex(index=iterations, columns=self.lines).to_numpy(dtype=float) > 0
+        transformer_masks = case.ts_TLmax.reindex(index=iterations, columns=self.transformers).to_numpy(dtype=float) > 0
+        return iterations, line_masks, transformer_masks
+
+    def topology(self, slack: int, line_masks: np.ndarray,
+                 transformer_masks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """The pattern of each row of (timesteps x branches) masks, and the reference bus of each bus in each
+        distinct pattern (patterns x busses, see ``references``), finding the islands once per pattern."""
+
+        masks = np.hstack([np.asarray(line_masks, dtype=bool), np.asarray(transformer_masks, dtype=bool)])
+        patterns, inverse = np.unique(masks, axis=0, return_inverse=True)
+        references = np.array([self.references(slack, p[:len(self.lines)], p[len(self.lines):]) for p in patterns],
+                              dtype=np.int64).reshape(len(patterns), self.n_bus)
+        return inverse.reshape(-1), references
+
+    def ptdf(self, slack: int, line_mask: Optional[np.ndarray] = None,
+             transformer_mask: Optional[np.ndarray] = None) -> tuple[np.ndarray, np.ndarray]:
+        """Line x bus and transformer x bus PTDF matrices, with bus index ``slack`` as the slack bus.
+
+        Only the branches selected by the masks (default: all) are in service;
+        the rows of the others are zero. Entry (l, b) is the flow on branch l,
+        from its from bus to its to bus, for a unit injection at bus b
+        withdrawn at the reference bus of its island (see ``references``).
+        """
+
+        line_mask = self._mask(line_mask, len(self.lines))
+        transformer_mask = self._mask(transformer_mask, len(self.transformers))
+        incidence = sp.hstack([self.line_incidence(), self.transformer_incidence()]).tocsc()
+        susceptance = np.concatenate([np.where(line_mask, 1 / self.line_reactance, 0),
+                                      np.where(transformer_mask, 1 / self.transformer_reactance, 0)])
+        weighted = incidence @ sp.diags(susceptance)
+
+        #Bus susceptance matrix without the reference bus of each island (block diagonal over the islands)
+        references = self.references(slack, line_mask, transformer_mask)
+        others = np.flatnonzero(references != np.arange(self.n_bus))
+        B = (weighted @ incidence.T).tocsc()[others][:, others]
+        sensitivity = spla.splu(B.tocsc()).solve(weighted.tocsr()[others].toarray()) if len(others) else 0
+
+        ptdf = np.zeros((incidence.shape[1], self.n_bus))
+        ptdf[:, others] = np.transpose(sensitivity)
+        ptdf[np.abs(ptdf) < PTDF_TOLERANCE] = 0
+        return ptdf[:len(self.lines)], ptdf[len(self.lines):]
+
+    def sensitivities(self, slack: int, line_mask: Optional[np.ndarray] = None,
+                      transformer_mask: Optional[np.ndarray] = None) -> "Sensitivities":
+        """The PTDF and island references for the branches in service, from this network's :class:`PTDFCache`."""
+
+        if self.ptdf_cache is None:
+            self.ptdf_cache = PTDFCache(self)
+        return self.ptdf_cache.get(slack, line_mask, transformer_mask)
+
+
+@dataclass(slots=True)
+class IslandRecord:
+    iteration: Any
+    pattern: int
+    islands: int
+    isolated_busses: int
+    unsupplied_islands: int
+    references: tuple
+
+
+def island_report(case: Any, network: Optional[NetworkMatrices] = None) -> pd.DataFrame:
+    """The islands of the branches in service in each iteration of a case: their number, the busses with no branch
+    in service, the islands with demand but no generators (which can only shed it), and the reference bus of each
+    island other than the slack bus's."""
+
+    network = network or NetworkMatrices.from_case(case)
+    slack = network.busses.index(helpers.get_param_list(case, "busses", "name", "type", "=", 3)[0])
+    iterations, line_masks, transformer_masks = network.ts_branch_masks(case)
+    pattern, references = network.topology(slack, line_masks, transformer_masks)
+
+    records = []
+    for i, bus_references in enumerate(references):
+        islands, sizes = np.unique(bus_references, return_counts=True)
+        supplied = np.isin(islands, bus_references[network.generator_bus])
+        demanded = np.isin(islands, bus_references[network.demand_bus])
+        records.append((len(islands), int((sizes == 1).sum()), int((demanded & ~supplied).sum()),
+                        tuple(network.busses[r] for r in islands if r != slack)))
+    rows = [IslandRecord(iteration, int(p), *records[p]) for iteration, p in zip(iterations, pattern)]
+    columns = list(IslandRecord.__dataclass_fields__)
+    return pd.DataFrame([asdict(r) for r in rows], columns=columns)
+
+
+@dataclass(slots=True)
+class Sensitivities:
+    ptdf_lines: np.ndarray
+    ptdf_transformers: np.ndarray
+    references: np.ndarray
+
+
+@dataclass(slots=True)
+class PTDFCacheRecord:
+    pattern: int
+    lines_out: int
+    transformers_out: int
+    method: str
+    outages: int
+    hits: int
+    compute_time_s: float
+
+
+class PTDFCache:
+    """PTDF and island references of a network, computed once per pattern of branches in service.
+
+    Patterns are keyed by the slack bus and the packed masks of the branches
+    in service. A new pattern that only takes out up to ``max_outages``
+    branches of a cached pattern, without splitting its islands, is derived
+    from it by an LODF update::
+
+        PTDF' = PTDF + PTDF @ A_o @ inv(I - PTDF_o @ A_o) @ PTDF_o
+
+    where ``A_o`` are the incidence columns and ``PTDF_o`` the PTDF rows of
+    the branches taken out. Other patterns are factorised by
+    :meth:`NetworkMatrices.ptdf`. The cached arrays are read only.
+    """
+
+    def __init__(self, network: NetworkMatrices, max_outages: int = LODF_MAX_OUTAGES):
+        self.network = network
+        self.max_outages = max_outages
+        self.entries: dict[bytes, Sensitivities] = {}
+        self.masks: dict[bytes, tuple[int, np.ndarray]] = {}
+        self.records: dict[bytes, PTDFCacheRecord] = {}
+
+    def key(self, slack: int, mask: np.ndarray) -> bytes:
+        return int(slack).to_bytes(8, "little") + np.packbits(mask).tobytes()
+
+    def get(self, slack: int, line_mask: Optional[np.ndarray] = None,
+            transformer_mask: Optional[np.ndarray] = None) -> Sensitivities:
+        network = self.network
+        mask = np.concatenate([network._mask(line_mask, len(network.lines)),
+                               network._mask(transformer_mask, len(network.transformers))])
+        key = self.key(slack, mask)
+        if key in self.entries:
+            self.records[key].hits += 1
+            return self.entries[key]
+
+        start = time.perf_counter()
+        n_lines = len(network.lines)
+        references = network.references(slack, mask[:n_lines], mask[n_lines:])
+        base = self._base(slack, mask, references)
+        if base is None:
+            method, outages = "factorised", 0
+            ptdf = np.vstack(network.ptdf(slack, mask[:n_lines], mask[n_lines:]))
+        else:
+            outaged = np.flatnonzero(self.masks[base][1] & ~mask)
+            method, outages = "lodf", len(outaged)
+            ptdf = self._lodf_update(np.vstack([self.entries[base].ptdf_lines,
+                                                self.entries[base].ptdf_transformers]), outaged)
+        ptdf.setflags(write=False)
+        references.setflags(write=False)
+
+        self.entries[key] = Sensitivities(ptdf[:n_lines], ptdf[n_lines:], references)
+        self.masks[key] = (slack, mask)
+        self.records[key] = PTDFCacheRecord(len(self.records), int((~mask[:n_lines]).sum()),
+                                            int((~mask[n_lines:]).sum()), method, outages, 0,
+                                            time.perf_counter() - start)
+        return self.entries[key]
+
+    def _base(self, slack: int, mask: np.ndarray, references: np.ndarray) -> Optional[bytes]:
+        """The cached pattern with the fewest branches out of service relative to mask, among the patterns with
+        the same slack and islands that have every branch of mask in service, if any is within max_outages."""
+
+        candidates = [(int((base_mask & ~mask).sum()), key) for key, (base_slack, base_mask) in self.masks.items()
+                      if base_slack == slack and not (mask & ~base_mask).any()
+                      and np.array_equal(self.entries[key].references, references)]
+        candidates = [c for c in candidates if c[0] <= self.max_outages]
+        return min(candidates)[1] if candidates else None
+
+    def _lodf_update(self, ptdf: np.ndarray, outaged: np.ndarray) -> np.ndarray:
+        """Branch x bus PTDF with the outaged branches (indices into lines then transformers) out of service."""
+
+        network = self.network
+        incidence = sp.hstack([network.line_incidence(), network.transformer_incidence()]).tocsc()[:, outaged]
+        #Flow on every branch per unit transfer across each outaged branch, PTDF @ A_o
+        transfer = np.asarray((incidence.T @ ptdf.T).T)
+        update = transfer @ np.linalg.solve(np.eye(len(outaged)) - transfer[outaged], ptdf[outaged])
+        ptdf = ptdf + update
+        ptdf[outaged] = 0
+        ptdf[np.abs(ptdf) < PTDF_TOLERANCE] = 0
+        return ptdf
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return a row per pattern, in the order computed."""
+
+        columns = list(PTDFCacheRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records.values()], columns=columns)
@@ -0,0 +1,175 @@
+"""Model level presolve of constraints the solver would otherwise receive in a redundant form.
+
+:class:`Presolve` applies three reductions to a built instance:
+
+* duplicate rows: rows of an indexed constraint that are structurally
+  identical (e.g. ``gen_SNSP``, whose rule does not use its index) are kept
+  once. Rows are compared by their expressions, with parameters by name, so
+  rows that are identical for one set of parameter values but not another
+  are kept.
+* variable bounds: rows on a single variable with constant coefficients and
+  bounds (``demand_alpha_max``, ``demand_alpha_fixneg``) become bounds of that
+  variable. This is only valid for constraints that are active in every
+  solve the variable takes part in, so it is applied to the constraints
+  given only.
+* substitutions: equalities that define a variable as a linear function of
+  other variables (``volts_line_delta``, ``volts_transformer_delta``) are
+  dropped, and the constraints using the variable are rebuilt without it
+  (see ``matrix_constraints``). :meth:`Presolve.restore` sets the values of
+  the substituted variables from the solution.
+
+Each reduced constraint keeps its name, rebuilt over the rows that remain,
+so that it is activated and deactivated as before. The reductions are
+recorded, and :meth:`Presolve.to_dataframe` reports what was removed.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Any, Iterable, Mapping, Optional
+
+import pandas as pd
+from pyomo.core.expr.numvalue import is_constant, native_numeric_types
+from pyomo.environ import Constraint, value
+from pyomo.repn import generate_standard_repn
+
+from .build_functions import _name_to_str, _replace_component
+
+
+@dataclass(slots=True)
+class PresolveRecord:
+    constraint: str
+    reduction: str
+    rows: int
+    removed: int
+
+
+def _rebuild(instance: Any, name: str, keep: list[Any]) -> None:
+    """Replace constraint name with one over the rows of keep only, keeping its activation."""
+
+    component = getattr(instance, name)
+    expressions = {i: component[i].expr for i in keep}
+    active = component.active
+    _replace_component(instance, name, Constraint(list(expressions), rule=lambda instance, i: expressions[i]),
+                       "constraint")
+    if not active:
+        getattr(instance, name).deactivate()
+
+
+def _linear(row: Any) -> Optional[tuple[float, list[tuple[Any, float]]]]:
+    """The constant and (variable, coefficient) terms of the body of a row, if they are all constant."""
+
+    repn = generate_standard_repn(row.body, compute_values=False)
+    if not repn.is_linear() or type(repn.constant) not in native_numeric_types \
+            or any(type(c) not in native_numeric_types for c in repn.linear_coefs):
+        return None
+    return repn.constant, list(zip(repn.linear_vars, repn.linear_coefs))
+
+
+class Presolve:
+    """Presolves constraints of an instance (see the module docstring), recording each reduction."""
+
+    def __init__(self):
+        self.records: list[PresolveRecord] = []
+        #Substituted variable name -> {index: (constant, [(variable name, index, coefficient)])}
+        self.substituted: dict[str, dict[Any, tuple[float, list[tuple[str, Any, float]]]]] = {}
+
+    def run(self, instance: Any, bounds: Iterable[Any] = (), substitutions: Optional[Mapping[Any, tuple]] = None,
+            exclude: Iterable[Any] = ()) -> Any:
+        """Removes duplicate rows from every constraint of the instance other than those in exclude (e.g. those
+        rebuilt each iteration), turns the single variable rows of the bounds constraints into variable bounds,
+        and applies substitutions, {equality constraint: (variable, constraints using it)}."""
+
+        #Read by the builders of the constraints using substituted variables
+        instance.presolve = self
+        exclude = {_name_to_str(c) for c in exclude}
+        for name in [c.local_name for c in instance.component_objects(Constraint, descend_into=False)]:
+            if name not in exclude and getattr(instance, name).is_indexed():
+                self.duplicate_rows(instance, name)
+        for name in bounds:
+            self.bound_rows(instance, _name_to_str(name))
+        for name, (variable, users) in (substitutions or {}).items():
+            self.substitute(instance, _name_to_str(name), _name_to_str(variable), users)
+        return instance
+
+    def duplicate_rows(self, instance: Any, name: str) -> None:
+        component = getattr(instance, name)
+        unique = {}
+        for i, row in component.items():
+            unique.setdefault(str(row.expr), i)
+        if len(unique) < len(component):
+            self.records.append(PresolveRecord(name, "duplicate rows", len(component), len(component) - len(unique)))
+            _rebuild(instance, name, list(unique.values()))
+
+    def bound_rows(self, instance: Any, name: str) -> None:
+        component = getattr(instance, name)
+        keep = []
+        for i, row in component.items():
+            linear = _linear(row)
+            if linear is None or len(linear[1]) != 1 or not all(b is None or is_constant(b) for b in (row.lower, row.upper)):
+                keep.append(i)
+                continue
+            constant, [(variable, coefficient)] = linear
+            lower, upper = [None if b is None else (value(b) - constant)/coefficient for b in (row.lower, row.upper)]
+            if coefficient < 0:
+                lower, upper = upper, lower
+            if lower is not None and (variable.lb is None or lower > variable.lb):
+                variable.setlb(lower)
+            if upper is not None and (variable.ub is None or upper < variable.ub):
+                variable.setub(upper)
+        if len(keep) < len(component):
+            self.records.append(PresolveRecord(name, "variable bounds", len(component), len(component) - len(keep)))
+            _rebuild(instance, name, keep)
+
+    def substitute(self, instance: Any, name: str, variable: str, users: Iterable[Any]) -> None:
+        """Drops equality constraint name, which defines variable, and rebuilds the users of variable without it.
+        Skipped if the variable is used by any other constraint."""
+
+        from .matrix_constraints import build_network_constraints
+
+        component = getattr(instance, name)
+        users = [_name_to_str(c) for c in users]
+        if getattr(instance, "network_matrices", None) is None:
+            return
+        for other in instance.component_data_objects(Constraint, descend_into=True):
+            if other.parent_component().local_name not in users + [name] \
+                    and any(v.parent_component().local_name == variable
+                            for v in generate_standard_repn(other.body, compute_values=False).linear_vars):
+                return
+
+        definitions = {}
+        for i, row in component.items():
+            linear = _linear(row)
+            defined = [(v, c) for v, c in linear[1] if v.parent_component().local_name == variable] if linear else []
+            if not row.equality or len(defined) != 1:
+                return
+            (v, coefficient), constant = defined[0], linear[0] - value(row.upper)
+            definitions[v.index()] = (-constant/coefficient,
+                                      [(other.parent_component().local_name, other.index(), -c/coefficient)
+                                       for other, c in linear[1] if other is not v])
+
+        self.substituted[variable] = definitions
+        self.records.append(PresolveRecord(name, "substitution", len(component), len(component)))
+        _rebuild(instance, name, [])
+        active = {c: getattr(instance, c).active for c in users}
+        build_network_constraints(instance, users)
+        for c in users:
+            if not active[c]:
+                getattr(instance, c).deactivate()
+
+    def restore(self, instance: Any) -> None:
+        """Sets the substituted variables from the values of the variables that define them."""
+
+        for variable, definitions in self.substituted.items():
+            component = getattr(instance, variable)
+            for i, (constant, terms) in definitions.items():
+                values = [getattr(instance, name)[j].value for name, j, _ in terms]
+                if all(v is not None for v in values):
+                    component[i].set_value(constant + sum(c*v for (_, _, c), v in zip(terms, values)),
+                                           skip_validation=True)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every reduction as a row, in the order applied."""
+
+        columns = list(PresolveRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
@@ -0,0 +1,113 @@
+"""Opt-in instrumentation of the model build phases.
+
+When a :class:`BuildProfiler` is active, the ``add_*_to_instance`` helpers in
+:mod:`pyomo_models.build.build_functions` record, for every component they
+construct, the wall-clock build time, the number of indices, the number of
+nonzeros generated (constraints only) and whether an existing component was
+deleted and rebuilt. Profiling is disabled by default and costs a single
+``None`` check per component when off.
+
+Example::
+
+    with profile_build() as profiler:
+        output, result = all_island_iterations.model(case, solver)
+    profiler.summary().head(20)
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, Optional
+
+import pandas as pd
+from pyomo.core.base.constraint import Constraint
+from pyomo.core.expr.visitor import identify_variables
+
+
+@dataclass(slots=True)
+class BuildRecord:
+    phase: str
+    name: str
+    build_time_s: float
+    indices: int
+    nonzeros: Optional[int]
+    rebuilt: bool
+
+
+class BuildProfiler:
+    """Collects one :class:`BuildRecord` per constructed component."""
+
+    def __init__(self, count_nonzeros: bool = True):
+        self.count_nonzeros = count_nonzeros
+        self.records: list[BuildRecord] = []
+
+    def record(self, phase: str, name: str, component: Any, build_time_s: float, rebuilt: bool) -> None:
+        indices = len(component)
+        nonzeros = None
+        if self.count_nonzeros and component.ctype is Constraint:
+            nonzeros = sum(
+                sum(1 for _ in identify_variables(data.body, include_fixed=False))
+                for data in component.values()
+            )
+        self.records.append(BuildRecord(phase, name, build_time_s, indices, nonzeros, rebuilt))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in build order."""
+
+        columns = list(BuildRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
+
+    def summary(self) -> pd.DataFrame:
+        """Return records aggregated per component, slowest first."""
+
+        df = self.to_dataframe()
+        return (
+            df.groupby(["phase", "name"], as_index=False)
+            .agg(
+                builds=("build_time_s", "size"),
+                total_time_s=("build_time_s", "sum"),
+                mean_time_s=("build_time_s", "mean"),
+                indices=("indices", "max"),
+                nonzeros=("nonzeros", "max"),
+                rebuilds=("rebuilt", "sum"),
+            )
+            .sort_values("total_time_s", ascending=False, ignore_index=True)
+        )
+
+
+_active_profiler: Optional[BuildProfiler] = None
+
+
+def get_active_profiler() -> Optional[BuildProfiler]:
+    return _active_profiler
+
+
+def enable_build_profiling(profiler: Optional[BuildProfiler] = None) -> BuildProfiler:
+    """Start recording component builds into ``profiler`` (a new one by default)."""
+
+    global _active_profiler
+    _active_profiler = profiler if profiler is not None else BuildProfiler()
+    return _active_profiler
+
+
+def disable_build_profiling() -> Optional[BuildProfiler]:
+    """Stop recording and return the profiler that was active."""
+
+    global _active_profiler
+    profiler, _active_profiler = _active_profiler, None
+    return profiler
+
+
+@contextmanager
+def profile_build(count_nonzeros: bool = True) -> Iterator[BuildProfiler]:
+    """Profile all component builds made within the ``with`` block."""
+
+    previous = _active_profiler
+    profiler = enable_build_profiling(BuildProfiler(count_nonzeros=count_nonzeros))
+    try:
+        yield profiler
+    finally:
+        disable_build_profiling()
+        if previous is not None:
+            enable_build_profiling(previous)
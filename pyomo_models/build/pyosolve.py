@@ -12,17 +12,50 @@ formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
-def solveinstance(instance, solver='appsi_highs'):
+#Solver threads used when solveinstance() is not given threads (None: the solver's default)
+solver_threads = None
+
+#Threads the HiGHS scheduler of this process was last started with
+_highs_threads = None
+
+def set_solver_threads(threads):
+    '''
+    Sets the solver threads used by solveinstance() in this process when it is not given threads,
+    e.g. by the worker processes of a parallel run (see pyomo_models.build.threads).
     '''
-    This function solves the instance
+    global solver_threads
+    solver_threads = threads
+
+def _start_highs_scheduler(threads):
+    '''
+    HiGHS starts a single scheduler per process, with the threads of its first solve, and fails solves
+    asking for other threads. The scheduler is reset when the threads change so that it restarts with them.
     '''
-    opt = SolverFactory(solver)
-    
+    global _highs_threads
+    if threads != _highs_threads:
+        import highspy
+        highspy.Highs.resetGlobalScheduler(True)
+        _highs_threads = threads
+
+def solveinstance(instance, solver='appsi_highs', log_infeasible=True, opt=None, threads=None):
+    '''
+    This function solves the instance. If the solve fails, the infeasible constraints are logged
+    (unless log_infeasible is False) and a RuntimeError is raised. A solver object can be given as opt
+    to reuse it between solves (for a persistent solver, only the changes to the instance are passed on).
+    The solver is limited to threads threads if given, or to those set by set_solver_threads().
+    '''
+    if opt is None:
+        opt = SolverFactory(solver)
+
+    threads = threads if threads is not None else solver_threads
+    options = {'threads': threads} if threads is not None else None
+    if threads is not None and 'highs' in solver:
+        _start_highs_scheduler(threads)
+
     try:
-        result = opt.solve(instance, tee=False, warmstart=True)
+        result = opt.solve(instance, tee=False, warmstart=True, options=options)
         return result
     except RuntimeError as exc:
-        log_infeasible_constraints(instance, logger=logger, log_expression=False, log_variables=False)
+        if log_infeasible:
+            log_infeasible_constraints(instance, logger=logger, log_expression=False, log_variables=False)
         raise RuntimeError("Solver Error") from exc
-
-    
@@ -0,0 +1,70 @@
+"""Prebuilt model instances that can be cloned or serialised.
+
+Building an instance (sets, parameters, variables, constraints and blocks) is
+the same for every run of a case. A :class:`ModelTemplate` holds one built
+instance so that repeated runs and parallel workers can start from a copy of
+it rather than redoing construction::
+
+    template = ModelTemplate.build(all_island_iterations.build_instance, case)
+    template.save("ireland_case_v1.template")   # optional, for other processes
+    output, result = all_island_iterations.model(case, solver, template=template)
+"""
+
+from __future__ import annotations
+
+import pickle
+from pathlib import Path
+from typing import Any, Callable
+
+from pyomo.core.base.initializer import InitializerBase
+
+
+def _strip_construction_rules(instance: Any) -> None:
+    """Drop initializers that cannot be pickled (e.g. lambda rules) from every component.
+
+    Initializers are only consulted when a component is constructed. The
+    instance keeps its constructed data and the build functions create new
+    components from the definitions when anything is rebuilt.
+    """
+
+    for component in instance.component_objects(descend_into=True):
+        for attr, val in list(vars(component).items()):
+            if not isinstance(val, InitializerBase):
+                continue
+            try:
+                pickle.dumps(val)
+            except (pickle.PicklingError, AttributeError, TypeError):
+                setattr(component, attr, None)
+
+
+class ModelTemplate:
+    """A built model instance from which ready-to-solve copies are made."""
+
+    def __init__(self, instance: Any):
+        self.instance = instance
+
+    @classmethod
+    def build(cls, builder: Callable[[Any], Any], case: Any) -> "ModelTemplate":
+        """Build the template with ``builder(case)``, e.g. a model module's ``build_instance``."""
+
+        return cls(builder(case))
+
+    def clone(self) -> Any:
+        """Return an independent copy of the template instance."""
+
+        return self.instance.clone()
+
+    def save(self, filepath: str | Path) -> None:
+        """Serialise the template instance to ``filepath``."""
+
+        instance = self.instance.clone()
+        _strip_construction_rules(instance)
+        with open(filepath, "wb") as f:
+            pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filepath: str | Path) -> "ModelTemplate":
+        """Load a template previously written with :meth:`save`."""
+
+        with open(filepath, "rb") as f:
+            return cls(pickle.load(f))
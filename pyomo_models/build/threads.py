@@ -0,0 +1,135 @@
+"""Core budget of parallel runs: worker processes x solver threads.
+
+When iterations are solved in parallel, each worker's HiGHS solve and each
+worker's BLAS (through NumPy) will by default start a thread per core, and
+the machine is oversubscribed. A :class:`ThreadBudget` splits the available
+cores between worker processes and the solver threads of each solve, and
+pins the BLAS threads of each worker:
+
+* the BLAS environment variables are set while the pool starts, so that
+  spawned workers load NumPy with them
+* each worker limits its already loaded BLAS libraries through
+  ``threadpoolctl`` (where installed) and passes its solver threads to
+  :func:`pyomo_models.build.pyosolve.solveinstance`
+
+The best split depends on the hardware and the case, so splits can be
+measured against each other, e.g. with ``parallel_iterations.benchmark``::
+
+    budgets = ThreadBudget.candidates(cores = 8)
+    parallel_iterations.benchmark(case, solver, budgets)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import pandas as pd
+
+import pyomo_models.build.pyosolve as pyosolve
+
+#Environment variables read by the BLAS / OpenMP libraries NumPy and SciPy may load
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def available_cores() -> int:
+    """Cores this process may run on."""
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+@contextmanager
+def blas_environment(threads: int) -> Iterator[None]:
+    """Sets the BLAS thread environment variables inside the block (e.g. while a pool spawns its workers)."""
+
+    previous = {name: os.environ.get(name) for name in BLAS_ENV_VARS}
+    os.environ.update({name: str(threads) for name in BLAS_ENV_VARS})
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def limit_blas_threads(threads: int) -> bool:
+    """Limits the BLAS libraries loaded in this process to threads. Returns False if threadpoolctl is not installed."""
+
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return False
+    threadpool_limits(limits = threads, user_api = "blas")
+    return True
+
+
+@dataclass(frozen=True, slots=True)
+class ThreadBudget:
+    processes: int
+    solver_threads: int
+    blas_threads: int = 1
+
+    @property
+    def cores(self) -> int:
+        return self.processes * self.solver_threads
+
+    @classmethod
+    def split(cls, cores: Optional[int] = None, processes: Optional[int] = None,
+              solver_threads: Optional[int] = None) -> "ThreadBudget":
+        """A budget of cores (default: the available cores), giving the remaining cores to whichever of
+        processes and solver_threads is not given (with neither given, one solver thread per process)."""
+
+        cores = cores or available_cores()
+        if processes is None and solver_threads is None:
+            solver_threads = 1
+        if processes is None:
+            processes = max(1, cores // solver_threads)
+        if solver_threads is None:
+            solver_threads = max(1, cores // processes)
+        return cls(processes, solver_threads)
+
+    @classmethod
+    def candidates(cls, cores: Optional[int] = None) -> list["ThreadBudget"]:
+        """Every split of cores into processes x solver threads that uses all of them."""
+
+        cores = cores or available_cores()
+        return [cls(p, cores // p) for p in range(1, cores + 1) if cores % p == 0]
+
+    def apply(self) -> None:
+        """Pins the BLAS threads of this process and sets its solver threads (run in each worker)."""
+
+        limit_blas_threads(self.blas_threads)
+        pyosolve.set_solver_threads(self.solver_threads)
+
+
+@dataclass(slots=True)
+class ThroughputRecord:
+    processes: int
+    solver_threads: int
+    iterations: int
+    wall_time_s: float
+    iterations_per_s: float
+
+
+def measure(run: Callable[[ThreadBudget], Any], budgets: Iterable[ThreadBudget], iterations: int) -> pd.DataFrame:
+    """Times run(budget) for each budget, each solving the same number of iterations, and returns the
+    throughput of each, fastest first."""
+
+    records = []
+    for budget in budgets:
+        start = time.perf_counter()
+        run(budget)
+        wall_time_s = time.perf_counter() - start
+        records.append(ThroughputRecord(budget.processes, budget.solver_threads, iterations,
+                                        wall_time_s, iterations / wall_time_s))
+    columns = list(ThroughputRecord.__dataclass_fields__)
+    return (pd.DataFrame([asdict(r) for r in records], columns=columns)
+            .sort_values("iterations_per_s", ascending=False, ignore_index=True))
@@ -0,0 +1,212 @@
+"""Explicit warm starts for the market, secure and DCOPF stages.
+
+``pyosolve.solveinstance`` solves with ``warmstart=True``, so HiGHS is handed
+whatever values the variables happen to hold from the previous solve. A
+:class:`WarmStartManager` makes that start deliberate, loading before each
+stage solve:
+
+* market (timestep t+1): the market commitment ``u_g`` and dispatch ``pG`` of timestep t
+* secure: the market solution, with no bids or offers and ``zeta`` = 1
+* DCOPF: the secure solution, with no bids or offers, every ``xi`` at 1 and
+  ``beta_prorata`` selecting each generator's first constraint group
+
+HiGHS only uses the integer part of a start: it fixes the binaries at their
+start values and solves the remaining LP. The manager reads the HiGHS log of
+each solve to record whether the start was accepted, alongside the solve time,
+so runs with and without warm starts can be compared.
+
+Example::
+
+    warmstart = WarmStartManager()
+    output, result = all_island_iterations.model(case, solver, warmstart = warmstart)
+    warmstart.summary()
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import value
+
+STAGES = ("copper_market", "copper_curtailed", "dcopf")
+
+#Logger that appsi_highs writes the HiGHS console output to
+HIGHS_LOGGER = "pyomo.contrib.appsi.solvers.highs"
+
+_START_ASSESSED = "Assessing feasibility of MIP"
+_START_ACCEPTED = re.compile(r"MIP start solution is feasible, objective value is (\S+)")
+
+
+@dataclass(slots=True)
+class WarmStartRecord:
+    iteration: Any
+    stage: str
+    seeded: bool
+    accepted: Optional[bool]
+    start_objective: Optional[float]
+    solve_time_s: float
+
+
+def start_accepted(lines: list[str]) -> tuple[Optional[bool], Optional[float]]:
+    """Whether HiGHS accepted the start of a solve, and its objective value, from the solve's log lines.
+
+    Returns ``(None, None)`` when no start was assessed, e.g. for an LP.
+    """
+
+    assessed = False
+    for line in lines:
+        match = _START_ACCEPTED.search(line)
+        if match:
+            return True, float(match.group(1))
+        assessed = assessed or _START_ASSESSED in line
+    return (False, None) if assessed else (None, None)
+
+
+class _LineHandler(logging.Handler):
+    def __init__(self, lines: list[str]):
+        super().__init__(logging.INFO)
+        self.lines = lines
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(record.getMessage())
+
+
+class WarmStartManager:
+    """Seeds each stage solve from the previous stage and records whether HiGHS accepted the start.
+
+    One manager should be used per run of a case, as the market stage is only
+    seeded once a market solution of an earlier timestep has been recorded.
+    """
+
+    def __init__(self, stages: tuple[str, ...] = STAGES):
+        self.stages = set(stages)
+        self.records: list[WarmStartRecord] = []
+
+    def _seed_market(self) -> bool:
+        return any(r.stage == STAGES[0] for r in self.records)
+
+    #~~~~~~~~~~~# PYOMO INSTANCES #~~~~~~~~~~~#
+    def seed(self, instance, stage: str) -> bool:
+        """Loads the start of a stage into the variables of an instance. Returns whether a start was loaded."""
+
+        if stage not in self.stages or (stage == STAGES[0] and not self._seed_market()):
+            return False
+
+        PG, UG = {"copper_market": (instance.PG_MARKET, instance.UG_MARKET),
+                  "copper_curtailed": (instance.PG_MARKET, instance.UG_MARKET),
+                  "dcopf": (instance.PG_SECURE, instance.UG_SECURE)}[stage]
+        for g in instance.G:
+            instance.pG[g].set_value(value(PG[g]), skip_validation=True)
+            instance.u_g[g].set_value(value(UG[g]), skip_validation=True)
+        if stage == STAGES[0]:
+            return True
+
+        for g in instance.G:
+            instance.pG_bid[g].set_value(0)
+            instance.pG_offer[g].set_value(0)
+        if stage == STAGES[1]:
+            instance.prorata_curtailment_zeta.set_value(1)
+            return True
+
+        for g in instance.G_prorata:
+            instance.xi_prorata[g].set_value(1)
+        for cg in instance.prorata_groups:
+            instance.xi_cg[cg].set_value(1)
+        for (g, cg), selected in _first_group(instance.G_prorata_pairs).items():
+            instance.beta_prorata[(g, cg)].set_value(selected)
+        return True
+
+    #~~~~~~~~~~~# DIRECT HIGHS ENGINE #~~~~~~~~~~~#
+    def seed_direct(self, engine, stage: str) -> bool:
+        """Passes the start of a stage to the highspy model of a DirectModel. Returns whether a start was passed."""
+
+        start = self.direct_start(engine, stage)
+        if start is None:
+            return False
+        engine.highs.setSolution(len(start), np.arange(len(start), dtype=np.int32), start)
+        return True
+
+    def direct_start(self, engine, stage: str) -> Optional[np.ndarray]:
+        """The start of a stage over the columns of a DirectModel, or None if the stage is not seeded."""
+
+        if stage not in self.stages or (stage == STAGES[0] and not self._seed_market()):
+            return None
+
+        c = engine.columns
+        start = np.nan_to_num(engine.values)
+        PG, UG = {"copper_market": (engine.PG_MARKET, engine.UG_MARKET),
+                  "copper_curtailed": (engine.PG_MARKET, engine.UG_MARKET),
+                  "dcopf": (engine.PG_SECURE, engine.UG_SECURE)}[stage]
+        start[c["pG"]] = PG
+        start[c["u_g"]] = UG
+        if stage != STAGES[0]:
+            start[c["pG_bid"]] = 0
+            start[c["pG_offer"]] = 0
+        if stage == STAGES[1]:
+            start[c["prorata_curtailment_zeta"]] = 1
+        if stage == STAGES[2]:
+            start[c["xi_prorata"]] = 1
+            start[c["xi_cg"]] = 1
+            start[c["beta_prorata"]] = list(_first_group(c.keys["beta_prorata"]).values())
+        return start
+
+    #~~~~~~~~~~~# RECORDING #~~~~~~~~~~~#
+    @contextmanager
+    def record(self, iteration: Any, stage: str, seeded: bool) -> Iterator[list[str]]:
+        """Times the solve run inside the block and records whether its start was accepted.
+
+        HiGHS output written through appsi is captured automatically; other
+        callers append their HiGHS log lines to the yielded list.
+        """
+
+        lines: list[str] = []
+        highs_logger = logging.getLogger(HIGHS_LOGGER)
+        handler = _LineHandler(lines)
+        level, propagate = highs_logger.level, highs_logger.propagate
+        highs_logger.addHandler(handler)
+        highs_logger.setLevel(logging.INFO)
+        highs_logger.propagate = False
+        start = time.perf_counter()
+        try:
+            yield lines
+        finally:
+            solve_time_s = time.perf_counter() - start
+            highs_logger.removeHandler(handler)
+            highs_logger.setLevel(level)
+            highs_logger.propagate = propagate
+        accepted, start_objective = start_accepted(lines)
+        self.records.append(WarmStartRecord(iteration, stage, seeded, accepted, start_objective, solve_time_s))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return every record as a row, in solve order."""
+
+        columns = list(WarmStartRecord.__dataclass_fields__)
+        return pd.DataFrame([asdict(r) for r in self.records], columns=columns)
+
+    def summary(self) -> pd.DataFrame:
+        """Per stage: solves, seeded solves, accepted starts and solve times."""
+
+        df = self.to_dataframe()
+        df["accepted"] = df["accepted"].astype("boolean")
+        return df.groupby("stage", sort=False).agg(solves=("stage", "size"),
+                                                   seeded=("seeded", "sum"),
+                                                   accepted=("accepted", "sum"),
+                                                   total_solve_time_s=("solve_time_s", "sum"),
+                                                   mean_solve_time_s=("solve_time_s", "mean"))
+
+
+def _first_group(pairs) -> dict[tuple, int]:
+    """Selects the first constraint group of each generator among (generator, group) pairs."""
+
+    selected, seen = {}, set()
+    for g, cg in pairs:
+        selected[(g, cg)] = int(g not in seen)
+        seen.add(g)
+    return selected
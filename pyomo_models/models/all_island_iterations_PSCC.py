@@ -2,9 +2,16 @@ from pyomo_models.build.definitions import *
 from pyomo_models.build.build_functions import *
 from pyomo_models.build.names import *
 
+import copy
 import functools
+import data_io.curtailment as curtailment
 import data_io.pyomo_io as pyomo_io
+import data_io.solve_cache as solve_cache
 import pyomo_models.build.pyosolve as pyosolve
+from pyomo_models.build.network import NetworkMatrices
+from pyomo_models.build.matrix_constraints import build_network_constraints
+from pyomo_models.build.muon_conditions import ConditionFlags, DemandCondition
+from pyomo_models.build.presolve import Presolve
 from pyomo_models.build.obj_functions import (dcopf_marginal_cost_objective,
                                               copper_plate_marginal_cost_objective,
                                               redispatch_from_market_cost_objective,
@@ -97,12 +104,12 @@ def MUON_constraints(case, instance, constraint_dict, selected_constraints = Non
                         constraint_block.add_component(suffix,
                                                        Constraint(rule = sum(getattr(instance, constraint_var)[g] 
                                                                              for g in getattr(instance, 'G_'+constraint))
-                                                                             >= bound()))
+                                                                             >= bound(instance)))
                     if suffix == '_UB':
                         constraint_block.add_component(suffix,
                                                        Constraint(rule = sum(getattr(instance, constraint_var)[g] 
                                                                              for g in getattr(instance, 'G_'+constraint))
-                                                                             <= bound()))
+                                                                             <= bound(instance)))
             ...
     added_constraints += [constraint]
     print(f"The following MUON constraints have been added to the model \n {added_constraints}")
@@ -147,9 +154,9 @@ def MUON_NB_BigM_constraints(case, instance, constraint_dict, selected_constrain
         #Create variables for generation and overall control
         instance.MUON_NB_BigM.bMvar_y_G_CPS = Var(domain = Binary)
         instance.MUON_NB_BigM.bMvar_y_CPS = Var(domain = Binary)
-        #Create big-M parameters
-        instance.MUON_NB_BigM.bMparam_M_G_CPS_L = constraint_dict["S_NBMIN_CPS"]["pGlim"] - sum(instance.PGmin[g] for g in instance.G_NI_Wind)
-        instance.MUON_NB_BigM.bMparam_M_G_CPS_U = sum(instance.PGmax[g] for g in instance.G_NI_Wind) - constraint_dict["S_NBMIN_CPS"]["pGlim"]
+        #Create big-M parameters (updated each iteration, and tightened before each solve by BigMTightening)
+        instance.MUON_NB_BigM.bMparam_M_G_CPS_L = Param(within = Reals, mutable = True, initialize = value(constraint_dict["S_NBMIN_CPS"]["pGlim"] - sum(instance.PGmin[g] for g in instance.G_NI_Wind)))
+        instance.MUON_NB_BigM.bMparam_M_G_CPS_U = Param(within = Reals, mutable = True, initialize = value(sum(instance.PGmax[g] for g in instance.G_NI_Wind) - constraint_dict["S_NBMIN_CPS"]["pGlim"]))
         #Add constraints
         instance.MUON_NB_BigM.bMconst_M_CPS_L = Constraint(rule = constraint_dict["S_NBMIN_CPS"]["pGlim"] - sum(instance.pG[g] for g in instance.G_NI_Wind) <= instance.MUON_NB_BigM.bMparam_M_G_CPS_L * instance.MUON_NB_BigM.bMvar_y_G_CPS)
         instance.MUON_NB_BigM.bMconst_M_CPS_U = Constraint(rule = sum(instance.pG[g] for g in instance.G_NI_Wind) - constraint_dict["S_NBMIN_CPS"]["pGlim"] <=  instance.MUON_NB_BigM.bMparam_M_G_CPS_U * (1-instance.MUON_NB_BigM.bMvar_y_G_CPS))
@@ -165,16 +172,20 @@ def MUON_NB_BigM_constraints(case, instance, constraint_dict, selected_constrain
 
         #Create variables for generation and overall control
         instance.MUON_NB_BigM.bMvar_y_G_MP_NB = Var(domain = Binary)
-        #Create big-M parameters
-        instance.MUON_NB_BigM.bMparam_M_G_MP_NB_L = constraint_dict["S_NBMIN_MP_NB"]["pGlim"] - sum(instance.PGmin[g] for g in instance.G_ROI_Wind)
-        instance.MUON_NB_BigM.bMparam_M_G_MP_NB_U = sum(instance.PGmax[g] for g in instance.G_ROI_Wind) - constraint_dict["S_NBMIN_MP_NB"]["pGlim"]
+        #Create big-M parameters (updated each iteration, and tightened before each solve by BigMTightening)
+        instance.MUON_NB_BigM.bMparam_M_G_MP_NB_L = Param(within = Reals, mutable = True, initialize = value(constraint_dict["S_NBMIN_MP_NB"]["pGlim"] - sum(instance.PGmin[g] for g in instance.G_ROI_Wind)))
+        instance.MUON_NB_BigM.bMparam_M_G_MP_NB_U = Param(within = Reals, mutable = True, initialize = value(sum(instance.PGmax[g] for g in instance.G_ROI_Wind) - constraint_dict["S_NBMIN_MP_NB"]["pGlim"]))
         #Add constraints
         instance.MUON_NB_BigM.bMconst_M_MP_NB_L = Constraint(rule = constraint_dict["S_NBMIN_MP_NB"]["pGlim"] - sum(instance.pG[g] for g in instance.G_ROI_Wind) <= instance.MUON_NB_BigM.bMparam_M_G_MP_NB_L * instance.MUON_NB_BigM.bMvar_y_G_MP_NB)
         instance.MUON_NB_BigM.bMconst_M_MP_NB_U = Constraint(rule = sum(instance.pG[g] for g in instance.G_ROI_Wind) - constraint_dict["S_NBMIN_MP_NB"]["pGlim"] <=  instance.MUON_NB_BigM.bMparam_M_G_MP_NB_U * (1-instance.MUON_NB_BigM.bMvar_y_G_MP_NB))
         instance.MUON_NB_BigM.S_NBMIN_MP_NB = Constraint(rule = sum(instance.u_g[g] for g in instance.G_S_NBMIN_MP_NB) >= constraint_dict["S_NBMIN_MP_NB"]["Ug_LB"] * instance.MUON_NB_BigM.bMvar_y_G_MP_NB)
         print(f"Big-M NB constraint [S_NBMIN_MP_NB] added to instance")
 
-def MUON_conditional_activation(instance, constraint_dict, selected_constraints = None):
+def MUON_conditional_activation(instance, constraint_dict, selected_constraints = None, flags = None):
+        '''
+        Activates the selected constraints whose condition is met, looking the condition up in flags ({constraint
+        name: met}, see MUON_condition_flags()) where given, and evaluating it on the instance otherwise.
+        '''
         MUON_block = getattr(instance, "MUON")
         
 
@@ -186,271 +197,99 @@ def MUON_conditional_activation(instance, constraint_dict, selected_constraints
             if constraint_condition is None:
                 continue
             else:
-                if constraint_condition() == True:
+                met = flags[constraint] if flags is not None else constraint_condition(instance)
+                if met == True:
                     getattr(MUON_block, constraint) .activate()
 
-                if constraint_condition() == False:
+                if met == False:
                     print(f"The requirement for constraint {constraint} to apply has not been met, so it has not been applied")
                     continue
 
-def MUON_NB_BigM_param_update(instance, constraint_dict):
-    #Update y binary parameter for S_NBMIN_CPS
-    if sum(instance.PD[d].value for d in instance.D_NI) >= constraint_dict["S_NBMIN_CPS"]["PDlim"]:
+def MUON_NB_BigM_param_update(instance, constraint_dict, flags = None):
+    #Update y binary parameter for S_NBMIN_CPS (looked up in flags where given, see MUON_condition_flags())
+    condition = constraint_dict["S_NBMIN_CPS"]["Condition"]
+    if (flags["S_NBMIN_CPS"] if flags is not None else condition(instance)):
         instance.MUON_NB_BigM.bMparam_y_D_CPS = 1
     else:
         instance.MUON_NB_BigM.bMparam_y_D_CPS = 0
 
-
-#========== START OF MODEL FUNCTION =============#
-
-
-
-
-def model(case: object, solver):
-    #Create Model & Instance
-    model = AbstractModel()
-    instance = model.create_instance()
-    #instance.dual = Suffix(direction=Suffix.IMPORT)
-
-    #Create Data Ouput & Result Dictionaries
-    output = {"format": "iteration"}
-    result = {"format": "iteration"}
-
-    #Define list of sets for model and add to model
-    setlist = [
-        ComponentName.B,
-        ComponentName.b0,
-        ComponentName.G,
-        ComponentName.generator_mapping,
-        ComponentName.G_prorata,
-        ComponentName.G_prorata_map,
-        ComponentName.G_prorata_pairs,
-        ComponentName.G_individual,
-        ComponentName.G_uncontrollable,
-        ComponentName.G_s,
-        ComponentName.G_ns,
-        ComponentName.prorata_groups,
-        ComponentName.L,
-        #ComponentName.L_nonzero, #Defined each timestep
-        ComponentName.bus_line_in,
-        ComponentName.bus_line_out,
-        ComponentName.line_busses,
-        ComponentName.TRANSF,
-        #ComponentName.TRANSF_nonzero, #Defined each timestep
-        ComponentName.bus_transformer_in,
-        ComponentName.bus_transformer_out,
-        ComponentName.transformer_busses,
-        ComponentName.D,
-        ComponentName.DNeg,
-        ComponentName.demand_bus_mapping,
-    ]
-    build_sets(instance, case, setlist)
-
-    #ROI & NI Demand Sets
-    instance.D_ROI = Set(within = instance.D, initialize = list(case.demands\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: d['zone'] == 'ROI']['name']))
-    instance.D_NI = Set(within = instance.D, initialize = list(case.demands\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: d['zone'] == 'NI']['name']))
-
-    #ROI & NI Generator Sets
-    instance.G_ROI = Set(within = instance.G, initialize = list(case.generators\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: d['zone'] == 'ROI']['name']))
-    instance.G_NI = Set(within = instance.G, initialize = list(case.generators\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: d['zone'] == 'NI']['name']))
-
-    #ROI & NI Wind Only Sets
-    instance.G_ROI_Wind = Set(within = instance.G, initialize = list(case.generators\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: (d['zone'] == 'ROI') & (d['FuelType'] == 'Wind')]['name']))
-
-    instance.G_NI_Wind = Set(within = instance.G, initialize = list(case.generators\
-                                                                .merge(case.busses[['name', 'zone']],
-                                                                       how = 'inner',
-                                                                       left_on = 'busname',
-                                                                       right_on = 'name',
-                                                                       suffixes = ('', '_drop'))\
-                                                                .drop(columns='name_drop')\
-                                                                .loc[lambda d: (d['zone'] == 'NI') & (d['FuelType'] == 'Wind')]['name']))
-
-
-
-    #Define time dependent sets (to be updated each iteration)
-    ts_sets = [ComponentName.L_nonzero,
-               ComponentName.TRANSF_nonzero] 
-
-    #Define list of parameters for model and add to model
-    paramlist = [
-        ComponentName.line_max_continuous_P, #Defined each timestep
-        ComponentName.line_susceptance,
-        ComponentName.line_reactance,
-        ComponentName.transformer_max_continuous_P, #Defined each timestep
-        ComponentName.transformer_susceptance,
-        ComponentName.transformer_reactance,
-        ComponentName.PD, #Defined each timestep
-        ComponentName.VOLL, #Defined each timestep
-        ComponentName.PGmax, #Defined each timestep
-        ComponentName.PGmin, #Defined each timestep
-        # ComponentName.PGMINGEN,
-        ComponentName.c_0, #Defined each timestep
-        ComponentName.c_1,
-        ComponentName.c_bid, #Defined each timestep
-        ComponentName.c_offer, #TODO - Define for each timestep
-        ComponentName.baseMVA,
-        ComponentName.SNSP_curtailment
-    ]
-    build_params(instance, case, paramlist)
-
-    #Define time dependent parameters (to be updated each iteration)
-    ts_params = [ComponentName.PD,
-                ComponentName.VOLL,
-                ComponentName.line_max_continuous_P,
-                ComponentName.transformer_max_continuous_P,
-                ComponentName.PGmin,
-                ComponentName.PGmax,
-                # ComponentName.PGMINGEN,
-                ComponentName.c_bid] 
-
-    #Special Model Parameters
-    instance.PG_MARKET = Param(instance.G,
-                            within = Reals,
-                            initialize = {g: 0 for g in instance.G},
-                            mutable = True)
-
-    instance.UG_MARKET = Param(instance.G,
-                                within = Binary,
-                                initialize = {g: 0 for g in instance.G},
-                                mutable = True) 
-
-    #Special Model Parameters
-    instance.PG_SECURE = Param(instance.G,
-                            within = Reals,
-                            initialize = {g: 0 for g in instance.G},
-                            mutable = True)
-
-    instance.UG_SECURE = Param(instance.G,
-                                within = Binary,
-                                initialize = {g: 0 for g in instance.G},
-                                mutable = True) 
-
-    #Define list of variables for model and add to model
-    varlist = [
-        ComponentName.pG,
-        ComponentName.pG_bid,
-        ComponentName.pG_offer,
-        ComponentName.u_g,
-        ComponentName.pD,
-        ComponentName.alpha,
-        ComponentName.xi_cg,
-        ComponentName.xi_prorata,
-        ComponentName.beta_prorata,
-        ComponentName.prorata_minimum_zeta,
-        ComponentName.prorata_curtailment_zeta,
-        ComponentName.deltaL,
-        ComponentName.deltaLT,
-        ComponentName.delta,
-        ComponentName.pL,
-        ComponentName.pLT,
-    ]
-    build_variables(instance, varlist)
-
-    #Preload First Iteration Params & Sets
-    add_iteration_params_to_instance(instance, case, ts_params, case.iterations[0])
-    add_iteration_sets_to_instance(instance, case, ts_sets, case.iterations[0])
-
-    #COPPER PLATE MARKET MODEL CONSTRAINTS #
-    copper_plate_market_constraints = [#Power Balance & Demand Constraints
-                                ComponentName.KCL_copperplate,
-                                ComponentName.demand_real_alpha_controlled,
-                                ComponentName.demand_alpha_max,
-                                ComponentName.demand_alpha_fixneg,
-                                 
-                                 #Generation Constraints
-                                 ComponentName.gen_uc_max,
-                                 ComponentName.gen_uc_min]
-    build_constraints(instance, copper_plate_market_constraints)
-
-    #COPPER PLATE SECURE MODEL CONSTRAINTS #
-    copper_plate_secure_constraints = [#constraints for market re-dispatch, pro-rata cosntraint, and SNSP
-                                ComponentName.gen_market_redispatch,
-                                ComponentName.gen_prorata_curtailment_realpower,
-                                ComponentName.gen_SNSP]
-    build_constraints(instance, copper_plate_secure_constraints)
-    
-
+    #Update big-M parameters from this iteration's PGmin and PGmax
+    for (param_L, param_U, generators, pGlim) in MUON_NB_BigM_switches(instance, constraint_dict):
+        param_L.value = value(pGlim - sum(instance.PGmin[g] for g in generators))
+        param_U.value = value(sum(instance.PGmax[g] for g in generators) - pGlim)
+
+def MUON_NB_BigM_switches(instance, constraint_dict):
+    '''
+    The big-M switches of the MUON NB Big-M constraints in the instance, as (lower M param, upper M param, generator
+    set, limit on the sum of pG over the set).
+    '''
+    block = getattr(instance, "MUON_NB_BigM")
+    return [(getattr(block, f"bMparam_M_G_{name}_L"), getattr(block, f"bMparam_M_G_{name}_U"), getattr(instance, generators),
+             constraint_dict[constraint]["pGlim"])
+            for constraint, (name, generators) in MUON_NB_bigM_switch_sets.items() if hasattr(block, f"bMparam_M_G_{name}_L")]
+
+
+#=============# MUON CONSTRAINT DEFINITIONS ==================#
+
+#Selected MUON constraints applied to the model
+MUON_MW_constraint_list = ['S_MWMAX_NI_GT']
+MUON_NB_constraints_list = ['S_NBMIN_DUB_L2']
+MUON_NB_bigM_constraints_list = []
+
+#Name of the big-M switch of each MUON NB Big-M constraint, and the set of generators it switches on
+MUON_NB_bigM_switch_sets = {"S_NBMIN_CPS": ("CPS", "G_NI_Wind"),
+                            "S_NBMIN_MP_NB": ("MP_NB", "G_ROI_Wind")}
+
+def MUON_constraint_dicts(baseMVA):
+    '''
+    Returns the MW, NB and NB Big-M MUON constraint definitions, scaled to per-unit on baseMVA.
+    Callable bounds and conditions take the instance as their only argument, so that the same
+    definitions can be applied to cloned instances. Conditions are DemandConditions, so that they can also be
+    evaluated for every iteration of a case at once (see MUON_condition_flags()).
+    '''
     #- MUON MW Constraints
     MUON_MW_constraint_dict={
         "S_MWMAX_NI_GT": {
             "PG_LB": None,
-            "PG_UB": 272/instance.baseMVA,
+            "PG_UB": 272/baseMVA,
             "type": "MW" 
         },
         "S_MWMIN_EWIC": {
-            "PG_LB": -526/instance.baseMVA ,
+            "PG_LB": -526/baseMVA ,
             "PG_UB": None,
             "type": "MW" 
         },
         "S_MWMAX_EWIC": {
             "PG_LB": None,
-            "PG_UB": 504/instance.baseMVA,
+            "PG_UB": 504/baseMVA,
             "type": "MW"   
         },
         "S_MWMIN_MOYLE": {
-            "PG_LB": -410/instance.baseMVA ,
+            "PG_LB": -410/baseMVA ,
             "PG_UB": None,
             "type": "MW" 
         },
         "S_MWAX_MOYLE": {
             "PG_LB": None,
-            "PG_UB": 441/instance.baseMVA,
+            "PG_UB": 441/baseMVA,
             "type": "MW"    
         },
         "S_REP_ROI": {
             "PG_LB": None,
-            "PG_UB": lambda: sum(instance.PGmax[g] for g in instance.G_S_REP_ROI) - 325/instance.baseMVA,
+            "PG_UB": lambda instance: sum(instance.PGmax[g] for g in instance.G_S_REP_ROI) - 325/baseMVA,
             "type": "MW"  
         },
         "S_MWMAX_CRK_MW": {
             "PG_LB": None,
-            "PG_UB": 1370/instance.baseMVA,
+            "PG_UB": 1370/baseMVA,
             "type": "MW"   
         },
         "S_MWMAX_STH_MW": {
             "PG_LB": None,
-            "PG_UB": 1835/instance.baseMVA,
+            "PG_UB": 1835/baseMVA,
             "type": "MW"   
         },
     }
-    MUON_MW_constraint_list = ['S_MWMAX_NI_GT']
-    MUON_constraints(case, instance, MUON_MW_constraint_dict, selected_constraints = MUON_MW_constraint_list)
     
     
     #- MUON NB Constraints
@@ -486,13 +325,13 @@ def model(case: object, solver):
             "type": "NB" 
         },
         "S_NBMIN_DUB_L1": {
-            "Condition": lambda: sum(instance.PD[d].value for d in instance.D_ROI) >= 4000/instance.baseMVA,
+            "Condition": DemandCondition("D_ROI", 4000/baseMVA),
             "Ug_LB": 2,
             "Ug_UB": None,
             "type": "NB" 
         },
         "S_NBMIN_DUB_L2": {
-            "Condition": lambda: sum(instance.PD[d].value for d in instance.D_ROI) >= 4700/instance.baseMVA,
+            "Condition": DemandCondition("D_ROI", 4700/baseMVA),
             "Ug_LB": 3,
             "Ug_UB": None,
             "type": "NB" 
@@ -503,43 +342,271 @@ def model(case: object, solver):
             "type": "NB" 
         },
     }
-    MUON_NB_constraints_list = ['S_NBMIN_DUB_L2']
-    MUON_constraints(case, instance, MUON_NB_constraint_dict, selected_constraints = MUON_NB_constraints_list)
     
     #- MUON NB Big-M Constraints
     MUON_NB_bigM_constraint_dict={
             "S_NBMIN_CPS": {
-                "PDlim": 1550/instance.baseMVA, #When demand above this value
-                "pGlim": 450/instance.baseMVA, #And wind in NI below this value
+                "Condition": DemandCondition("D_NI", 1550/baseMVA), #When demand above this value
+                "pGlim": 450/baseMVA, #And wind in NI below this value
                 "Ug_LB": 1,
                 "Ug_UB": None, 
             },
             "S_NBMIN_MP_NB": {
-                "pGlim": 1000/instance.baseMVA, #When wind generation in ROI less than                                    
+                "pGlim": 1000/baseMVA, #When wind generation in ROI less than                                    
                 "Ug_LB": 1,
                 "Ug_UB": None, 
             },
 
     }
-    MUON_NB_bigM_constraints_list = []
+
+    return MUON_MW_constraint_dict, MUON_NB_constraint_dict, MUON_NB_bigM_constraint_dict
+
+
+#========== START OF MODEL FUNCTION =============#
+
+#Define static sets (built once per instance)
+static_sets = [
+    ComponentName.B,
+    ComponentName.b0,
+    ComponentName.G,
+    ComponentName.generator_mapping,
+    ComponentName.G_prorata,
+    ComponentName.G_prorata_map,
+    ComponentName.G_prorata_pairs,
+    ComponentName.G_individual,
+    ComponentName.G_uncontrollable,
+    ComponentName.G_s,
+    ComponentName.G_ns,
+    ComponentName.prorata_groups,
+    ComponentName.L,
+    #ComponentName.L_nonzero, #Defined each timestep
+    ComponentName.bus_line_in,
+    ComponentName.bus_line_out,
+    ComponentName.line_busses,
+    ComponentName.TRANSF,
+    #ComponentName.TRANSF_nonzero, #Defined each timestep
+    ComponentName.bus_transformer_in,
+    ComponentName.bus_transformer_out,
+    ComponentName.transformer_busses,
+    ComponentName.D,
+    ComponentName.DNeg,
+    ComponentName.demand_bus_mapping,
+]
+
+#Define static parameters (built once per instance, time dependent ones are preloaded for the first iteration)
+static_params = [
+    ComponentName.line_max_continuous_P, #Defined each timestep
+    ComponentName.line_susceptance,
+    ComponentName.line_reactance,
+    ComponentName.transformer_max_continuous_P, #Defined each timestep
+    ComponentName.transformer_susceptance,
+    ComponentName.transformer_reactance,
+    ComponentName.PD, #Defined each timestep
+    ComponentName.VOLL, #Defined each timestep
+    ComponentName.PGmax, #Defined each timestep
+    ComponentName.PGmin, #Defined each timestep
+    # ComponentName.PGMINGEN,
+    ComponentName.c_0, #Defined each timestep
+    ComponentName.c_1,
+    ComponentName.c_bid, #Defined each timestep
+    ComponentName.c_offer, #TODO - Define for each timestep
+    ComponentName.baseMVA,
+    ComponentName.SNSP_curtailment,
+    ComponentName.M_prorata_xi #Tightened each stage by BigMTightening
+]
+
+#Define time dependent sets (to be updated each iteration)
+ts_sets = [ComponentName.L_nonzero,
+           ComponentName.TRANSF_nonzero] 
+
+#Define time dependent parameters (to be updated each iteration)
+ts_params = [ComponentName.PD,
+            ComponentName.VOLL,
+            ComponentName.line_max_continuous_P,
+            ComponentName.transformer_max_continuous_P,
+            ComponentName.PGmin,
+            ComponentName.PGmax,
+            # ComponentName.PGMINGEN,
+            ComponentName.c_bid]
+
+
+def zone_sets(case: object):
+    '''
+    Returns the names of demands and generators in the ROI and NI zones (and the wind generators within each zone),
+    keyed by the name of the set they form in the instance.
+    '''
+    demands = case.demands.merge(case.busses[['name', 'zone']], how = 'inner', left_on = 'busname', right_on = 'name', suffixes = ('', '_drop'))\
+                          .drop(columns='name_drop')
+    generators = case.generators.merge(case.busses[['name', 'zone']], how = 'inner', left_on = 'busname', right_on = 'name', suffixes = ('', '_drop'))\
+                                .drop(columns='name_drop')
+
+    return {'D_ROI': list(demands.loc[lambda d: d['zone'] == 'ROI']['name']),
+            'D_NI': list(demands.loc[lambda d: d['zone'] == 'NI']['name']),
+            'G_ROI': list(generators.loc[lambda d: d['zone'] == 'ROI']['name']),
+            'G_NI': list(generators.loc[lambda d: d['zone'] == 'NI']['name']),
+            'G_ROI_Wind': list(generators.loc[lambda d: (d['zone'] == 'ROI') & (d['FuelType'] == 'Wind')]['name']),
+            'G_NI_Wind': list(generators.loc[lambda d: (d['zone'] == 'NI') & (d['FuelType'] == 'Wind')]['name'])}
+
+
+def carried_forward(case: object):
+    '''
+    A copy of the case with each ts table aligned to its iterations, and values missing from an iteration's ts data
+    carried forward from the previous iteration, as they are by the instance over a serial run. The iterations of the
+    copy can be solved in any order, or split across processes, with the parameters of a serial run.
+    '''
+    carried = copy.copy(case)
+    for key in [k for k in case.keys() if k.startswith("ts_")]:
+        carried[key] = case[key].ffill().reindex(case.iterations)
+    return carried
+
+
+def MUON_condition_flags(case: object):
+    '''
+    ConditionFlags of the conditions of the MUON constraint definitions (by constraint name) in every iteration of
+    the case, evaluated on its ts_PD with the demands of each zone.
+    '''
+    conditions = {}
+    for constraint_dict in MUON_constraint_dicts(case.baseMVA):
+        conditions.update({constraint: definition["Condition"] for constraint, definition in constraint_dict.items()
+                           if definition.get("Condition") is not None})
+    return ConditionFlags.from_case(case, conditions, zone_sets(case))
+
+
+def curtailment_volumes(cache):
+    '''
+    Adds the surplus, SNSP, MUON and constraint volumes (overall and per generator) to the InstanceCache of a
+    DCOPF stage, calculated from its cached PGmax, PG_MARKET, PG_SECURE and pG values (see data_io.curtailment,
+    which calculates those of all iterations of a run at once).
+    '''
+    curtailment.volumes(curtailment.CurtailmentArrays.capture([cache])).apply([cache])
+
+
+def build_instance(case: object, matrix_network = True, formulation = "angle", presolve = False):
+    '''
+    Builds the static instance used by every iteration: sets, zone sets, parameters, variables,
+    the constraints of all three stages and the MUON blocks. All constraints are left deactivated,
+    with parameters and time dependent sets preloaded for the first iteration.
+
+    With matrix_network, the KCL, KVL and voltage angle constraints of the DCOPF stage are built from
+    sparse network matrices (see matrix_constraints.py) rather than per-bus and per-line rules.
+
+    formulation selects the network constraints of the DCOPF stage (see network_constraints): "angle" (bus voltage
+    angles, per-bus KCL and KVL) or "ptdf" (branch flows as PTDF functions of the injections, with the system
+    balance of KCL_copperplate). The PTDF formulation is only available with matrix_network.
+
+    With presolve, duplicate rows, rows that are variable bounds and (with matrix_network) the angle difference
+    equalities are presolved out of the instance (see presolve.py), with the reductions recorded on
+    instance.presolve.
+    '''
+    if formulation not in network_constraints:
+        raise ValueError(f"Unknown network formulation {formulation}. Supported formulations: {list(network_constraints)}")
+    if formulation == "ptdf" and not matrix_network:
+        raise ValueError("The PTDF formulation is only available with matrix_network")
+
+    #Create Model & Instance
+    model = AbstractModel()
+    instance = model.create_instance()
+    #instance.dual = Suffix(direction=Suffix.IMPORT)
+
+    #Add static sets to model
+    build_sets(instance, case, static_sets)
+
+    #ROI & NI zone sets of demands and generators
+    for name, members in zone_sets(case).items():
+        within = instance.D if name.startswith('D_') else instance.G
+        instance.add_component(name, Set(within = within, initialize = members))
+
+
+
+    #Add static parameters to model
+    build_params(instance, case, static_params)
+
+    #Special Model Parameters
+    instance.PG_MARKET = Param(instance.G,
+                            within = Reals,
+                            initialize = {g: 0 for g in instance.G},
+                            mutable = True)
+
+    instance.UG_MARKET = Param(instance.G,
+                                within = Binary,
+                                initialize = {g: 0 for g in instance.G},
+                                mutable = True) 
+
+    #Special Model Parameters
+    instance.PG_SECURE = Param(instance.G,
+                            within = Reals,
+                            initialize = {g: 0 for g in instance.G},
+                            mutable = True)
+
+    instance.UG_SECURE = Param(instance.G,
+                                within = Binary,
+                                initialize = {g: 0 for g in instance.G},
+                                mutable = True) 
+
+    #Define list of variables for model and add to model
+    varlist = [
+        ComponentName.pG,
+        ComponentName.pG_bid,
+        ComponentName.pG_offer,
+        ComponentName.u_g,
+        ComponentName.pD,
+        ComponentName.alpha,
+        ComponentName.xi_cg,
+        ComponentName.xi_prorata,
+        ComponentName.beta_prorata,
+        ComponentName.prorata_minimum_zeta,
+        ComponentName.prorata_curtailment_zeta,
+        ComponentName.deltaL,
+        ComponentName.deltaLT,
+        ComponentName.delta,
+        ComponentName.pL,
+        ComponentName.pLT,
+    ]
+    build_variables(instance, varlist)
+
+    #Preload First Iteration Params & Sets
+    add_iteration_params_to_instance(instance, case, ts_params, case.iterations[0])
+    add_iteration_sets_to_instance(instance, case, ts_sets, case.iterations[0])
+
+    #COPPER PLATE MARKET MODEL CONSTRAINTS #
+    copper_plate_market_constraints = [#Power Balance & Demand Constraints
+                                ComponentName.KCL_copperplate,
+                                ComponentName.demand_real_alpha_controlled,
+                                ComponentName.demand_alpha_max,
+                                ComponentName.demand_alpha_fixneg,
+                                 
+                                 #Generation Constraints
+                                 ComponentName.gen_uc_max,
+                                 ComponentName.gen_uc_min]
+    build_constraints(instance, copper_plate_market_constraints)
+
+    #COPPER PLATE SECURE MODEL CONSTRAINTS #
+    copper_plate_secure_constraints = [#constraints for market re-dispatch, pro-rata cosntraint, and SNSP
+                                ComponentName.gen_market_redispatch,
+                                ComponentName.gen_prorata_curtailment_realpower,
+                                ComponentName.gen_SNSP]
+    build_constraints(instance, copper_plate_secure_constraints)
+    
+
+    MUON_MW_constraint_dict, MUON_NB_constraint_dict, MUON_NB_bigM_constraint_dict = MUON_constraint_dicts(value(instance.baseMVA))
+
+    #- MUON MW Constraints
+    MUON_constraints(case, instance, MUON_MW_constraint_dict, selected_constraints = MUON_MW_constraint_list)
+    
+    #- MUON NB Constraints
+    MUON_constraints(case, instance, MUON_NB_constraint_dict, selected_constraints = MUON_NB_constraints_list)
+    
+    #- MUON NB Big-M Constraints
     MUON_NB_BigM_constraints(case, instance, MUON_NB_bigM_constraint_dict, selected_constraints = MUON_NB_bigM_constraints_list)
 
     #DCOPF MODEL CONSTRAINTS #
-    dcopf_constraints = [#Power Balance - Kirchoffs Current Law (P
-                        ComponentName.KCL_networked_realpower_noshunt,
-                        #Power Flow - Kirchoffs Voltage Law
-                        ComponentName.KVL_DCOPF_lines,
-                        ComponentName.KVL_DCOPF_transformer,
+    dcopf_constraints = network_constraints[formulation] + [
                         #Power Flow - Power Line Operational Limits
                         ComponentName.line_cont_realpower_max_ngtve,
                         ComponentName.line_cont_realpower_max_pstve,
-                        ComponentName.volts_line_delta,
                         #Power Flow - Transformer Line Operational Limits
                         ComponentName.transf_continuous_real_max_ngtve,
                         ComponentName.transf_continuous_real_max_pstve,
-                        ComponentName.volts_transformer_delta,
-                        #Reference bus voltage
-                        ComponentName.volts_reference_bus,
                         #Redispatch COnstraint
                         ComponentName.gen_secure_redispatch,
                         #Pro-Rata Constraint Group Constraints
@@ -549,243 +616,433 @@ def model(case: object, solver):
                         ComponentName.gen_prorata_xi_min,
                         ComponentName.gen_prorata_beta,
                     ]
-    build_constraints(instance, dcopf_constraints)
+    instance.network_matrices = NetworkMatrices.from_instance(instance) if matrix_network else None
+    instance.network_formulation = formulation
+    build_network_constraints(instance, dcopf_constraints)
 
     #Deactivate all constraints ready for iteration
-    global_constraints = ['KCL_copperplate', 'demand_real_alpha_controlled', 'demand_alpha_max', 'demand_alpha_fixneg', 'gen_uc_max', 'gen_uc_min', 'gen_market_redispatch', 'gen_prorata_curtailment_realpower', 'gen_SNSP', 'KCL_networked_realpower_noshunt', 'KVL_DCOPF_lines', 'KVL_DCOPF_transformer', 'line_cont_realpower_max_ngtve', 'line_cont_realpower_max_pstve', 'volts_line_delta', 'transf_continuous_real_max_ngtve', 'transf_continuous_real_max_pstve', 'volts_transformer_delta', 'volts_reference_bus', 'gen_secure_redispatch', 'gen_prorata_realpower_max_xi', 'gen_prorata_realpower_min_xi', 'gen_prorata_xi_max', 'gen_prorata_xi_min', 'gen_prorata_beta']
+    global_constraints = ['KCL_copperplate', 'demand_real_alpha_controlled', 'demand_alpha_max', 'demand_alpha_fixneg', 'gen_uc_max', 'gen_uc_min', 'gen_market_redispatch', 'gen_prorata_curtailment_realpower', 'gen_SNSP', 'line_cont_realpower_max_ngtve', 'line_cont_realpower_max_pstve', 'transf_continuous_real_max_ngtve', 'transf_continuous_real_max_pstve', 'gen_secure_redispatch', 'gen_prorata_realpower_max_xi', 'gen_prorata_realpower_min_xi', 'gen_prorata_xi_max', 'gen_prorata_xi_min', 'gen_prorata_beta']
+    global_constraints += network_constraints[formulation]
     block_constraints =  ['MUON', 'MUON_NB_BigM']
     for c in global_constraints:
         getattr(instance, c).deactivate()
     for block in block_constraints:
         getattr(instance, block).deactivate()
 
+    if presolve:
+        Presolve().run(instance, bounds = presolve_bound_constraints,
+                       substitutions = presolve_substitutions if formulation == "angle" else None,
+                       exclude = [c for constraints in rebuilt_network_constraints.values() for c in constraints])
+
+    return instance
+
+
+def solve_stage(instance, solver, iteration, stage, warmstart = None, fastmode = None, lazy = None, market = None):
+    '''
+    Solves the instance for a stage of an iteration. If a WarmStartManager is given, the stage is seeded from
+    the previous stage before solving, and whether HiGHS accepted the start is recorded. If a CommitmentFixing
+    is given as fastmode, the stage is first solved with its binaries fixed at the previous iteration's values,
+    falling back to the MIP. If a LazyLineLimits is given as lazy, the DCOPF stage is solved with the branch
+    limits it monitors, adding violated limits until none remain. If a MeritOrderMarket is given as market, the
+    market stage is solved in merit order where that is certified by its LP bound, falling back to the MIP.
+    '''
+    def solve_mip(opt = None):
+        if warmstart is None:
+            return pyosolve.solveinstance(instance, solver = solver, opt = opt)
+
+        seeded = warmstart.seed(instance, stage)
+        with warmstart.record(iteration, stage, seeded):
+            return pyosolve.solveinstance(instance, solver = solver, opt = opt)
+
+    def solve():
+        if fastmode is None:
+            return solve_mip()
+        return fastmode.solve(instance, solver, iteration, stage, solve_mip)
+
+    if lazy is not None and stage == "dcopf":
+        return lazy.solve(instance, iteration, solve)
+    if market is not None and stage == "copper_market":
+        return market.solve(instance, iteration, solve)
+    return solve()
+
+
+#Constraints active in each stage (stages are activated in order, each from the state left by the previous stage)
+market_constraints_to_activate = [#Add Power Balance & Demand
+                                  ComponentName.KCL_copperplate,
+                                  ComponentName.demand_real_alpha_controlled,
+                                  ComponentName.demand_alpha_max,
+                                  ComponentName.demand_alpha_fixneg,
+                                  #Add Generation Constraints
+                                  ComponentName.gen_uc_max,
+                                  ComponentName.gen_uc_min
+                                 ]
 
+secure_constraints_to_activate = [#Market Redispatch
+                                  ComponentName.gen_market_redispatch,
+                                  #Prorata Curtailment
+                                  ComponentName.gen_prorata_curtailment_realpower,
+                                  #SNSP
+                                  ComponentName.gen_SNSP
+                                 ]
 
-
-    #MODEL ITERATIONS
-    for iteration in case.iterations:
-        #Create new output & result dictionary space
-        output[iteration] = {}
-        result[iteration] = {}
-
-        #~~~~~~~~~~~# ITERATION INPUT DATA UPDATES #~~~~~~~~~~~#
-        #Update parameters for current timestep
-        add_iteration_params_to_instance(instance, case, ts_params, iteration)
-
-        #Update big-M binary parameters for this iteration
-        MUON_NB_BigM_param_update(instance, MUON_NB_bigM_constraint_dict)
-
-        #Update any sets for current timestep
-        add_iteration_sets_to_instance(instance, case, ts_sets, iteration)
-
-        #~~~~~~~~~~~# COPPER PLATE MARKET MODEL SECTION #~~~~~~~~~~~#
-        market_constraints_to_activate = [#Add Power Balance & Demand
-                                   ComponentName.KCL_copperplate,
-                                   ComponentName.demand_real_alpha_controlled,
-                                   ComponentName.demand_alpha_max,
-                                   ComponentName.demand_alpha_fixneg,
-                                   #Add Generation Constraints
-                                   ComponentName.gen_uc_max,
-                                   ComponentName.gen_uc_min
+constraints_to_deactivate_for_dcopf = [#Generation constraints used in previous models (superceeded by updated PGmax)
+                                       ComponentName.gen_market_redispatch,
+                                       ComponentName.gen_prorata_curtailment_realpower
+                                      ]
+
+#Network constraints of the DCOPF stage under each formulation
+network_constraints = {"angle": [#Power Balance - Kirchoffs Current Law (P
+                                 ComponentName.KCL_networked_realpower_noshunt,
+
+                                 #Power Flow - Kirchoffs Voltage Law
+                                 ComponentName.KVL_DCOPF_lines,
+                                 ComponentName.KVL_DCOPF_transformer,
+                                 ComponentName.volts_line_delta,
+                                 ComponentName.volts_transformer_delta,
+
+                                 #Reference bus voltage
+                                 ComponentName.volts_reference_bus
+                                ],
+                       #Power Balance (system) is kept from the copper plate stages by KCL_copperplate
+                       "ptdf": [#Power Balance - Islands split from the slack bus
+                                ComponentName.PTDF_island_balance,
+
+                                #Power Flow - Branch flows from injections
+                                ComponentName.PTDF_lines,
+                                ComponentName.PTDF_transformer
+                               ]}
+
+#Network constraints with variable set dimensions (branches in service), rebuilt each iteration
+#(and, with network matrices, the reference bus of each island of the branches in service)
+rebuilt_network_constraints = {"angle": [ComponentName.KVL_DCOPF_lines, ComponentName.KVL_DCOPF_transformer,
+                                         ComponentName.volts_reference_bus],
+                               "ptdf": [ComponentName.PTDF_island_balance, ComponentName.PTDF_lines, ComponentName.PTDF_transformer]}
+
+dcopf_constraints_to_activate = [#Power Flow - Power Line Operational Limits
+                                 ComponentName.line_cont_realpower_max_ngtve,
+                                 ComponentName.line_cont_realpower_max_pstve,
+
+                                 #Power Flow - Transformer Line Operational Limits
+                                 ComponentName.transf_continuous_real_max_ngtve,
+                                 ComponentName.transf_continuous_real_max_pstve,
+
+                                 #Redispatch Constraint
+                                 ComponentName.gen_secure_redispatch,
+
+                                 #Pro-Rata Constraint Group Constraints
+                                 ComponentName.gen_prorata_realpower_max_xi,
+                                 ComponentName.gen_prorata_realpower_min_xi,
+                                 ComponentName.gen_prorata_xi_max,
+                                 ComponentName.gen_prorata_xi_min,
+                                 ComponentName.gen_prorata_beta,
                                 ]
-        
-        for c in market_constraints_to_activate:
-            getattr(instance, c).activate()
-        
-        #Set Objective
-        instance.OBJ = Objective(rule = copper_plate_marginal_cost_objective(instance), sense = minimize)
 
-        #Solve Copperplate Model Run
-        result[iteration]["copper_market"] = pyosolve.solveinstance(instance, solver = solver)
+constraints_to_deactivate_to_end_dcopf = [#SNSP Constraint
+                                          'gen_SNSP',
+                                          #Power Flow Limits
+                                          'line_cont_realpower_max_ngtve', 'line_cont_realpower_max_pstve', 'transf_continuous_real_max_ngtve', 'transf_continuous_real_max_pstve',
+                                          #Redispatch
+                                          'gen_secure_redispatch',
+                                          #Prorata Curtailment
+                                          'gen_prorata_realpower_max_xi', 'gen_prorata_realpower_min_xi', 'gen_prorata_xi_max', 'gen_prorata_xi_min', 'gen_prorata_beta',
+                                          #MUON Constraint Blocks
+                                          'MUON', 'MUON_NB_BigM']
 
-        #Define Output Parameters
-        for g in instance.G:
-            instance.PG_MARKET[g] = round(instance.pG[g].value, 6)
 
-        for g in instance.G:
-            instance.UG_MARKET[g] = round(instance.u_g[g].value, 0)
+#Constraints active in every solve once the market stage activates them, whose single variable rows can be
+#presolved into variable bounds
+presolve_bound_constraints = [c for c in market_constraints_to_activate
+                              if c not in constraints_to_deactivate_for_dcopf + constraints_to_deactivate_to_end_dcopf
+                              + [ComponentName.KCL_copperplate]]
 
-        # #Define Data to Save
-        # data_to_cache = {"Var": [], 
-        #             "Param" : [],
-        #             "Set" : []}
-        
-        # #Cache Data
-        # output[iteration]["copper_market"] = pyomo_io.InstanceCache(result[iteration]["copper_market"], data_to_cache)
-        # output[iteration]["copper_market"].set(instance)
-        # output[iteration]["copper_market"].var(instance)
-        # output[iteration]["copper_market"].param(instance)
-        # output[iteration]["copper_market"].obj_value(instance)
-
-        #~~~~~~~~~~~# COPPER PLATE 'SECURE' MODEL SECTION #~~~~~~~~~~~#
-        #Add Constraints (Except MUON Constraints)
-        secure_constraints_to_activate = [#Market Redispatch
-                                         ComponentName.gen_market_redispatch,
-                                         #Prorata Curtailment
-                                         ComponentName.gen_prorata_curtailment_realpower,
-                                         #SNSP
-                                         ComponentName.gen_SNSP
-                                         ]
+#Equalities of the angle formulation that can be presolved out: {constraint: (variable it defines, constraints using it)}
+presolve_substitutions = {ComponentName.volts_line_delta: (ComponentName.deltaL, [ComponentName.KVL_DCOPF_lines]),
+                          ComponentName.volts_transformer_delta: (ComponentName.deltaLT, [ComponentName.KVL_DCOPF_transformer])}
 
-        for c in secure_constraints_to_activate:
+
+def network_formulation(instance):
+    '''The network formulation of the DCOPF stage of an instance ("angle" or "ptdf").'''
+    return getattr(instance, "network_formulation", "angle")
+
+
+def update_iteration(instance, case: object, iteration, flags = None):
+    '''
+    Updates the time dependent parameters and sets of the instance to those of iteration, with the MUON conditions
+    of the iteration looked up in flags ({constraint name: met}) where given.
+    '''
+    _, _, MUON_NB_bigM_constraint_dict = MUON_constraint_dicts(value(instance.baseMVA))
+
+    #Update parameters for current timestep
+    add_iteration_params_to_instance(instance, case, ts_params, iteration)
+
+    #Update big-M binary parameters for this iteration
+    MUON_NB_BigM_param_update(instance, MUON_NB_bigM_constraint_dict, flags)
+
+    #Update any sets for current timestep
+    add_iteration_sets_to_instance(instance, case, ts_sets, iteration)
+
+
+def activate_stage(instance, stage):
+    '''
+    Activates the constraints and sets the objective of a stage ("copper_market", "copper_curtailed" or "dcopf"),
+    from the state left by the previous stage. Constraints that depend on the iteration are applied by
+    apply_iteration_constraints().
+    '''
+    if stage == "copper_market":
+        for c in market_constraints_to_activate:
             getattr(instance, c).activate()
+        objective = copper_plate_marginal_cost_objective
 
+    elif stage == "copper_curtailed":
+        #Add Constraints (Except MUON Constraints)
+        for c in secure_constraints_to_activate:
+            getattr(instance, c).activate()
 
         #Activate overall MUON docs
         getattr(instance, "MUON").activate()
         getattr(instance, "MUON_NB_BigM").activate()
+        objective = redispatch_from_market_cost_objective
 
+    elif stage == "dcopf":
+        #Remove Constraints No Longer Needed
+        for c in constraints_to_deactivate_for_dcopf:
+            getattr(instance, c).deactivate()
+        #Remove Copperplate KCL Constraint (the PTDF formulation keeps it as its system power balance)
+        if network_formulation(instance) == "angle":
+            getattr(instance, ComponentName.KCL_copperplate).deactivate()
+        for c in network_constraints[network_formulation(instance)] + dcopf_constraints_to_activate:
+            getattr(instance, c).activate()
+        objective = redispatch_from_secure_cost_objective
+
+    else:
+        raise ValueError(f"Unknown stage {stage}")
+
+    #Set Objective
+    if hasattr(instance, "OBJ"):
+        instance.del_component(instance.OBJ)
+    instance.OBJ = Objective(rule = objective(instance), sense = minimize)
+
+
+def apply_iteration_constraints(instance, stage, flags = None):
+    '''
+    Applies the constraints a stage adds that depend on the iteration: the conditional MUON constraints (secure
+    stage) and the KVL or PTDF constraints of the branches in service (DCOPF stage). An instance solving the DCOPF stage
+    of an iteration must also have had those of the secure stage applied for that iteration. The MUON conditions of
+    the iteration are looked up in flags ({constraint name: met}) where given, and evaluated on the instance otherwise.
+    '''
+    if stage == "copper_curtailed":
+        MUON_MW_constraint_dict, MUON_NB_constraint_dict, _ = MUON_constraint_dicts(value(instance.baseMVA))
         #Conditionally activate MUON MW and NB constraints
         MUON_conditional_activation(instance,
                                     MUON_MW_constraint_dict | MUON_NB_constraint_dict,
-                                    MUON_MW_constraint_list+MUON_NB_constraints_list)
-    
-        #Update Objective
-        instance.del_component(instance.OBJ)
-        instance.OBJ = Objective(rule = redispatch_from_market_cost_objective(instance), sense = minimize)
-                        
-        #Solve Copperplate Model Run
-        result[iteration]["copper_curtailed"] = pyosolve.solveinstance(instance, solver = solver)
-
-        #Define Output Parameters
-        for g in instance.G:
-            instance.PG_SECURE[g] = round(instance.pG[g].value, 6)
-
-        for g in instance.G:
-            instance.UG_SECURE[g] = round(instance.u_g[g].value, 0)
-
-        # #Define Data to Save
-        # data_to_cache = {"Var": [], 
-        #             "Param" : [],
-        #             "Set" : []}
-        
-        # #Cache Data
-        # output[iteration]["copper_curtailed"] = pyomo_io.InstanceCache(result[iteration]["copper_curtailed"], data_to_cache)
-        # output[iteration]["copper_curtailed"].set(instance)
-        # output[iteration]["copper_curtailed"].var(instance)
-        # output[iteration]["copper_curtailed"].param(instance)
-        # output[iteration]["copper_curtailed"].obj_value(instance)
+                                    MUON_MW_constraint_list+MUON_NB_constraints_list,
+                                    flags)
 
+    elif stage == "dcopf":
+        #Rebuild constraints with variable set dimensions (Line and Transformers):
+        build_network_constraints(instance, rebuilt_network_constraints[network_formulation(instance)])
 
-        #~~~~~~~~~~~# DCOPF MODEL SECTION #~~~~~~~~~~~#
-        #Remove Constraints No Longer Needed
-        constraints_to_deactivate_for_dcopf = [#Generation constraints used in previous models (superceeded by updated PGmax)
-                                 ComponentName.gen_market_redispatch,
-                                 ComponentName.gen_prorata_curtailment_realpower,
-                                 
-                                 #Remove Copperplate KCL Constraint
-                                 ComponentName.KCL_copperplate
-                                 ]
-        
-        for c in constraints_to_deactivate_for_dcopf:
-            getattr(instance, c).deactivate()
 
-        #Rebuild constraints with variable set dimensions (Line and Transformers):
-        constraints_to_rebuild = [ComponentName.KVL_DCOPF_lines, ComponentName.KVL_DCOPF_transformer]
-        build_constraints(instance, constraints_to_rebuild)
-
-        #Activate in dcopf constraints
-        dcopf_constraints_to_activate = [#Power Balance - Kirchoffs Current Law (P
-                                     ComponentName.KCL_networked_realpower_noshunt,
-                                    
-                                     #Power Flow - Kirchoffs Voltage Law
-                                     ComponentName.KVL_DCOPF_lines,
-                                     ComponentName.KVL_DCOPF_transformer,
-                                    
-                                     #Power Flow - Power Line Operational Limits
-                                     ComponentName.line_cont_realpower_max_ngtve,
-                                     ComponentName.line_cont_realpower_max_pstve,
-                                     ComponentName.volts_line_delta,
-
-                                     #Power Flow - Transformer Line Operational Limits
-                                     ComponentName.transf_continuous_real_max_ngtve,
-                                     ComponentName.transf_continuous_real_max_pstve,
-                                     ComponentName.volts_transformer_delta,
-
-                                     #Reference bus voltage
-                                     ComponentName.volts_reference_bus,
-
-                                     #Redispatch Constraint
-                                     ComponentName.gen_secure_redispatch,
-
-                                     #Pro-Rata Constraint Group Constraints
-                                     ComponentName.gen_prorata_realpower_max_xi,
-                                     ComponentName.gen_prorata_realpower_min_xi,
-                                     ComponentName.gen_prorata_xi_max,
-                                     ComponentName.gen_prorata_xi_min,
-                                     ComponentName.gen_prorata_beta,
-                                    ]
-    
-        for c in dcopf_constraints_to_activate:
-            getattr(instance, c).activate()
+def tighten_big_m(instance, iteration, stage, bigm = None):
+    '''Writes the big-M values of the stage, tightened from its active constraints, if a BigMTightening is given.'''
+    if bigm is None:
+        return
+    _, _, MUON_NB_bigM_constraint_dict = MUON_constraint_dicts(value(instance.baseMVA))
+    bigm.tighten(instance, iteration, stage, MUON_NB_BigM_switches(instance, MUON_NB_bigM_constraint_dict))
 
-        #Update Objective
-        instance.del_component(instance.OBJ)
-        instance.OBJ = Objective(rule = redispatch_from_secure_cost_objective(instance), sense = minimize)
 
+def deactivate_stages(instance):
+    '''
+    Deactivates the constraints of the secure and DCOPF stages and deletes the objective, leaving the instance
+    ready for the market stage of the next iteration.
+    '''
+    for c in constraints_to_deactivate_to_end_dcopf + network_constraints[network_formulation(instance)]:
+        getattr(instance, c).deactivate()
 
-        result[iteration]["dcopf"] = pyosolve.solveinstance(instance, solver = solver)
+    #Delete objective
+    instance.del_component(instance.OBJ)
+
+
+def market_solution(instance):
+    '''Sets the PG_MARKET and UG_MARKET parameters from the solved market stage.'''
+    for g in instance.G:
+        instance.PG_MARKET[g] = round(instance.pG[g].value, 6)
+
+    for g in instance.G:
+        instance.UG_MARKET[g] = round(instance.u_g[g].value, 0)
+
+
+def secure_solution(instance):
+    '''Sets the PG_SECURE and UG_SECURE parameters from the solved secure stage.'''
+    for g in instance.G:
+        instance.PG_SECURE[g] = round(instance.pG[g].value, 6)
+
+    for g in instance.G:
+        instance.UG_SECURE[g] = round(instance.u_g[g].value, 0)
+
+
+def dcopf_output(instance, result, volumes = True):
+    '''
+    InstanceCache of the solved DCOPF stage, with its curtailment and constraint volumes (unless volumes is False,
+    for them to be calculated later with data_io.curtailment.attribute()).
+    '''
+    #Define Data to Save
+    data_to_cache = {"Var": [],
+                "Param" : [],
+                "Set" : []}
+
+    #Values of the variables presolved out of the instance
+    if getattr(instance, "presolve", None) is not None:
+        instance.presolve.restore(instance)
+
+    #Cache Data
+    output = pyomo_io.InstanceCache(result, data_to_cache)
+    output.set(instance)
+    output.var(instance)
+    output.param(instance)
+    output.obj_value(instance)
+
+    #~~~~~~~~~~~# CALCULATE CURTAILMENT AND CONSTRAINT VOLUMES #~~~~~~~~~~~#
+    if volumes:
+        curtailment_volumes(output)
+    return output
+
+
+def solve_iteration(instance, case: object, iteration, solver, warmstart = None, fastmode = None, lazy = None, bigm = None,
+                    market = None, volumes = True, flags = None):
+    '''
+    Solves the copper plate market, copper plate secure and DCOPF stages for a single iteration on an
+    instance created by build_instance(), returning the (output, result) dictionaries for that iteration.
+    A WarmStartManager can be given as warmstart to seed each stage from the previous one, a CommitmentFixing
+    as fastmode to solve each stage with its binaries fixed where that is within tolerance of the MIP, and a
+    LazyLineLimits as lazy to generate the branch limits of the DCOPF stage as they are violated, and a
+    BigMTightening as bigm to tighten the big-M values of the secure and DCOPF stages before they are solved, and
+    a MeritOrderMarket as market to solve the market stage in merit order. With volumes False, the curtailment
+    volumes of the DCOPF output are left to be calculated after the run (see data_io.curtailment). The MUON conditions
+    are looked up in ConditionFlags given as flags (see MUON_condition_flags()), rather than evaluated on the instance.
+    '''
+    #Create new output & result dictionary space
+    output = {}
+    result = {}
+
+    #~~~~~~~~~~~# ITERATION INPUT DATA UPDATES #~~~~~~~~~~~#
+    conditions = flags.row(iteration) if flags is not None else None
+    update_iteration(instance, case, iteration, conditions)
+
+    #~~~~~~~~~~~# COPPER PLATE MARKET MODEL SECTION #~~~~~~~~~~~#
+    activate_stage(instance, "copper_market")
+    result["copper_market"] = solve_stage(instance, solver, iteration, "copper_market", warmstart, fastmode, market = market)
+    market_solution(instance)
+
+    #~~~~~~~~~~~# COPPER PLATE 'SECURE' MODEL SECTION #~~~~~~~~~~~#
+    activate_stage(instance, "copper_curtailed")
+    apply_iteration_constraints(instance, "copper_curtailed", conditions)
+    tighten_big_m(instance, iteration, "copper_curtailed", bigm)
+    result["copper_curtailed"] = solve_stage(instance, solver, iteration, "copper_curtailed", warmstart, fastmode)
+    secure_solution(instance)
+
+    #~~~~~~~~~~~# DCOPF MODEL SECTION #~~~~~~~~~~~#
+    activate_stage(instance, "dcopf")
+    apply_iteration_constraints(instance, "dcopf", conditions)
+    tighten_big_m(instance, iteration, "dcopf", bigm)
+    result["dcopf"] = solve_stage(instance, solver, iteration, "dcopf", warmstart, fastmode, lazy)
+    output["dcopf"] = dcopf_output(instance, result["dcopf"], volumes)
+
+    #~~~~~~~~~~~# COPPER PLATE TEST CODE RESET #~~~~~~~~~~~#
+    deactivate_stages(instance)
 
-        #Define Data to Save
-        data_to_cache = {"Var": [], 
-                    "Param" : [],
-                    "Set" : []}
-        
-        #Cache Data
-        output[iteration]["dcopf"] = pyomo_io.InstanceCache(result[iteration]["dcopf"], data_to_cache)
-        output[iteration]["dcopf"].set(instance)
-        output[iteration]["dcopf"].var(instance)
-        output[iteration]["dcopf"].param(instance)
-        output[iteration]["dcopf"].obj_value(instance)
-
-        #~~~~~~~~~~~# COPPER PLATE TEST CODE RESET #~~~~~~~~~~~#
-        #list of constraints to deactivate
-        constraints_to_deactivate_to_end_dcopf = [#SNSP Constraint
-                                     'gen_SNSP',
-                                     #KCL Power Balance
-                                     'KCL_networked_realpower_noshunt',
-                                     #KVL Power FLow
-                                     'KVL_DCOPF_lines', 'KVL_DCOPF_transformer', 'line_cont_realpower_max_ngtve', 'line_cont_realpower_max_pstve', 'volts_line_delta', 'transf_continuous_real_max_ngtve', 'transf_continuous_real_max_pstve', 'volts_transformer_delta', 'volts_reference_bus',
-                                     #Redispatch 
-                                     'gen_secure_redispatch',
-                                     #Prorata Curtailment
-                                     'gen_prorata_realpower_max_xi', 'gen_prorata_realpower_min_xi', 'gen_prorata_xi_max', 'gen_prorata_xi_min', 'gen_prorata_beta',
-                                     #MUON Constraint Blocks
-                                    'MUON', 'MUON_NB_BigM']
-        
-        for c in constraints_to_deactivate_to_end_dcopf:
-            getattr(instance, c).deactivate()
-        
-        #Delete objective
-        instance.del_component(instance.OBJ)
-    
-        #~~~~~~~~~~~# CALCULATE CURTAILMENT AND CONSTRAINT VOLUMES #~~~~~~~~~~~#
-        #Calculate overall surplus volumes, and surplus per generator
-        setattr(output[iteration]["dcopf"], 'V_Surplus', sum((instance.PGmax[g].value - instance.PG_MARKET[g].value) for g in instance.G_ns))
-        setattr(output[iteration]["dcopf"], 'v_Surplus_g', {g: (instance.PGmax[g].value - instance.PG_MARKET[g].value) for g in instance.G_ns})
-        output[iteration]["dcopf"].v_Surplus_g.update({g: 0 for g in instance.G_s})
-        
+    return output, result
 
-        #Calculate overall SNSP volume. Then divide by non-synchronous generators pro-rata.
-        setattr(output[iteration]["dcopf"], 'V_SNSP', max(0, sum(instance.PG_MARKET[g].value for g in instance.G_ns) - 0.75*sum(instance.PG_MARKET[g].value for g in instance.G)))
-        setattr(output[iteration]["dcopf"], 'x_SNSP', max(0, sum(instance.PG_MARKET[g].value for g in instance.G_ns)/sum(instance.PG_MARKET[g].value for g in instance.G_ns) - 0.75))
-        setattr(output[iteration]["dcopf"], 'v_SNSP_g', {g: (instance.PG_MARKET[g].value * output[iteration]["dcopf"].x_SNSP) for g in instance.G_ns})
-        output[iteration]["dcopf"].v_SNSP_g.update({g: 0 for g in instance.G_s})
 
-        #Calculate overall MUON volume. Then divide by non-synchronous generators pro-rata
-        setattr(output[iteration]["dcopf"], 'V_MUON', sum((instance.PG_MARKET[g].value - instance.PG_SECURE[g].value) for g in instance.G_ns) - output[iteration]["dcopf"].V_SNSP)
-        setattr(output[iteration]["dcopf"], 'x_MUON', output[iteration]["dcopf"].V_MUON / sum(instance.PG_MARKET[g].value for g in instance.G_ns))
-        setattr(output[iteration]["dcopf"], 'v_MUON_g', {g: (instance.PG_MARKET[g].value * output[iteration]["dcopf"].x_MUON) for g in instance.G_ns})
-        output[iteration]["dcopf"].v_MUON_g.update({g: 0 for g in instance.G_s})
+def constraint_config(case: object, solver, fastmode = None, formulation = "angle"):
+    '''
+    The configuration that, with the case data, determines the solution of each iteration: the selected MUON
+    constraints and their definitions, the network formulation, the solver and the fast mode tolerance.
+    '''
+    return {"MUON_MW": MUON_MW_constraint_list,
+            "MUON_NB": MUON_NB_constraints_list,
+            "MUON_NB_bigM": MUON_NB_bigM_constraints_list,
+            "MUON_definitions": MUON_constraint_dicts(case.baseMVA),
+            "network_formulation": formulation,
+            "solver": solver,
+            "fastmode_tolerance": None if fastmode is None else fastmode.tolerance}
 
-        #Calculate overall constraint volume.
-        setattr(output[iteration]["dcopf"],'V_Constraint', sum((instance.PG_SECURE[g].value - instance.pG[g].value) for g in instance.G_ns))
-        setattr(output[iteration]["dcopf"],'x_Constraint',{g: (instance.PG_SECURE[g].value - instance.pG[g].value)/instance.PG_SECURE[g].value if instance.PG_SECURE[g].value > 0 else 0 for g in instance.G_ns})
-        setattr(output[iteration]["dcopf"], 'v_Constraint_g',{g: (instance.PG_SECURE[g].value - instance.pG[g].value) for g in instance.G_ns})
-        output[iteration]["dcopf"].v_Constraint_g.update({g: 0 for g in instance.G_s})
-        ...
 
+def model(case: object, solver, template = None, checkpoint = None, warmstart = None, fastmode = None, cache = None,
+          formulation = "angle", lazy = None, presolve = False, bigm = None, market = None):
+    '''
+    Runs all iterations of the case, with the DCOPF network constraints of formulation ("angle" or "ptdf", see
+    build_instance()). If a ModelTemplate of a prebuilt instance is given, a clone of it is used rather than
+    rebuilding the instance (and formulation is that of the template).
 
+    If a CheckpointStore is given as checkpoint, each iteration's output and result are saved to it
+    as the iteration completes, and iterations already held in the store are loaded rather than solved.
+
+    If a WarmStartManager is given as warmstart, each stage is seeded from the previous stage (and the market
+    stage from the previous iteration's commitment), with the acceptance of each start recorded on the manager.
+    If a CommitmentFixing is given as fastmode, each stage is first solved as an LP with its binaries fixed at
+    the previous iteration's values, with the path taken recorded on it.
+
+    If a SolveCache is given as cache, iterations whose input fingerprint (ts rows, static case data and
+    constraint_config()) is held in the cache are loaded from it, and each solved iteration is saved to it.
+
+    If a LazyLineLimits is given as lazy, the DCOPF stage is solved with the limits of the branches that bound
+    in the previous iteration, adding violated limits until none remain, with the rounds recorded on it.
+
+    With presolve, the instance is presolved as it is built (see build_instance()).
+
+    If a BigMTightening is given as bigm, the big-M values of the MUON NB Big-M and pro-rata constraints are set
+    to the tightest valid for each stage before it is solved, with the values recorded on it.
+
+    If a MeritOrderMarket is given as market, the market stage of each iteration is solved in merit order with
+    commitment heuristics where its LP bound certifies the solution, and as the MIP otherwise, with the path
+    taken recorded on it.
+
+    The conditions of the MUON constraints are evaluated for every iteration before the first is solved (see
+    MUON_condition_flags()).
+
+    The curtailment and constraint volumes of every iteration (including those loaded from checkpoint or cache,
+    which are saved without them) are calculated together once the iterations are solved (see data_io.curtailment).
+    '''
+    instance = None
+    skipped = []
+    if template is not None:
+        formulation = network_formulation(template.instance)
+    keys = solve_cache.fingerprints(case, constraint_config(case, solver, fastmode, formulation)) if cache is not None else {}
+    flags = MUON_condition_flags(case)
+
+    #Create Data Ouput & Result Dictionaries
+    output = {"format": "iteration"}
+    result = {"format": "iteration"}
+
+    #MODEL ITERATIONS
+    for iteration in case.iterations:
+        if checkpoint is not None and iteration in checkpoint:
+            output[iteration], result[iteration] = checkpoint.load(iteration)
+            skipped.append(iteration)
+            continue
+        if cache is not None and keys[iteration] in cache:
+            output[iteration], result[iteration] = cache.load(keys[iteration])
+            skipped.append(iteration)
+            continue
+
+        if instance is None:
+            instance = template.clone() if template is not None else build_instance(case, formulation = formulation, presolve = presolve)
+        #Time dependent values missing from an iteration's ts data carry over from the previous iteration,
+        #including those that were loaded rather than solved
+        for skipped_iteration in skipped:
+            add_iteration_params_to_instance(instance, case, ts_params, skipped_iteration)
+        skipped = []
+
+        output[iteration], result[iteration] = solve_iteration(instance, case, iteration, solver, warmstart, fastmode, lazy,
+                                                               bigm, market, volumes = False, flags = flags)
+        if checkpoint is not None:
+            checkpoint.save(iteration, output[iteration], result[iteration])
+        if cache is not None:
+            cache.save(keys[iteration], output[iteration], result[iteration])
+
+    #~~~~~~~~~~~# CALCULATE CURTAILMENT AND CONSTRAINT VOLUMES #~~~~~~~~~~~#
+    curtailment.attribute(output)
     return output, result
 
 
@@ -75,7 +75,8 @@ def model(case: object, solver):
         ComponentName.c_1,
         ComponentName.c_bid, #Defined each timestep
         ComponentName.baseMVA,
-        ComponentName.SNSP_curtailment
+        ComponentName.SNSP_curtailment,
+        ComponentName.M_prorata_xi
     ]
     build_params(instance, case, paramlist)
 
@@ -0,0 +1,914 @@
+'''
+Direct HiGHS engine for the all island market, secure and DCOPF stages.
+
+Solves the same three stages as all_island_iterations_PSCC, with the constraints of Constraint_Blocks and the
+objectives of obj_functions.py, but without building Pyomo components or expression trees. The constraint matrix,
+bounds and costs are assembled once from the case with numpy/scipy.sparse and passed to highspy. Each iteration then
+only changes values in the existing model:
+ - row bounds, to activate the constraints of each stage and apply the RHS of the redispatch constraints,
+ - column bounds, for line and transformer ratings,
+ - costs, for each stage objective,
+ - the coefficients that the Pyomo model multiplies into a variable (PD * alpha, PGmax/PGmin * u_g,
+   PG_MARKET * zeta, PG_SECURE * xi, and the big-M values * y_G of the MUON NB Big-M constraints), which are changed
+   in place with changeCoeff.
+
+Results are returned in the same (output, result) format as all_island_iterations_PSCC.model(), with an InstanceCache
+per iteration holding the DCOPF stage sets, variables, parameters, objective and curtailment volumes.
+'''
+
+import copy
+import logging
+import time
+from types import SimpleNamespace
+
+import highspy
+import numpy as np
+import scipy.sparse as sp
+from pyomo.opt import SolverResults, SolverStatus, TerminationCondition
+
+import data_io.helpers as helpers
+import data_io.curtailment as curtailment
+import data_io.pyomo_io as pyomo_io
+import pyomo_models.models.all_island_iterations_PSCC as pscc
+from pyomo_models.build.build_functions import param_data, set_data
+from pyomo_models.build.names import ComponentName
+from pyomo_models.build.network import NetworkMatrices
+
+# Set up logger
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+handler = logging.StreamHandler()
+formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+handler.setFormatter(formatter)
+logger.addHandler(handler)
+
+INF = highspy.kHighsInf
+
+#Stages, in solve order (named as the result keys of all_island_iterations_PSCC)
+MARKET, SECURE, DCOPF = "copper_market", "copper_curtailed", "dcopf"
+STAGES = (MARKET, SECURE, DCOPF)
+
+#Variables that are part of each stage model, and so are given values when the stage is solved
+STAGE_VARIABLES = {
+    MARKET: ("pG", "u_g", "pD", "alpha"),
+    SECURE: ("pG", "pG_bid", "pG_offer", "u_g", "pD", "alpha", "prorata_curtailment_zeta", "bMvar_y_G", "bMvar_y"),
+    DCOPF: ("pG", "pG_bid", "pG_offer", "u_g", "pD", "alpha", "xi_cg", "xi_prorata", "beta_prorata",
+            "deltaL", "deltaLT", "delta", "pL", "pLT", "bMvar_y_G", "bMvar_y"),
+}
+
+#Time dependent parameters: (case ts table, per unit)
+TS_PARAMS = {
+    ComponentName.PD: ("ts_PD", True),
+    ComponentName.VOLL: ("ts_VOLL", False),
+    ComponentName.line_max_continuous_P: ("ts_Lmax", True),
+    ComponentName.transformer_max_continuous_P: ("ts_TLmax", True),
+    ComponentName.PGmin: ("ts_PGLB", True),
+    ComponentName.PGmax: ("ts_PGUB", True),
+    ComponentName.c_bid: ("ts_bid", False),
+}
+
+
+class _Value(float):
+    '''Float with a .value attribute, so MUON bounds written against an instance can be evaluated on plain data.'''
+    @property
+    def value(self):
+        return float(self)
+
+
+class _Columns:
+    '''Column layout of the model: a contiguous block of columns per variable.'''
+    def __init__(self):
+        self.n = 0
+        self.keys = {}
+        self.start = {}
+        self.position = {}
+        self.lower, self.upper, self.integer = [], [], []
+
+    def add(self, name, keys, lower = -INF, upper = INF, integer = False):
+        keys = list(keys)
+        self.keys[name] = keys
+        self.start[name] = self.n
+        self.position[name] = {k: self.n + i for i, k in enumerate(keys)}
+        self.lower += [lower]*len(keys)
+        self.upper += [upper]*len(keys)
+        self.integer += [integer]*len(keys)
+        self.n += len(keys)
+
+    def __getitem__(self, name):
+        return np.arange(self.start[name], self.start[name] + len(self.keys[name]))
+
+    def at(self, name, keys):
+        position = self.position[name]
+        return np.fromiter((position[k] for k in keys), dtype=np.int64, count=len(keys))
+
+
+class _Rows:
+    '''Row blocks of the model, each active in a subset of the stages.'''
+    def __init__(self, n_cols):
+        self.n_cols = n_cols
+        self.n = 0
+        self.blocks = {}
+        self.matrices = []
+        self.lower, self.upper = [], []
+        self.stage_mask = {stage: [] for stage in STAGES}
+
+    def add(self, name, parts, lower, upper, stages):
+        '''
+        Adds a block of rows. Parts are (matrix, columns) pairs, where each matrix has a row per constraint and a
+        column per entry of the global column positions in columns.
+        '''
+        n = parts[0][0].shape[0] if parts else 0
+        rows, cols, vals = [], [], []
+        for matrix, columns in parts:
+            coo = sp.coo_matrix(matrix)
+            rows.append(coo.row)
+            cols.append(np.asarray(columns)[coo.col])
+            vals.append(coo.data)
+        if parts:
+            rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+        self.matrices.append(sp.coo_matrix((vals, (rows, cols)), shape=(n, self.n_cols)))
+        self.blocks[name] = np.arange(self.n, self.n + n)
+        self.lower = np.append(self.lower, np.broadcast_to(lower, n))
+        self.upper = np.append(self.upper, np.broadcast_to(upper, n))
+        for stage in STAGES:
+            self.stage_mask[stage] += [stage in stages]*n
+        self.n += n
+        return self.blocks[name]
+
+
+def _column(values):
+    '''Sparse single column matrix of values.'''
+    values = np.asarray(values, dtype=float)
+    return sp.csr_matrix(values.reshape(-1, 1))
+
+
+def _diag(values):
+    return sp.diags(np.asarray(values, dtype=float), format="csr")
+
+
+def _ones_row(n):
+    return sp.csr_matrix(np.ones((1, n)))
+
+
+def _highs(A, columns, n_rows, options, copies = 1):
+    '''
+    highspy model of copies independent copies (a block-diagonal matrix) of a model with constraint matrix A and the
+    column bounds and integrality of columns. Row bounds are left free and costs zero.
+    '''
+    A = sp.block_diag([A]*copies, format="csc") if copies > 1 else A.tocsc()
+    A.sum_duplicates()
+    A.sort_indices()
+    n_cols = columns.n*copies
+
+    lp = highspy.HighsLp()
+    lp.num_col_ = n_cols
+    lp.num_row_ = n_rows*copies
+    lp.col_cost_ = np.zeros(n_cols)
+    lp.col_lower_ = np.tile(columns.lower, copies)
+    lp.col_upper_ = np.tile(columns.upper, copies)
+    lp.row_lower_ = np.full(n_rows*copies, -INF)
+    lp.row_upper_ = np.full(n_rows*copies, INF)
+    lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    lp.a_matrix_.start_ = A.indptr
+    lp.a_matrix_.index_ = A.indices
+    lp.a_matrix_.value_ = A.data
+    lp.integrality_ = [highspy.HighsVarType.kInteger if i else highspy.HighsVarType.kContinuous for i in columns.integer]*copies
+
+    highs = highspy.Highs()
+    highs.setOptionValue("output_flag", False)
+    for option, value in options.items():
+        highs.setOptionValue(option, value)
+    highs.passModel(lp)
+    return highs
+
+
+def _solver_results(objective, lower_bound, wallclock_time):
+    result = SolverResults()
+    result.solver.name = "highspy"
+    result.solver.status = SolverStatus.ok
+    result.solver.termination_condition = TerminationCondition.optimal
+    result.solver.wallclock_time = wallclock_time
+    result.problem.upper_bound = objective
+    result.problem.lower_bound = lower_bound
+    return result
+
+
+class _Copy:
+    '''One copy of a model within a block-diagonal highspy model, addressed by the rows and columns of the model.'''
+    def __init__(self, highs, row_offset, col_offset):
+        self.highs = highs
+        self.row_offset = row_offset
+        self.col_offset = col_offset
+
+    def changeColsBounds(self, n, columns, lower, upper):
+        self.highs.changeColsBounds(n, np.asarray(columns) + self.col_offset, lower, upper)
+
+    def changeCoeff(self, row, column, value):
+        self.highs.changeCoeff(row + self.row_offset, column + self.col_offset, value)
+
+
+class DirectModel:
+    '''
+    The market, secure and DCOPF stage model of a case, held as a single highspy model. The constraints of each
+    stage are switched on and off through their row bounds, so the matrix is only assembled once per case.
+
+    options are passed to Highs.setOptionValue, e.g. {"threads": 1, "mip_rel_gap": 1e-4}. If a WarmStartManager is
+    given as warmstart, each stage is seeded through Highs.setSolution and the HiGHS log is read to record whether
+    the start was accepted.
+    '''
+    def __init__(self, case, options = None,
+                 MUON_MW_constraint_list = None, MUON_NB_constraints_list = None, MUON_NB_bigM_constraints_list = None,
+                 warmstart = None):
+        self.case = case
+        self.warmstart = warmstart
+        MUON_MW_constraint_list = pscc.MUON_MW_constraint_list if MUON_MW_constraint_list is None else MUON_MW_constraint_list
+        MUON_NB_constraints_list = pscc.MUON_NB_constraints_list if MUON_NB_constraints_list is None else MUON_NB_constraints_list
+        MUON_NB_bigM_constraints_list = pscc.MUON_NB_bigM_constraints_list if MUON_NB_bigM_constraints_list is None else MUON_NB_bigM_constraints_list
+
+        self._load_data(MUON_MW_constraint_list + MUON_NB_constraints_list, MUON_NB_bigM_constraints_list)
+        self._build_columns()
+        self._build_rows()
+        self._pass_model(options or {})
+        self.values = np.full(self.columns.n, np.nan)
+
+    #~~~~~~~~~~~# CASE DATA #~~~~~~~~~~~#
+    def _load_data(self, MUON_list, MUON_bigM_list):
+        case = self.case
+        self.sets = {name: (dict((k, tuple(dict.fromkeys(v))) for k, v in data.items()) if isinstance(data, dict)
+                            else tuple(dict.fromkeys(data)))
+                     for name, data in set_data(case, pscc.static_sets).items()}
+        self.sets.update({name: tuple(members) for name, members in pscc.zone_sets(case).items()})
+
+        params = param_data(case, pscc.static_params)
+        self.baseMVA = params.pop(ComponentName.baseMVA.value)
+        self.SNSP_curtailment = params.pop(ComponentName.SNSP_curtailment.value)
+        #The big-M of gen_prorata_xi_min is its default of 1 (it is only tightened on pyomo instances)
+        params.pop(ComponentName.M_prorata_xi.value)
+        index = {ComponentName.line_max_continuous_P: "L", ComponentName.line_susceptance: "L", ComponentName.line_reactance: "L",
+                 ComponentName.transformer_max_continuous_P: "TRANSF", ComponentName.transformer_susceptance: "TRANSF",
+                 ComponentName.transformer_reactance: "TRANSF", ComponentName.PD: "D", ComponentName.VOLL: "D"}
+        self.params = {name: np.array([values[k] for k in self.sets[index.get(name, "G")]], dtype=float)
+                       for name, values in params.items()}
+
+        #Time dependent parameters as (iterations x index) arrays aligned to the model sets, NaN where not given
+        self.ts = {}
+        for name, (key, per_unit) in TS_PARAMS.items():
+            df = getattr(case, key)
+            array = df.reindex(columns=list(self.sets[index.get(name, "G")])).to_numpy(dtype=float)
+            self.ts[name.value] = ({it: i for i, it in enumerate(df.index)}, np.round(array/case.baseMVA, 6) if per_unit else array)
+        #Time dependent sets of branches with a non-zero rating, as (iterations x columns) masks in the order of the ts
+        #data (for the set members) and of the model set (for the KVL rows)
+        self.ts_nonzero = {}
+        for name, key, branches in [("L_nonzero", "ts_Lmax", "L"), ("TRANSF_nonzero", "ts_TLmax", "TRANSF")]:
+            df = getattr(case, key)
+            self.ts_nonzero[name] = ({it: i for i, it in enumerate(df.index)}, df.columns, df.to_numpy(dtype=float) > 0,
+                                     df.reindex(columns=list(self.sets[branches])).to_numpy(dtype=float) > 0)
+
+        #MUON constraints, as applied by all_island_iterations_PSCC.MUON_constraints()
+        groups = helpers.comma_param_as_index_to_dict(case, 'generators', 'name', 'MUON_group')
+        missing = [c for c in MUON_list + MUON_bigM_list if c not in groups.keys()]
+        if missing:
+            raise KeyError(f"No generator sets are defined for the followin MUON constraints in the case xls: {missing} ")
+        MW_dict, NB_dict, bigM_dict = pscc.MUON_constraint_dicts(self.baseMVA)
+        self.MUON = []
+        for constraint in MUON_list:
+            definition = (MW_dict | NB_dict)[constraint]
+            self.sets['G_'+constraint] = tuple(dict.fromkeys(groups[constraint]))
+            bound_names = {"MW": ("PG_LB", "PG_UB"), "NB": ("Ug_LB", "Ug_UB")}[definition["type"]]
+            for bound_name, suffix in zip(bound_names, ('_LB', '_UB')):
+                if definition.get(bound_name) is not None:
+                    self.MUON.append(SimpleNamespace(name=constraint+suffix,
+                                                     group='G_'+constraint,
+                                                     variable="u_g" if definition["type"] == "NB" else "pG",
+                                                     sense=suffix,
+                                                     bound=definition[bound_name]))
+
+        #MUON NB Big-M constraints, as applied by all_island_iterations_PSCC.MUON_NB_BigM_constraints(). Those with a
+        #condition are only switched on when it is met (bMparam_y_D), which is evaluated each iteration.
+        generator_position = {g: i for i, g in enumerate(self.sets["G"])}
+        self.MUON_bigM = []
+        for constraint in MUON_bigM_list:
+            definition = bigM_dict[constraint]
+            name, generators = pscc.MUON_NB_bigM_switch_sets[constraint]
+            self.sets['G_'+constraint] = tuple(dict.fromkeys(groups[constraint]))
+            self.MUON_bigM.append(SimpleNamespace(constraint=constraint,
+                                                  name=name,
+                                                  group='G_'+constraint,
+                                                  generators=generators,
+                                                  index=np.array([generator_position[g] for g in self.sets[generators]], dtype=np.int64),
+                                                  pGlim=definition["pGlim"],
+                                                  Ug_LB=definition["Ug_LB"],
+                                                  condition=definition.get("Condition")))
+
+        self.network = NetworkMatrices.from_case(case)
+        #Reference busses of the islands of the branches in service in each iteration (volts_reference_bus), found
+        #once per distinct pattern of branches in service
+        slack = self.network.busses.index(self.sets["b0"][0])
+        masks = [np.array([aligned[position[it]] for it in case.iterations], dtype=bool).reshape(len(case.iterations), -1)
+                 for position, _, _, aligned in self.ts_nonzero.values()]
+        pattern, references = self.network.topology(slack, *masks)
+        self.island_references = {it: tuple(self.network.busses[r] for r in np.unique(references[p]))
+                                  for it, p in zip(case.iterations, pattern)}
+        generator_position = {g: i for i, g in enumerate(self.sets["G"])}
+        self.prorata_index = np.array([generator_position[g] for g in self.sets["G_prorata"]], dtype=np.int64)
+        self.PG_MARKET = np.zeros(len(self.sets["G"]))
+        self.UG_MARKET = np.zeros(len(self.sets["G"]))
+        self.PG_SECURE = np.zeros(len(self.sets["G"]))
+        self.UG_SECURE = np.zeros(len(self.sets["G"]))
+        self.iteration_sets = {name: () for name in self.ts_nonzero}
+
+    #~~~~~~~~~~~# MODEL ASSEMBLY #~~~~~~~~~~~#
+    def _build_columns(self):
+        s = self.sets
+        columns = _Columns()
+        columns.add("pG", s["G"])
+        columns.add("pG_bid", s["G"], lower = 0)
+        columns.add("pG_offer", s["G"], lower = 0)
+        columns.add("u_g", s["G"], lower = 0, upper = 1, integer = True)
+        columns.add("pD", s["D"])
+        columns.add("alpha", s["D"], lower = 0, upper = 1) #demand_alpha_max
+        columns.add("prorata_curtailment_zeta", [None], lower = 0, upper = 1)
+        columns.add("xi_cg", s["prorata_groups"], lower = 0, upper = 1)
+        columns.add("xi_prorata", s["G_prorata"], lower = 0, upper = 1)
+        columns.add("beta_prorata", s["G_prorata_pairs"], lower = 0, upper = 1, integer = True)
+        columns.add("deltaL", s["L"])
+        columns.add("deltaLT", s["TRANSF"])
+        columns.add("delta", s["B"])
+        columns.add("pL", s["L"])
+        columns.add("pLT", s["TRANSF"])
+        columns.add("bMvar_y_G", [k.constraint for k in self.MUON_bigM], lower = 0, upper = 1, integer = True)
+        columns.add("bMvar_y", [k.constraint for k in self.MUON_bigM if k.condition is not None], lower = 0, upper = 1, integer = True)
+
+        columns.lower = np.array(columns.lower, dtype=float)
+        columns.upper = np.array(columns.upper, dtype=float)
+        #demand_alpha_fixneg
+        columns.lower[columns.at("alpha", s["DNeg"])] = 1
+        #volts_reference_bus
+        columns.lower[columns.at("delta", s["b0"])] = 0
+        columns.upper[columns.at("delta", s["b0"])] = 0
+        self.columns = columns
+
+    def _build_rows(self):
+        s, c, net = self.sets, self.columns, self.network
+        nG, nD, nP = len(s["G"]), len(s["D"]), len(s["G_prorata"])
+        rows = _Rows(c.n)
+        self.rows = rows
+        #Entries whose coefficient is a time dependent or stage dependent parameter: name -> (rows, columns)
+        self.coefficients = {}
+
+        #--- Copper plate market and secure constraints ---
+        rows.add(ComponentName.KCL_copperplate, [(_ones_row(nG), c["pG"]), (-_ones_row(nD), c["pD"])], 0, 0, {MARKET, SECURE})
+
+        r = rows.add(ComponentName.demand_real_alpha_controlled, [(_diag(np.ones(nD)), c["pD"]), (-_diag(np.ones(nD)), c["alpha"])], 0, 0, STAGES)
+        self.coefficients["PD"] = (r, c["alpha"])
+
+        r = rows.add(ComponentName.gen_uc_max, [(_diag(np.ones(nG)), c["pG"]), (-_diag(np.ones(nG)), c["u_g"])], -INF, 0, STAGES)
+        self.coefficients["PGmax"] = (r, c["u_g"])
+        r = rows.add(ComponentName.gen_uc_min, [(_diag(np.ones(nG)), c["pG"]), (-_diag(np.ones(nG)), c["u_g"])], 0, INF, STAGES)
+        self.coefficients["PGmin"] = (r, c["u_g"])
+
+        rows.add(ComponentName.gen_market_redispatch,
+                 [(_diag(np.ones(nG)), c["pG"]), (-_diag(np.ones(nG)), c["pG_offer"]), (_diag(np.ones(nG)), c["pG_bid"])],
+                 0, 0, {SECURE})
+
+        prorata = c.at("pG", s["G_prorata"])
+        r = rows.add(ComponentName.gen_prorata_curtailment_realpower,
+                     [(_diag(np.ones(nP)), prorata), (-_column(np.ones(nP)), c["prorata_curtailment_zeta"])], 0, 0, {SECURE})
+        self.coefficients["PG_MARKET"] = (r, np.repeat(c["prorata_curtailment_zeta"], nP))
+
+        #Every index of gen_SNSP holds the same constraint, so it is added once
+        if nP > 0:
+            rows.add(ComponentName.gen_SNSP,
+                     [(_ones_row(len(s["G_ns"])), c.at("pG", s["G_ns"])),
+                      (-(0.75/(1-0.75))*_ones_row(len(s["G_s"])), c.at("pG", s["G_s"]))],
+                     -INF, 0, {SECURE, DCOPF})
+
+        #MUON constraints. As in the Pyomo model, constraint blocks apply whether or not their condition is met.
+        self.MUON_rows = []
+        for muon in self.MUON:
+            r = rows.add("MUON."+muon.name, [(_ones_row(len(s[muon.group])), c.at(muon.variable, s[muon.group]))], -INF, INF, {SECURE, DCOPF})
+            self.MUON_rows.append((muon, r[0]))
+
+        #MUON NB Big-M constraints. The big-M coefficients of y_G, and the bounds that depend on them or on the demand
+        #switch y_D, are set each iteration.
+        self.MUON_bigM_rows = []
+        for k in self.MUON_bigM:
+            W = c.at("pG", s[k.generators])
+            y_G = c.at("bMvar_y_G", [k.constraint])
+            bigM_rows = {
+                #pGlim - sum(pG of W) <= M_L * y_G
+                "L": rows.add(f"MUON_NB_BigM.bMconst_M_{k.name}_L", [(-_ones_row(len(W)), W), (-_ones_row(1), y_G)],
+                              -INF, -k.pGlim, {SECURE, DCOPF}),
+                #sum(pG of W) - pGlim <= M_U * (1 - y_G)
+                "U": rows.add(f"MUON_NB_BigM.bMconst_M_{k.name}_U", [(_ones_row(len(W)), W), (_ones_row(1), y_G)],
+                              -INF, INF, {SECURE, DCOPF}),
+            }
+            switch = y_G
+            if k.condition is not None:
+                switch = c.at("bMvar_y", [k.constraint])
+                #y <= y_G, y <= y_D and y >= y_D + y_G - 1
+                rows.add(f"MUON_NB_BigM.bMconst_y_G_{k.name}_limit", [(_ones_row(1), switch), (-_ones_row(1), y_G)],
+                         -INF, 0, {SECURE, DCOPF})
+                bigM_rows["D"] = rows.add(f"MUON_NB_BigM.bMconst_y_D_{k.name}_limit", [(_ones_row(1), switch)],
+                                          -INF, 0, {SECURE, DCOPF})
+                bigM_rows["y"] = rows.add(f"MUON_NB_BigM.bMconst_y_{k.name}_limit", [(_ones_row(1), switch), (-_ones_row(1), y_G)],
+                                          -1, INF, {SECURE, DCOPF})
+            rows.add(f"MUON_NB_BigM.{k.constraint}",
+                     [(_ones_row(len(s[k.group])), c.at("u_g", s[k.group])), (-k.Ug_LB*_ones_row(1), switch)],
+                     0, INF, {SECURE, DCOPF})
+            self.MUON_bigM_rows.append((k, bigM_rows))
+        y_G = c.at("bMvar_y_G", [k.constraint for k in self.MUON_bigM])
+        self.coefficients["M_bigM_L"] = (np.array([r["L"][0] for _, r in self.MUON_bigM_rows], dtype=np.int64), y_G)
+        self.coefficients["M_bigM_U"] = (np.array([r["U"][0] for _, r in self.MUON_bigM_rows], dtype=np.int64), y_G)
+
+        #--- DCOPF constraints ---
+        rows.add(ComponentName.KCL_networked_realpower_noshunt,
+                 [(net.generator_incidence(), c.at("pG", net.generators)), (-net.line_incidence(), c["pL"]),
+                  (-net.transformer_incidence(), c["pLT"]), (-net.demand_incidence(), c.at("pD", net.demands))],
+                 0, 0, {DCOPF})
+
+        #KVL rows exist for every line and transformer, and are only applied to those in L_nonzero/TRANSF_nonzero
+        self.KVL_rows = {
+            "L_nonzero": rows.add(ComponentName.KVL_DCOPF_lines,
+                                  [(_diag(np.ones(len(s["L"]))), c["pL"]), (_diag(-1/net.line_reactance), c["deltaL"])], 0, 0, {DCOPF}),
+            "TRANSF_nonzero": rows.add(ComponentName.KVL_DCOPF_transformer,
+                                       [(_diag(np.ones(len(s["TRANSF"]))), c["pLT"]), (_diag(-1/net.transformer_reactance), c["deltaLT"])], 0, 0, {DCOPF}),
+        }
+        rows.add(ComponentName.volts_line_delta,
+                 [(_diag(np.ones(len(s["L"]))), c["deltaL"]), (-net.line_incidence().T, c["delta"])], 0, 0, {DCOPF})
+        rows.add(ComponentName.volts_transformer_delta,
+                 [(_diag(np.ones(len(s["TRANSF"]))), c["deltaLT"]), (-net.transformer_incidence().T, c["delta"])], 0, 0, {DCOPF})
+
+        rows.add(ComponentName.gen_secure_redispatch,
+                 [(_diag(np.ones(nG)), c["pG"]), (-_diag(np.ones(nG)), c["pG_offer"]), (_diag(np.ones(nG)), c["pG_bid"])],
+                 0, 0, {DCOPF})
+
+        r_max = rows.add(ComponentName.gen_prorata_realpower_max_xi,
+                         [(_diag(np.ones(nP)), prorata), (-_diag(np.ones(nP)), c["xi_prorata"])], -INF, 0, {DCOPF})
+        r_min = rows.add(ComponentName.gen_prorata_realpower_min_xi,
+                         [(_diag(np.ones(nP)), prorata), (-_diag(np.ones(nP)), c["xi_prorata"])], 0, INF, {DCOPF})
+        self.coefficients["PG_SECURE"] = (np.concatenate([r_max, r_min]), np.concatenate([c["xi_prorata"], c["xi_prorata"]]))
+
+        pairs = s["G_prorata_pairs"]
+        nPairs = len(pairs)
+        pair_generators = c.at("xi_prorata", [g for g, _ in pairs])
+        pair_groups = c.at("xi_cg", [cg for _, cg in pairs])
+        rows.add(ComponentName.gen_prorata_xi_max,
+                 [(_diag(np.ones(nPairs)), pair_generators), (-_diag(np.ones(nPairs)), pair_groups)], -INF, 0, {DCOPF})
+        rows.add(ComponentName.gen_prorata_xi_min,
+                 [(_diag(np.ones(nPairs)), pair_generators), (-_diag(np.ones(nPairs)), pair_groups),
+                  (-_diag(np.ones(nPairs)), c["beta_prorata"])], -1, INF, {DCOPF})
+        generator_row = {g: i for i, g in enumerate(s["G_prorata"])}
+        beta = sp.csr_matrix((np.ones(nPairs), ([generator_row[g] for g, _ in pairs], np.arange(nPairs))), shape=(nP, nPairs))
+        rows.add(ComponentName.gen_prorata_beta, [(beta, c["beta_prorata"])], 1, 1, {DCOPF})
+
+        self.row_stage_mask = {stage: np.array(mask, dtype=bool) for stage, mask in rows.stage_mask.items()}
+
+    def _pass_model(self, options):
+        self.A = sp.vstack(self.rows.matrices)
+        if self.warmstart is not None:
+            #Log to a callback rather than the console, so the acceptance of warm starts can be read
+            options = {"output_flag": True, "log_to_console": False} | options
+        self.highs = _highs(self.A, self.columns, self.rows.n, options)
+        self._log_lines = None
+        if self.warmstart is not None:
+            self.highs.cbLogging.subscribe(self._log)
+
+    def _log(self, event):
+        if self._log_lines is not None:
+            self._log_lines.append(event.message)
+
+    def set_column_bounds(self, variable, lower = None, upper = None, keys = None):
+        '''Sets the bounds of a variable (for all of its indices, or those in keys) for all subsequent solves.'''
+        columns = self.columns[variable] if keys is None else self.columns.at(variable, keys)
+        if lower is not None:
+            self.columns.lower[columns] = lower
+        if upper is not None:
+            self.columns.upper[columns] = upper
+        self.highs.changeColsBounds(len(columns), columns, self.columns.lower[columns], self.columns.upper[columns])
+
+    def _change_coefficients(self, name, values):
+        rows, columns = self.coefficients[name]
+        for row, column, value in zip(rows.tolist(), columns.tolist(), np.asarray(values).tolist()):
+            self.highs.changeCoeff(row, column, value)
+
+    #~~~~~~~~~~~# ITERATION UPDATES #~~~~~~~~~~~#
+    def update_params(self, iteration):
+        '''
+        Updates the time dependent parameters to those of iteration. As with store_values in the Pyomo model,
+        parameters missing from an iteration's ts data keep their previous value.
+        '''
+        for name, (position, array) in self.ts.items():
+            row = array[position[iteration]]
+            self.params[name] = np.where(np.isnan(row), self.params[name], row)
+
+    def update_iteration(self, iteration):
+        '''Updates the time dependent parameters and sets, and the model, to those of iteration.'''
+        self.update_params(iteration)
+        for name, (position, columns, array, _) in self.ts_nonzero.items():
+            self.iteration_sets[name] = tuple(columns[array[position[iteration]]])
+
+        p, c = self.params, self.columns
+        #Line and transformer ratings (line_cont_realpower_max_*, transf_continuous_real_max_*)
+        for variable, rating in [("pL", p["line_max_continuous_P"]), ("pLT", p["transformer_max_continuous_P"])]:
+            c.lower[c[variable]], c.upper[c[variable]] = -rating, rating
+            self.highs.changeColsBounds(len(rating), c[variable], -rating, rating)
+
+        #Angle fixed at the reference bus of each island (volts_reference_bus)
+        delta = c["delta"]
+        c.lower[delta], c.upper[delta] = -INF, INF
+        c.lower[c.at("delta", self.island_references[iteration])] = 0
+        c.upper[c.at("delta", self.island_references[iteration])] = 0
+        self.highs.changeColsBounds(len(delta), delta, c.lower[delta], c.upper[delta])
+
+        #KVL applied to branches with a non-zero rating in this iteration only
+        for name, rows in self.KVL_rows.items():
+            position, _, _, aligned = self.ts_nonzero[name]
+            active = aligned[position[iteration]]
+            self.rows.lower[rows] = np.where(active, 0, -INF)
+            self.rows.upper[rows] = np.where(active, 0, INF)
+
+        self._change_coefficients("PD", -p["PD"])
+        self._change_coefficients("PGmax", -p["PGmax"])
+        self._change_coefficients("PGmin", -p["PGmin"])
+
+        #MUON bounds, evaluated against the iteration's parameters where they are callable
+        view = None
+        for muon, row in self.MUON_rows:
+            bound = muon.bound
+            if callable(bound):
+                view = view or self._instance_view()
+                bound = bound(view)
+            self.rows.lower[row], self.rows.upper[row] = (bound, INF) if muon.sense == '_LB' else (-INF, bound)
+
+        #MUON NB Big-M values from this iteration's PGmin and PGmax, and demand switches (MUON_NB_BigM_param_update)
+        M_L = np.array([k.pGlim - p["PGmin"][k.index].sum() for k in self.MUON_bigM])
+        M_U = np.array([p["PGmax"][k.index].sum() - k.pGlim for k in self.MUON_bigM])
+        self._change_coefficients("M_bigM_L", -M_L)
+        self._change_coefficients("M_bigM_U", M_U)
+        for (k, rows), M in zip(self.MUON_bigM_rows, M_U.tolist()):
+            self.rows.upper[rows["U"]] = k.pGlim + M
+            if k.condition is not None:
+                view = view or self._instance_view()
+                y_D = float(k.condition(view))
+                self.rows.upper[rows["D"]] = y_D
+                self.rows.lower[rows["y"]] = y_D - 1
+
+    def _instance_view(self):
+        view = SimpleNamespace(**self.sets)
+        for name, values in self.params.items():
+            setattr(view, name, dict(zip(self._param_index(name), map(_Value, values.tolist()))))
+        return view
+
+    def _param_index(self, name):
+        if name in ("line_max_continuous_P", "line_susceptance", "line_reactance"):
+            return self.sets["L"]
+        if name in ("transformer_max_continuous_P", "transformer_susceptance", "transformer_reactance"):
+            return self.sets["TRANSF"]
+        if name in ("PD", "VOLL"):
+            return self.sets["D"]
+        return self.sets["G"]
+
+    #~~~~~~~~~~~# STAGE SOLVES #~~~~~~~~~~~#
+    def _objective(self, stage):
+        '''Cost vector and offset of the stage objective, drawn from the same random sequence as obj_functions.py'''
+        p, c = self.params, self.columns
+        nG = len(self.sets["G"])
+        cost = np.zeros(c.n)
+        rnd = np.random.default_rng(100)
+        if stage == MARKET:
+            #copper_plate_marginal_cost_objective
+            cost[c["pG"]] = p["c_1"] + rnd.random(nG)
+            cost[c["u_g"]] = p["c_0"]/self.baseMVA
+        else:
+            #redispatch_from_market_cost_objective / redispatch_from_secure_cost_objective
+            draws = rnd.random(2*nG).reshape(nG, 2)
+            UG = self.UG_MARKET if stage == SECURE else self.UG_SECURE
+            cost[c["pG_bid"]] = p["c_bid"] + draws[:, 0]
+            cost[c["pG_offer"]] = p["c_offer"] + draws[:, 1]
+            cost[c["u_g"]] = p["c_0"]*(1-UG)
+        cost[c["alpha"]] = -p["VOLL"]*p["PD"]
+        return cost, float(np.sum(p["VOLL"]*p["PD"]))
+
+    def solve_stage(self, stage, iteration = None):
+        '''Solves a single stage with the current parameters, returning a pyomo SolverResults for it.'''
+        h, c = self.highs, self.columns
+        mask = self.row_stage_mask[stage]
+        h.changeRowsBounds(self.rows.n, np.arange(self.rows.n),
+                           np.where(mask, self.rows.lower, -INF), np.where(mask, self.rows.upper, INF))
+        cost, offset = self._objective(stage)
+        h.changeColsCost(c.n, np.arange(c.n), cost)
+        h.changeObjectiveOffset(offset)
+
+        start = time.perf_counter()
+        if self.warmstart is None:
+            h.run()
+        else:
+            seeded = self.warmstart.seed_direct(self, stage)
+            with self.warmstart.record(iteration, stage, seeded) as self._log_lines:
+                h.run()
+            self._log_lines = None
+        status = h.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            logger.error(f"HiGHS returned {h.modelStatusToString(status)} for the {stage} stage")
+            raise RuntimeError("Solver Error")
+
+        self._load_stage(stage, np.asarray(h.getSolution().col_value))
+        info = h.getInfo()
+        self.objective_value = info.objective_function_value
+        return _solver_results(info.objective_function_value,
+                               info.mip_dual_bound if any(c.integer) else info.objective_function_value,
+                               time.perf_counter() - start)
+
+    def _load_stage(self, stage, values):
+        c = self.columns
+        for variable in STAGE_VARIABLES[stage]:
+            self.values[c[variable]] = values[c[variable]]
+
+    def _market_solution(self):
+        '''Fixes the market dispatch and commitment, and applies them to the secure stage.'''
+        c = self.columns
+        self.PG_MARKET = np.array([round(v, 6) for v in self.values[c["pG"]].tolist()])
+        self.UG_MARKET = np.array([round(v, 0) for v in self.values[c["u_g"]].tolist()])
+        self.rows.lower[self.rows.blocks[ComponentName.gen_market_redispatch]] = self.PG_MARKET
+        self.rows.upper[self.rows.blocks[ComponentName.gen_market_redispatch]] = self.PG_MARKET
+        self._change_coefficients("PG_MARKET", -self.PG_MARKET[self.prorata_index])
+
+    def _secure_solution(self):
+        '''Fixes the secure dispatch and commitment, and applies them to the DCOPF stage.'''
+        c = self.columns
+        self.PG_SECURE = np.array([round(v, 6) for v in self.values[c["pG"]].tolist()])
+        self.UG_SECURE = np.array([round(v, 0) for v in self.values[c["u_g"]].tolist()])
+        self.rows.lower[self.rows.blocks[ComponentName.gen_secure_redispatch]] = self.PG_SECURE
+        self.rows.upper[self.rows.blocks[ComponentName.gen_secure_redispatch]] = self.PG_SECURE
+        self._change_coefficients("PG_SECURE", -np.tile(self.PG_SECURE[self.prorata_index], 2))
+
+    def _dcopf_output(self, result, volumes = True):
+        output = self.cache(result)
+        if volumes:
+            pscc.curtailment_volumes(output)
+        return output
+
+    def _variable(self, name):
+        values = self.values[self.columns[name]]
+        return [None if np.isnan(v) else v for v in values.tolist()]
+
+    def solve_iteration(self, iteration, volumes = True):
+        '''
+        Solves the copper plate market, copper plate secure and DCOPF stages for a single iteration, returning the
+        (output, result) dictionaries for that iteration in the format of all_island_iterations_PSCC.solve_iteration()
+        (with the curtailment volumes of its DCOPF output unless volumes is False).
+        '''
+        output, result = {}, {}
+        self.update_iteration(iteration)
+
+        result[MARKET] = self.solve_stage(MARKET, iteration)
+        self._market_solution()
+
+        result[SECURE] = self.solve_stage(SECURE, iteration)
+        self._secure_solution()
+
+        result[DCOPF] = self.solve_stage(DCOPF, iteration)
+        output[DCOPF] = self._dcopf_output(result[DCOPF], volumes)
+        return output, result
+
+    def cache(self, result):
+        '''InstanceCache of the current sets, variable values, parameters and objective value.'''
+        cache = pyomo_io.InstanceCache(result, {"Var": [], "Param": [], "Set": []})
+        for name, members in (self.sets | self.iteration_sets).items():
+            setattr(cache, name, members)
+        for name, keys in self.columns.keys.items():
+            values = self._variable(name)
+            setattr(cache, name, values[0] if keys == [None] else dict(zip(keys, values)))
+        setattr(cache, ComponentName.prorata_minimum_zeta.value, {k: None for k in self.sets["G_prorata_pairs"]})
+        for name, values in self.params.items():
+            setattr(cache, name, dict(zip(self._param_index(name), values.tolist())))
+        setattr(cache, ComponentName.baseMVA.value, self.baseMVA)
+        setattr(cache, ComponentName.SNSP_curtailment.value, self.SNSP_curtailment)
+        for name in ("PG_MARKET", "UG_MARKET", "PG_SECURE", "UG_SECURE"):
+            setattr(cache, name, dict(zip(self.sets["G"], getattr(self, name).tolist())))
+        cache.obj = self.objective_value
+        return cache
+
+
+class BatchedDirectModel:
+    '''
+    Solves batch_size iterations at once. Each stage of a batch is a single highspy model holding a copy of the
+    DirectModel columns and rows per iteration (a block-diagonal matrix), so the per solve overhead (solver start-up,
+    presolve, result loading) is paid once per batch rather than once per iteration. Each copy is updated as a
+    DirectModel, and solutions are split back per iteration.
+
+    The MIP gap of a batch applies to the sum of its iterations' objectives, so larger batches can leave an
+    individual iteration further from its optimum, and make harder MIPs; batch_size trades this off against the
+    per solve overhead.
+
+    If a WarmStartManager is given as warmstart, each stage of a batch is seeded with a single Highs.setSolution of
+    the starts of its copies, placed end to end, and recorded once per batch (with the tuple of its iterations). The
+    market stage of each copy starts from the market solution of the same copy in the previous batch.
+    '''
+    def __init__(self, case, batch_size, options = None, warmstart = None, **kwargs):
+        self.batch_size = batch_size
+        self.warmstart = warmstart
+        self.model = DirectModel(case, options = options, warmstart = warmstart, **kwargs)
+        n_rows, n_cols = self.model.rows.n, self.model.columns.n
+        options = options or {}
+        if warmstart is not None:
+            #Log to a callback rather than the console, so the acceptance of warm starts can be read
+            options = {"output_flag": True, "log_to_console": False} | options
+        self.highs = _highs(self.model.A, self.model.columns, n_rows, options, copies = batch_size)
+        self._log_lines = None
+        if warmstart is not None:
+            self.highs.cbLogging.subscribe(self._log)
+        self.copies = [self._copy(_Copy(self.highs, k*n_rows, k*n_cols)) for k in range(batch_size)]
+
+    def _log(self, event):
+        if self._log_lines is not None:
+            self._log_lines.append(event.message)
+
+    def _copy(self, highs):
+        engine = copy.copy(self.model)
+        engine.columns = copy.copy(self.model.columns)
+        engine.columns.lower, engine.columns.upper = self.model.columns.lower.copy(), self.model.columns.upper.copy()
+        engine.rows = copy.copy(self.model.rows)
+        engine.rows.lower, engine.rows.upper = self.model.rows.lower.copy(), self.model.rows.upper.copy()
+        engine.params = dict(self.model.params)
+        engine.iteration_sets = dict(self.model.iteration_sets)
+        engine.values = self.model.values.copy()
+        engine.highs = highs
+        return engine
+
+    def set_column_bounds(self, variable, lower = None, upper = None, keys = None):
+        '''Sets the bounds of a variable (for all of its indices, or those in keys) in every copy.'''
+        self.model.set_column_bounds(variable, lower, upper, keys)
+        for engine in self.copies:
+            engine.set_column_bounds(variable, lower, upper, keys)
+
+    def update_params(self, iteration):
+        '''Updates the time dependent parameters carried into the next batch, for an iteration that is not solved.'''
+        self.model.update_params(iteration)
+
+    def _seed(self, stage, n):
+        '''Passes the starts of the first n copies to the batch model. Returns whether a start was passed.'''
+        starts = [self.warmstart.direct_start(engine, stage) for engine in self.copies[:n]]
+        if any(start is None for start in starts):
+            return False
+        #Unused copies of the last batch start at zero, moved within their column bounds
+        starts += [np.clip(0, engine.columns.lower, engine.columns.upper) for engine in self.copies[n:]]
+        start = np.concatenate(starts)
+        self.highs.setSolution(len(start), np.arange(len(start), dtype=np.int32), start)
+        return True
+
+    def solve_stage(self, stage, n, iterations = None):
+        '''
+        Solves a stage for the first n copies (holding iterations, which are only used to record warm starts),
+        returning a pyomo SolverResults for each.
+        '''
+        h = self.highs
+        lower, upper, cost, offsets = [], [], [], []
+        for k, engine in enumerate(self.copies):
+            if k < n:
+                mask = engine.row_stage_mask[stage]
+                lower.append(np.where(mask, engine.rows.lower, -INF))
+                upper.append(np.where(mask, engine.rows.upper, INF))
+                copy_cost, offset = engine._objective(stage)
+                cost.append(copy_cost)
+                offsets.append(offset)
+            else:
+                #Unused copies of the last batch are left unconstrained at zero cost
+                lower.append(np.full(engine.rows.n, -INF))
+                upper.append(np.full(engine.rows.n, INF))
+                cost.append(np.zeros(engine.columns.n))
+        lower, upper, cost = np.concatenate(lower), np.concatenate(upper), np.concatenate(cost)
+        h.changeRowsBounds(len(lower), np.arange(len(lower)), lower, upper)
+        h.changeColsCost(len(cost), np.arange(len(cost)), cost)
+        h.changeObjectiveOffset(float(sum(offsets)))
+
+        start = time.perf_counter()
+        if self.warmstart is None:
+            h.run()
+        else:
+            seeded = self._seed(stage, n)
+            with self.warmstart.record(tuple(iterations or ()), stage, seeded) as self._log_lines:
+                h.run()
+            self._log_lines = None
+        status = h.getModelStatus()
+        if status != highspy.HighsModelStatus.kOptimal:
+            logger.error(f"HiGHS returned {h.modelStatusToString(status)} for the {stage} stage of a batch")
+            raise RuntimeError("Solver Error")
+        wallclock_time = time.perf_counter() - start
+
+        values = np.asarray(h.getSolution().col_value)
+        info = h.getInfo()
+        #A bound on each iteration's optimum is its objective less the absolute gap of the batch
+        gap = info.objective_function_value - info.mip_dual_bound if any(self.model.columns.integer) else 0.0
+        results = []
+        for k, engine in enumerate(self.copies[:n]):
+            n_cols = engine.columns.n
+            copy_values = values[k*n_cols:(k + 1)*n_cols]
+            engine._load_stage(stage, copy_values)
+            engine.objective_value = float(cost[k*n_cols:(k + 1)*n_cols] @ copy_values + offsets[k])
+            results.append(_solver_results(engine.objective_value, engine.objective_value - gap, wallclock_time))
+        return results
+
+    def solve_iterations(self, iterations):
+        '''
+        Solves up to batch_size iterations, returning the (output, result) dictionaries of each (without curtailment
+        volumes, see data_io.curtailment).
+        '''
+        n = len(iterations)
+        #Parameters missing from an iteration's ts data carry over from the previous iteration, through the batch
+        previous = self.model
+        for engine, iteration in zip(self.copies, iterations):
+            engine.params = dict(previous.params)
+            engine.update_iteration(iteration)
+            previous = engine
+        self.model.params = dict(previous.params)
+
+        output, result = [{} for _ in range(n)], [{} for _ in range(n)]
+        for stage in STAGES:
+            for k, stage_result in enumerate(self.solve_stage(stage, n, iterations)):
+                result[k][stage] = stage_result
+            for engine in self.copies[:n]:
+                if stage == MARKET:
+                    engine._market_solution()
+                elif stage == SECURE:
+                    engine._secure_solution()
+        for k, engine in enumerate(self.copies[:n]):
+            output[k][DCOPF] = engine._dcopf_output(result[k][DCOPF], volumes = False)
+        return list(zip(output, result))
+
+
+def model(case: object, options = None, engine = None, checkpoint = None, warmstart = None, batch_size = 1):
+    '''
+    Runs all iterations of the case with the direct HiGHS engine. A DirectModel already built for the case can be
+    given as engine, to reuse its assembled matrices. Iterations held in a CheckpointStore given as checkpoint are
+    loaded rather than solved, and each solved iteration is saved to it. A WarmStartManager given as warmstart is
+    passed to the DirectModel (or BatchedDirectModel) built for the case.
+
+    With a batch_size above 1 (or a BatchedDirectModel given as engine), iterations are solved batch_size at a time
+    in a single block-diagonal model per stage.
+    '''
+    if batch_size > 1 or isinstance(engine, BatchedDirectModel):
+        return _batched_model(case, options, engine, checkpoint, batch_size, warmstart)
+
+    #Create Data Ouput & Result Dictionaries
+    output = {"format": "iteration"}
+    result = {"format": "iteration"}
+
+    #MODEL ITERATIONS
+    skipped = []
+    for iteration in case.iterations:
+        if checkpoint is not None and iteration in checkpoint:
+            output[iteration], result[iteration] = checkpoint.load(iteration)
+            skipped.append(iteration)
+            continue
+
+        engine = engine if engine is not None else DirectModel(case, options = options, warmstart = warmstart)
+        for skipped_iteration in skipped:
+            engine.update_params(skipped_iteration)
+        skipped = []
+        output[iteration], result[iteration] = engine.solve_iteration(iteration, volumes = False)
+        if checkpoint is not None:
+            checkpoint.save(iteration, output[iteration], result[iteration])
+
+    curtailment.attribute(output)
+    return output, result
+
+
+def _batched_model(case, options, engine, checkpoint, batch_size, warmstart = None):
+    output = {"format": "iteration"}
+    result = {"format": "iteration"}
+    skipped = []
+
+    def solve(batch):
+        nonlocal engine, skipped
+        engine = engine if engine is not None else BatchedDirectModel(case, batch_size, options = options, warmstart = warmstart)
+        for skipped_iteration in skipped:
+            engine.update_params(skipped_iteration)
+        skipped = []
+        for iteration, (iteration_output, iteration_result) in zip(batch, engine.solve_iterations(batch)):
+            output[iteration], result[iteration] = iteration_output, iteration_result
+            if checkpoint is not None:
+                checkpoint.save(iteration, iteration_output, iteration_result)
+
+    batch = []
+    for iteration in case.iterations:
+        if checkpoint is not None and iteration in checkpoint:
+            #A loaded iteration ends the batch before it, so that parameters carry over in iteration order
+            if batch:
+                solve(batch)
+                batch = []
+            output[iteration], result[iteration] = checkpoint.load(iteration)
+            skipped.append(iteration)
+            continue
+        batch.append(iteration)
+        if len(batch) == batch_size:
+            solve(batch)
+            batch = []
+    if batch:
+        solve(batch)
+
+    #Return in the order of case.iterations
+    output = {"format": "iteration"} | {iteration: output[iteration] for iteration in case.iterations}
+    curtailment.attribute(output)
+    return output, {"format": "iteration"} | {iteration: result[iteration] for iteration in case.iterations}
@@ -61,6 +61,7 @@ def model(case: object, solver):
         ComponentName.c_1,
         ComponentName.c_bid,
         ComponentName.baseMVA,
+        ComponentName.M_prorata_xi,
     ]
     build_params(instance, case, paramlist)
 
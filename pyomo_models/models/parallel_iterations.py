@@ -0,0 +1,132 @@
+'''
+Parallel execution of the all island market, secure and DCOPF model over the iterations of a case.
+
+There is no coupling between iterations, so they are split across a pool of worker processes. Each worker builds
+(or loads from a template) its own instance once, then solves each batch of iterations it is given with
+all_island_iterations_PSCC.solve_iteration(). Results are merged back into the (output, result) format of
+all_island_iterations_PSCC.model(), in the order of case.iterations.
+
+A ThreadBudget can be given to split the cores between the worker processes and the solver threads of each solve
+(with BLAS threads pinned in each worker), and benchmark() measures the throughput of several such splits.
+
+As each worker solves only some of the iterations, the ts tables of the case are forward filled before the
+iterations are dispatched (see all_island_iterations_PSCC.carried_forward()), so that a time dependent parameter
+missing from an iteration's ts data takes its value from the case's previous iteration, as in a serial run, rather
+than the worker's.
+'''
+
+import contextlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import data_io.curtailment as curtailment
+import pyomo_models.build.pyosolve as pyosolve
+import pyomo_models.build.threads as threads
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+from pyomo_models.build.template import ModelTemplate
+
+#Per-process state of a worker, set by _init_worker()
+_worker = {}
+
+
+def _init_worker(case, solver, template_path, checkpoint, budget):
+    if budget is not None:
+        budget.apply()
+    _worker["case"] = case
+    _worker["solver"] = solver
+    _worker["checkpoint"] = checkpoint
+    if template_path is not None:
+        _worker["instance"] = ModelTemplate.load(template_path).instance
+    else:
+        _worker["instance"] = all_island_iterations.build_instance(case)
+
+
+def _solve_iterations(iterations):
+    case, solver, instance, checkpoint = _worker["case"], _worker["solver"], _worker["instance"], _worker["checkpoint"]
+    solved = []
+    for iteration in iterations:
+        iteration_output, iteration_result = all_island_iterations.solve_iteration(instance, case, iteration, solver,
+                                                                                     volumes = False)
+        if checkpoint is not None:
+            checkpoint.save(iteration, iteration_output, iteration_result)
+        solved.append((iteration, iteration_output, iteration_result))
+    return solved
+
+
+def model(case: object, solver, processes = None, chunksize = 1, template = None, mp_context = None, checkpoint = None,
+          budget = None):
+    '''
+    Runs all iterations of the case across processes workers (default: one per CPU, capped at the number of
+    iterations), in batches of chunksize iterations. A ModelTemplate can be given so that workers load the prebuilt
+    instance rather than each building their own. With a single process, all_island_iterations_PSCC.model() is used.
+
+    If a CheckpointStore is given as checkpoint, workers save each iteration to it as it completes, and iterations
+    already held in the store are loaded rather than solved.
+
+    If a ThreadBudget is given as budget, its processes are used in place of processes, and each solve is limited
+    to its solver threads.
+    '''
+    #Create Data Ouput & Result Dictionaries
+    output = {"format": "iteration"}
+    result = {"format": "iteration"}
+
+    remaining = []
+    for iteration in case.iterations:
+        if checkpoint is not None and iteration in checkpoint:
+            output[iteration], result[iteration] = checkpoint.load(iteration)
+        else:
+            remaining.append(iteration)
+
+    if budget is not None:
+        processes = budget.processes
+    processes = max(1, min(processes or os.cpu_count() or 1, len(remaining)))
+    if processes == 1:
+        if budget is None:
+            return all_island_iterations.model(case, solver, template = template, checkpoint = checkpoint)
+        previous_threads = pyosolve.solver_threads
+        budget.apply()
+        try:
+            return all_island_iterations.model(case, solver, template = template, checkpoint = checkpoint)
+        finally:
+            pyosolve.set_solver_threads(previous_threads)
+
+    batches = [remaining[i:i + chunksize] for i in range(0, len(remaining), chunksize)]
+    case = all_island_iterations.carried_forward(case)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        template_path = None
+        if template is not None:
+            template_path = Path(tmpdir) / "model.template"
+            template.save(template_path)
+
+        with (threads.blas_environment(budget.blas_threads) if budget is not None else contextlib.nullcontext(),
+              ProcessPoolExecutor(max_workers = processes,
+                                  mp_context = mp_context,
+                                  initializer = _init_worker,
+                                  initargs = (case, solver, template_path, checkpoint, budget)) as pool):
+            solved = {}
+            for batch in pool.map(_solve_iterations, batches):
+                for iteration, iteration_output, iteration_result in batch:
+                    solved[iteration] = (iteration_output, iteration_result)
+
+    #Merge in the order of case.iterations
+    for iteration in case.iterations:
+        if iteration in solved:
+            output[iteration], result[iteration] = solved[iteration]
+        else:
+            output[iteration], result[iteration] = output.pop(iteration), result.pop(iteration)
+
+    curtailment.attribute(output)
+    return output, result
+
+
+def benchmark(case: object, solver, budgets = None, **kwargs):
+    '''
+    Runs the case with each ThreadBudget in budgets (default: every split of the available cores into processes x
+    solver threads), returning the measured throughput of each split, fastest first. Further keyword arguments
+    (e.g. template) are passed to model().
+    '''
+    budgets = budgets if budgets is not None else threads.ThreadBudget.candidates()
+    return threads.measure(lambda budget: model(case, solver, budget = budget, **kwargs), budgets, len(case.iterations))
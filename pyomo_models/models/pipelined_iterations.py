@@ -0,0 +1,200 @@
+'''
+Pipelined execution of the all island market, secure and DCOPF model.
+
+Each stage runs in its own worker process, holding its own StageModel (see stage_major_iterations), and the stages
+of different iterations overlap: while the DCOPF stage of iteration t is solving, the secure stage of t+1 and the
+market stage of t+2 can be solving, and the main process calculates the curtailment volumes of t-1. The solutions
+passed between the stages (PG_MARKET, UG_MARKET, PG_SECURE, UG_SECURE) travel with each iteration through a queue
+between each pair of stages. Once the pipeline is full, throughput approaches that of the slowest stage:
+
+    output, result, timings = pipelined_iterations.run(case, solver)
+    pipelined_iterations.throughput(timings)
+
+As each stage solves the iterations in order, time dependent parameters missing from an iteration's ts data take
+their value from the previous iteration solved, as in all_island_iterations_PSCC. If a CheckpointStore is given,
+iterations already held in it are loaded rather than solved, and each iteration is saved to it as it completes. As
+the stages skip the loaded iterations, the ts tables of the case are then forward filled before the workers start
+(see all_island_iterations_PSCC.carried_forward()), so that a resumed run carries over the same values as an
+uninterrupted one. The volumes of the loaded iterations are calculated together once the run ends (see
+data_io.curtailment).
+
+If a stage fails, whether solving an iteration or building its model, or a worker process exits early (e.g. when it
+is killed for running out of memory), the run raises rather than waiting on the pipeline.
+'''
+
+import multiprocessing
+import queue
+import tempfile
+import time
+import traceback
+from pathlib import Path
+
+import pandas as pd
+
+import data_io.curtailment as curtailment
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+from pyomo_models.build.template import ModelTemplate
+from pyomo_models.models.stage_major_iterations import STAGES, StageModel
+
+#Seconds the main process waits on the last queue before checking that the workers are alive
+_POLL_S = 1.0
+
+
+class _Failed:
+    '''
+    Passed down the pipeline in place of an iteration whose stage failed, or with iteration None if the model of the
+    stage failed to build.
+    '''
+    def __init__(self, iteration, stage, error):
+        self.iteration = iteration
+        self.stage = stage
+        self.error = error
+
+
+def _stage_worker(case, stage, solver, template_path, inbox, outbox):
+    '''
+    Solves stage for each (iteration, inputs, results, timings) taken from inbox, adding its solution, results and
+    timing and passing it on to outbox, until None is received.
+    '''
+    try:
+        stage_model = StageModel(case, stage, solver, ModelTemplate.load(template_path))
+    except Exception:
+        outbox.put(_Failed(None, stage, traceback.format_exc()))
+        return
+    while True:
+        item = inbox.get()
+        if item is None or isinstance(item, _Failed):
+            outbox.put(item)
+            if item is None:
+                return
+            continue
+
+        iteration, inputs, results, timings = item
+        start = time.time()
+        try:
+            solution, result, output = stage_model.solve(iteration, inputs, volumes = False)
+        except Exception:
+            outbox.put(_Failed(iteration, stage, traceback.format_exc()))
+            continue
+        results[stage] = result
+        timings.append((stage, start, time.time()))
+        if output is None:
+            outbox.put((iteration, inputs | solution, results, timings))
+        else:
+            #The DCOPF stage passes on its output in place of the solutions
+            outbox.put((iteration, output, results, timings))
+
+
+def _next(outbox, workers):
+    '''
+    The next item of the last queue of the pipeline. Raises if a worker exits with an error before passing on the end
+    of the pipeline, or if every worker has exited and the queue stays empty.
+    '''
+    while True:
+        try:
+            return outbox.get(timeout = _POLL_S)
+        except queue.Empty:
+            pass
+        for stage, worker in zip(STAGES, workers):
+            if worker.exitcode not in (None, 0):
+                raise RuntimeError(f"The worker of stage {stage} exited with code {worker.exitcode}")
+        if all(worker.exitcode is not None for worker in workers):
+            try:
+                return outbox.get(timeout = _POLL_S)
+            except queue.Empty:
+                raise RuntimeError("The workers of every stage exited without completing the pipeline") from None
+
+
+def run(case: object, solver, template = None, mp_context = None, checkpoint = None):
+    '''
+    Runs all iterations of the case through a pipeline of one worker process per stage. Returns the (output, result)
+    dictionaries in the format of all_island_iterations_PSCC.model(), and the timings of each stage solve as a
+    DataFrame (iteration, stage, start, end, solve_time_s; times in seconds from the start of the run).
+    '''
+    #Create Data Ouput & Result Dictionaries
+    output = {"format": "iteration"}
+    result = {"format": "iteration"}
+
+    remaining = []
+    for iteration in case.iterations:
+        if checkpoint is not None and iteration in checkpoint:
+            output[iteration], result[iteration] = checkpoint.load(iteration)
+        else:
+            remaining.append(iteration)
+    if checkpoint is not None:
+        case = all_island_iterations.carried_forward(case)
+
+    ctx = mp_context or multiprocessing.get_context()
+    template = template if template is not None else ModelTemplate.build(all_island_iterations.build_instance, case)
+    queues = [ctx.Queue() for _ in range(len(STAGES) + 1)]
+    solved = {}
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        template_path = Path(tmpdir) / "model.template"
+        template.save(template_path)
+
+        workers = [ctx.Process(target = _stage_worker,
+                               args = (case, stage, solver, template_path, queues[i], queues[i + 1]),
+                               daemon = True)
+                   for i, stage in enumerate(STAGES)]
+        for worker in workers:
+            worker.start()
+
+        t0 = time.time()
+        for iteration in remaining:
+            queues[0].put((iteration, {}, {}, []))
+        queues[0].put(None)
+
+        try:
+            while (item := _next(queues[-1], workers)) is not None:
+                if isinstance(item, _Failed):
+                    failure = "to build its model" if item.iteration is None else f"for iteration {item.iteration}"
+                    raise RuntimeError(f"Stage {item.stage} failed {failure}:\n{item.error}")
+
+                #Post-process the iteration while the stages solve the following iterations
+                iteration, dcopf_output, iteration_result, timings = item
+                all_island_iterations.curtailment_volumes(dcopf_output)
+                solved[iteration] = ({"dcopf": dcopf_output}, iteration_result)
+                if checkpoint is not None:
+                    checkpoint.save(iteration, *solved[iteration])
+                rows += [(iteration, stage, start - t0, end - t0) for stage, start, end in timings]
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+                worker.join()
+
+    #Merge in the order of case.iterations
+    for iteration in case.iterations:
+        if iteration in solved:
+            output[iteration], result[iteration] = solved[iteration]
+        else:
+            output[iteration], result[iteration] = output.pop(iteration), result.pop(iteration)
+    curtailment.attribute({iteration: output[iteration] for iteration in case.iterations if iteration not in solved})
+
+    timings = pd.DataFrame(rows, columns = ["iteration", "stage", "start", "end"])
+    timings["solve_time_s"] = timings["end"] - timings["start"]
+    return output, result, timings
+
+
+def throughput(timings):
+    '''
+    Per stage: the solves, the time spent solving (busy_s) and the iterations per second the stage would sustain
+    alone, with the pipeline as a whole (the first start to the last end) in the final row.
+    '''
+    report = timings.groupby("stage", sort = False).agg(solves = ("stage", "size"),
+                                                       busy_s = ("solve_time_s", "sum"))
+    report.loc["pipeline"] = [timings["iteration"].nunique(), timings["end"].max() - timings["start"].min()]
+    report["solves"] = report["solves"].astype(int)
+    report["iterations_per_s"] = report["solves"] / report["busy_s"]
+    return report
+
+
+def model(case: object, solver, template = None, mp_context = None, checkpoint = None):
+    '''
+    Runs all iterations of the case through a pipeline of one worker process per stage (see run()), returning the
+    (output, result) dictionaries in the format of all_island_iterations_PSCC.model().
+    '''
+    output, result, _ = run(case, solver, template = template, mp_context = mp_context, checkpoint = checkpoint)
+    return output, result
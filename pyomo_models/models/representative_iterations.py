@@ -0,0 +1,158 @@
+'''
+Representative timestep reduction of the all island market, secure and DCOPF model.
+
+For screening studies, the iterations of a case are clustered on their demand, generator availability and line
+rating profiles (case.ts_PD, ts_PGUB and ts_Lmax) with k-medoids, and only the medoid of each cluster is solved with
+all_island_iterations_PSCC. Results are then expanded back to every iteration, each taking the (output, result) of
+its cluster's medoid, so that they can be used as a full run (e.g. by pyomo_print.all_island_iterations_summary_df):
+
+    reduction = representative_iterations.cluster(case, k = 48)
+    output, result = representative_iterations.model(case, solver, reduction)
+    reduction.report(case)
+
+Each medoid carries a weight of the number of iterations it represents. The report gives the error of the reduction
+in the clustered inputs.
+'''
+
+
+import numpy as np
+import pandas as pd
+
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+
+#Time series clustered on by default
+CLUSTER_KEYS = ("ts_PD", "ts_PGUB", "ts_Lmax")
+
+#Rows of timesteps compared at once when computing medoids, to bound memory use
+_CHUNK = 512
+
+
+def _ts(case, key):
+    '''A ts table aligned to the case iterations, with missing values carried forward as in the instance.'''
+    return case[key].ffill().reindex(case.iterations)
+
+
+def features(case, keys = CLUSTER_KEYS):
+    '''
+    Normalised feature matrix of the iterations (rows). Each column is standardised (constant columns are dropped),
+    and each table is scaled by 1/sqrt(columns), so that each table carries equal weight whatever its size.
+    '''
+    blocks = []
+    for key in keys:
+        values = _ts(case, key).to_numpy(dtype=float)
+        values = values[:, ~np.isnan(values).all(axis=0)]
+        values = values[:, np.nanmax(values, axis=0) > np.nanmin(values, axis=0)]
+        if values.shape[1] == 0:
+            continue
+        values = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+        blocks.append(np.nan_to_num(values) / np.sqrt(values.shape[1]))
+    return np.hstack(blocks) if blocks else np.zeros((len(case.iterations), 0))
+
+
+def _distances(X, Y):
+    '''Euclidean distances between the rows of X and Y.'''
+    squared = (X*X).sum(1)[:, None] + (Y*Y).sum(1)[None, :] - 2*X @ Y.T
+    return np.sqrt(np.maximum(squared, 0))
+
+
+def k_medoids(X, k, seed = 0, max_iterations = 100):
+    '''
+    Alternating k-medoids of the rows of X, from a k-means++ initialisation. Returns the row index of each medoid
+    and the cluster of each row.
+    '''
+    n = len(X)
+    if k >= n:
+        return np.arange(n), np.arange(n)
+
+    rng = np.random.default_rng(seed)
+    medoids = [int(rng.integers(n))]
+    nearest = _distances(X, X[medoids])[:, 0]**2
+    for _ in range(1, k):
+        p = nearest / nearest.sum() if nearest.sum() > 0 else np.isin(np.arange(n), medoids, invert=True) / (n - len(medoids))
+        medoids.append(int(rng.choice(n, p=p)))
+        nearest = np.minimum(nearest, _distances(X, X[medoids[-1:]])[:, 0]**2)
+    medoids = np.array(medoids)
+
+    for _ in range(max_iterations):
+        labels = _distances(X, X[medoids]).argmin(1)
+        updated = medoids.copy()
+        for j in range(k):
+            members = np.flatnonzero(labels == j)
+            if len(members) == 0:
+                continue
+            cost = np.concatenate([_distances(X[members[i:i + _CHUNK]], X[members]).sum(1)
+                                   for i in range(0, len(members), _CHUNK)])
+            updated[j] = members[cost.argmin()]
+        if np.array_equal(updated, medoids):
+            break
+        medoids = updated
+
+    return medoids, _distances(X, X[medoids]).argmin(1)
+
+
+class Reduction:
+    '''
+    Representative iterations of a case. medoids holds the representative iterations (in case order), assignment
+    the medoid representing each iteration, and weights the number of iterations each medoid represents.
+    '''
+    def __init__(self, case, medoids, labels, keys = CLUSTER_KEYS):
+        self.keys = tuple(keys)
+        iterations = list(case.iterations)
+        order = np.argsort(medoids)
+        self.medoids = [iterations[medoids[j]] for j in order]
+        rank = np.empty(len(order), dtype=int)
+        rank[order] = np.arange(len(order))
+        self.assignment = pd.Series([self.medoids[rank[label]] for label in labels], index=case.iterations, name="medoid")
+        self.weights = self.assignment.value_counts().reindex(self.medoids).rename("weight")
+
+    def reduced_case(self, case):
+        '''A copy of the case with only the medoids as iterations.'''
+        reduced = all_island_iterations.carried_forward(case)
+        reduced.iterations = pd.Index(self.medoids, name=getattr(case.iterations, "name", None))
+        return reduced
+
+    def expand(self, case, output, result):
+        '''Expands the (output, result) of the medoids to every iteration of the case.'''
+        output = {"format": output["format"]} | {iteration: output[self.assignment[iteration]] for iteration in case.iterations}
+        result = {"format": result["format"]} | {iteration: result[self.assignment[iteration]] for iteration in case.iterations}
+        return output, result
+
+    def report(self, case):
+        '''
+        Error of the reduction in each clustered table: the mean of its total over all iterations (actual), and as
+        represented by the medoids (represented), with the error in the mean (%), the mean and maximum absolute
+        error of the per-iteration total, and the RMSE over every entry of the table.
+        '''
+        rows = {}
+        for key in self.keys:
+            actual = _ts(case, key)
+            represented = actual.loc[self.assignment.values].set_axis(actual.index)
+            actual_total, represented_total = actual.sum(axis=1), represented.sum(axis=1)
+            error = represented_total - actual_total
+            difference = represented.to_numpy(dtype=float) - actual.to_numpy(dtype=float)
+            difference = difference[~np.isnan(difference)]
+            rows[key] = {"actual mean": actual_total.mean(),
+                         "represented mean": represented_total.mean(),
+                         "mean error (%)": 100*error.mean()/actual_total.mean() if actual_total.mean() else np.nan,
+                         "total MAE": error.abs().mean(),
+                         "total max abs error": error.abs().max(),
+                         "profile RMSE": np.sqrt(np.mean(difference**2)) if difference.size else np.nan}
+        report = pd.DataFrame.from_dict(rows, orient="index")
+        report.attrs["iterations"] = len(case.iterations)
+        report.attrs["representatives"] = len(self.medoids)
+        return report
+
+
+def cluster(case: object, k, keys = CLUSTER_KEYS, seed = 0, max_iterations = 100):
+    '''Clusters the iterations of the case into k representative iterations.'''
+    medoids, labels = k_medoids(features(case, keys), k, seed = seed, max_iterations = max_iterations)
+    return Reduction(case, medoids, labels, keys)
+
+
+def model(case: object, solver, reduction, **kwargs):
+    '''
+    Solves the representative iterations of a Reduction with all_island_iterations_PSCC.model() (to which any
+    further keyword arguments are passed), returning the results expanded to every iteration of the case.
+    '''
+    output, result = all_island_iterations.model(reduction.reduced_case(case), solver, **kwargs)
+    return reduction.expand(case, output, result)
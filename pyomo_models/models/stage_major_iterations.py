@@ -0,0 +1,176 @@
+'''
+Stage-major execution of the all island market, secure and DCOPF model.
+
+all_island_iterations_PSCC solves the iterations of a case one at a time, reconfiguring its instance three times per
+iteration (activating and deactivating the constraints of each stage and swapping the objective). Here each stage is
+instead run over every iteration before the next stage starts:
+
+    1. the copper plate market stage is solved for all iterations, giving the T x G arrays PG_MARKET and UG_MARKET
+    2. the copper plate secure stage is solved for all iterations from those arrays, giving PG_SECURE and UG_SECURE
+    3. the DCOPF stage is solved for all iterations from those arrays
+
+Each stage has its own instance (a StageModel), configured once for that stage, and a persistent solver, so that only
+the time dependent parameters, the conditional MUON constraints and the KVL constraints of the branches in service
+change between iterations:
+
+    output, result = stage_major_iterations.model(case, solver)
+
+With processes > 1, the iterations of each stage are split across a pool of worker processes, each holding its own
+StageModel for that stage. As in parallel_iterations, the ts tables of the case are then forward filled before the
+iterations are dispatched, so that a time dependent parameter missing from an iteration's ts data takes its value
+from the case's previous iteration rather than the worker's.
+
+Variables of the earlier stages that are not part of the DCOPF stage (e.g. prorata_curtailment_zeta) are not carried
+into the DCOPF stage instance, so they are not held in the DCOPF output as they are by all_island_iterations_PSCC.
+'''
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pyomo.opt import SolverFactory
+
+import data_io.curtailment as curtailment
+import pyomo_models.build.pyosolve as pyosolve
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+from pyomo_models.build.template import ModelTemplate
+
+STAGES = ("copper_market", "copper_curtailed", "dcopf")
+
+#Stage solutions, as (parameter set from the solution, variable it is rounded from, decimals)
+_SOLUTIONS = {"copper_market": (("PG_MARKET", "pG", 6), ("UG_MARKET", "u_g", 0)),
+              "copper_curtailed": (("PG_SECURE", "pG", 6), ("UG_SECURE", "u_g", 0))}
+
+
+class StageModel:
+    '''
+    An instance configured to solve a single stage, with a persistent solver. The instance is built from the case
+    (or cloned from a ModelTemplate) and the stages up to and including stage are activated once.
+    '''
+    def __init__(self, case, stage, solver, template = None):
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage {stage}")
+        self.case = case
+        self.stage = stage
+        self.solver = solver
+        self.instance = template.clone() if template is not None else all_island_iterations.build_instance(case)
+        self.generators = list(self.instance.G)
+        self.opt = SolverFactory(solver)
+
+        self.stages = STAGES[:STAGES.index(stage) + 1]
+        for s in self.stages:
+            all_island_iterations.activate_stage(self.instance, s)
+
+    def set_inputs(self, inputs):
+        '''Sets the solution parameters of the earlier stages (PG_MARKET etc.) from arrays over the generators.'''
+        for name, values in inputs.items():
+            param = getattr(self.instance, name)
+            for g, v in zip(self.generators, values):
+                param[g] = float(v)
+
+    def solve(self, iteration, inputs = None, volumes = True):
+        '''
+        Solves the stage for an iteration, from the solutions of the earlier stages for that iteration given as
+        inputs ({parameter name: array over the generators}). Returns the solution arrays of the stage (empty for
+        the DCOPF stage), its results and, for the DCOPF stage, its InstanceCache output (with its curtailment
+        volumes unless volumes is False).
+        '''
+        instance = self.instance
+        all_island_iterations.update_iteration(instance, self.case, iteration)
+        self.set_inputs(inputs or {})
+        for s in self.stages:
+            all_island_iterations.apply_iteration_constraints(instance, s)
+
+        result = pyosolve.solveinstance(instance, solver = self.solver, opt = self.opt)
+
+        solution = {name: np.array([round(getattr(instance, var)[g].value, decimals) for g in self.generators])
+                    for name, var, decimals in _SOLUTIONS.get(self.stage, ())}
+        output = all_island_iterations.dcopf_output(instance, result, volumes) if self.stage == "dcopf" else None
+        return solution, result, output
+
+
+#Per-process StageModel of a worker, set by _init_worker()
+_worker = {}
+
+
+def _init_worker(case, stage, solver, template_path):
+    _worker["model"] = StageModel(case, stage, solver, ModelTemplate.load(template_path))
+
+
+def _solve_batch(batch):
+    return [(iteration, *_worker["model"].solve(iteration, inputs, volumes = False)) for iteration, inputs in batch]
+
+
+def _stage_inputs(solutions, stage, t):
+    '''The solution arrays of the stages before stage, for the t-th iteration.'''
+    inputs = {}
+    for s in STAGES[:STAGES.index(stage)]:
+        for name, _, _ in _SOLUTIONS[s]:
+            inputs[name] = solutions[name][t]
+    return inputs
+
+
+def run(case: object, solver, template = None, processes = 1, chunksize = 1, mp_context = None):
+    '''
+    Runs each stage over all iterations of the case in turn. Returns the (output, result) dictionaries in the
+    format of all_island_iterations_PSCC.model(), and the stage solutions as DataFrames (iterations x generators)
+    of PG_MARKET, UG_MARKET, PG_SECURE and UG_SECURE.
+    '''
+    iterations = list(case.iterations)
+    template = template if template is not None else ModelTemplate.build(all_island_iterations.build_instance, case)
+    processes = max(1, min(processes or os.cpu_count() or 1, len(iterations)))
+    if processes > 1:
+        case = all_island_iterations.carried_forward(case)
+
+    solutions = {}
+    results = {iteration: {} for iteration in iterations}
+    outputs = {}
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        template_path = None
+        if processes > 1:
+            template_path = Path(tmpdir) / "model.template"
+            template.save(template_path)
+
+        for stage in STAGES:
+            work = [(iteration, _stage_inputs(solutions, stage, t)) for t, iteration in enumerate(iterations)]
+
+            if processes == 1:
+                stage_model = StageModel(case, stage, solver, template)
+                solved = [(iteration, *stage_model.solve(iteration, inputs, volumes = False)) for iteration, inputs in work]
+                generators = stage_model.generators
+            else:
+                batches = [work[i:i + chunksize] for i in range(0, len(work), chunksize)]
+                with ProcessPoolExecutor(max_workers = processes,
+                                         mp_context = mp_context,
+                                         initializer = _init_worker,
+                                         initargs = (case, stage, solver, template_path)) as pool:
+                    solved = [s for batch in pool.map(_solve_batch, batches) for s in batch]
+                generators = list(template.instance.G)
+
+            for name, _, _ in _SOLUTIONS.get(stage, ()):
+                solutions[name] = np.vstack([solution[name] for _, solution, _, _ in solved])
+            for iteration, _, stage_result, stage_output in solved:
+                results[iteration][stage] = stage_result
+                if stage_output is not None:
+                    outputs[iteration] = {stage: stage_output}
+
+    output = {"format": "iteration"} | outputs
+    result = {"format": "iteration"} | results
+    curtailment.attribute(output)
+    solutions = {name: pd.DataFrame(values, index=case.iterations, columns=generators)
+                 for name, values in solutions.items()}
+    return output, result, solutions
+
+
+def model(case: object, solver, template = None, processes = 1, chunksize = 1, mp_context = None):
+    '''
+    Runs all iterations of the case stage by stage (see run()), returning the (output, result) dictionaries in the
+    format of all_island_iterations_PSCC.model().
+    '''
+    output, result, _ = run(case, solver, template = template, processes = processes,
+                            chunksize = chunksize, mp_context = mp_context)
+    return output, result
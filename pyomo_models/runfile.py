@@ -9,6 +9,7 @@ import data_io.load_case as load_case
 import pyomo_models.models.dcopf_snapshot as dcopf_snapshot
 import pyomo_models.models.dcopf_iterations as dcopf_iterations
 import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+import pyomo_models.models.all_island_iterations_highs as all_island_iterations_highs
 import data_io.pyomo_print as print_data
 
 # Set up logger
@@ -50,6 +51,15 @@ def run_model(testcase = "ireland_case_v1.xlsx", solver = "appsi_highs", model="
             print_data.all_island_timeseries_to_excel(case, output)
             return output, result
 
+        case 'All Island Timeseries HiGHS':
+            #load case
+            case = load_case.Case()
+            case._load_excel_case(testcase, iterative = True)
+            case.summary()
+            output, result = all_island_iterations_highs.model(case)
+            print_data.all_island_timeseries_to_excel(case, output)
+            return output, result
+
         case _:
             KeyError(f"The model selected ({model}) has not been defined")
         
@@ -0,0 +1,20 @@
+from pathlib import Path
+
+import pytest
+
+from data_io.load_case import Case
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def illustrative_case():
+    '''
+    The three bus illustrative case (six iterations, the branches L2 and T2 out of service from t-4). G3 is added to
+    the S_NBMIN_DUB_L2 group, whose three unit minimum applies whether or not its demand condition is met, so that
+    the secure stage is feasible.
+    '''
+    case = Case()
+    case._load_excel_case(str(ROOT / "illustrative_testcase.xlsx"), iterative = True)
+    case.generators.loc[case.generators["name"] == "G3", "MUON_group"] = "S_NBMIN_MP_NB, S_REP_ROI, S_NBMIN_DUB_L2"
+    return case
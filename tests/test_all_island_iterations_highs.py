@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+import pyomo_models.models.all_island_iterations_highs as highs
+from data_io.checkpoint import CheckpointStore
+from pyomo_models.build.muon_conditions import DemandCondition
+from pyomo_models.build.warmstart import WarmStartManager
+
+BIGM = ["S_NBMIN_CPS", "S_NBMIN_MP_NB"]
+
+
+def _with_CPS_limit(monkeypatch, limit):
+    '''Enables the MUON NB Big-M constraints in both engines, with the demand condition of S_NBMIN_CPS at limit.'''
+    constraint_dicts = all_island_iterations.MUON_constraint_dicts
+
+    def patched(baseMVA):
+        MW_dict, NB_dict, bigM_dict = constraint_dicts(baseMVA)
+        bigM_dict["S_NBMIN_CPS"]["Condition"] = DemandCondition("D_NI", limit)
+        return MW_dict, NB_dict, bigM_dict
+    monkeypatch.setattr(all_island_iterations, "MUON_constraint_dicts", patched)
+    monkeypatch.setattr(all_island_iterations, "MUON_NB_bigM_constraints_list", BIGM)
+
+
+def _coefficient(engine, row, column):
+    _, rows, values = engine.highs.getColEntries(int(column))
+    return dict(zip(rows.tolist(), values.tolist())).get(int(row), 0.0)
+
+
+#The per-unit demand of D_NI is 0.55 in every iteration, so the demand switch of S_NBMIN_CPS is off, then on
+@pytest.mark.parametrize("limit", [15.5, 0.5])
+def test_big_m_stages_match_pyomo(illustrative_case, monkeypatch, limit):
+    _with_CPS_limit(monkeypatch, limit)
+    expected, expected_result = all_island_iterations.model(illustrative_case, "appsi_highs")
+    output, result = highs.model(illustrative_case)
+
+    for iteration in illustrative_case.iterations:
+        assert [result[iteration][stage].problem.upper_bound for stage in highs.STAGES] \
+            == pytest.approx([expected_result[iteration][stage].problem.upper_bound for stage in highs.STAGES], abs = 1e-4)
+        assert output[iteration]["dcopf"].bMvar_y == {"S_NBMIN_CPS": float(limit < 0.55)}
+
+
+def test_big_m_update_iteration(illustrative_case, monkeypatch):
+    _with_CPS_limit(monkeypatch, 0.6)
+    case = illustrative_case
+    #In t-2 the NI wind unit W1.1 is limited to 10-20 MW, and the NI demand raised above the condition's 60 MW
+    case.ts_PGUB.loc["t-2", "W1.1"] = 20
+    case.ts_PGLB.loc["t-2", "W1.1"] = 10
+    case.ts_PD.loc["t-2", "D1"] = 65
+    engine = highs.DirectModel(case)
+    (_, CPS_rows), (_, MP_NB_rows) = engine.MUON_bigM_rows
+    y_G = engine.columns.at("bMvar_y_G", BIGM)
+
+    def M():
+        return [-_coefficient(engine, CPS_rows["L"][0], y_G[0]), _coefficient(engine, CPS_rows["U"][0], y_G[0]),
+                -_coefficient(engine, MP_NB_rows["L"][0], y_G[1]), _coefficient(engine, MP_NB_rows["U"][0], y_G[1])]
+
+    #M_L = pGlim - sum(PGmin) and M_U = sum(PGmax) - pGlim over the wind of each zone (pGlim 4.5 in NI, 10 in ROI)
+    engine.update_iteration("t-1")
+    assert M() == pytest.approx([4.5, 1.2 - 4.5, 10, 1.2 - 10])
+    assert engine.rows.upper[CPS_rows["U"]] == pytest.approx([1.2])
+    assert (engine.rows.upper[CPS_rows["D"]].tolist(), engine.rows.lower[CPS_rows["y"]].tolist()) == ([0], [-1])
+
+    engine.update_iteration("t-2")
+    assert M() == pytest.approx([4.5 - 0.1, 0.8 - 4.5, 10, 1.2 - 10])
+    assert engine.rows.upper[CPS_rows["U"]] == pytest.approx([0.8])
+    assert (engine.rows.upper[CPS_rows["D"]].tolist(), engine.rows.lower[CPS_rows["y"]].tolist()) == ([1], [0])
+
+
+def _objectives(result, iterations):
+    return [result[iteration][stage].problem.upper_bound for iteration in iterations for stage in highs.STAGES]
+
+
+def test_batches_match_single_iterations(illustrative_case, tmp_path, monkeypatch):
+    case = illustrative_case
+    expected_output, expected = highs.model(case)
+
+    batches = []
+    solve_iterations = highs.BatchedDirectModel.solve_iterations
+    def spy(self, iterations):
+        batches.append(list(iterations))
+        return solve_iterations(self, iterations)
+    monkeypatch.setattr(highs.BatchedDirectModel, "solve_iterations", spy)
+
+    #Six iterations in batches of four
+    output, result = highs.model(case, batch_size = 4)
+    assert batches == [["t-1", "t-2", "t-3", "t-4"], ["t-5", "t-6"]]
+    assert list(result) == ["format"] + list(case.iterations)
+    assert _objectives(result, case.iterations) == pytest.approx(_objectives(expected, case.iterations), rel = 1e-6)
+    assert [output[t]["dcopf"].V_MUON for t in case.iterations] \
+        == pytest.approx([expected_output[t]["dcopf"].V_MUON for t in case.iterations])
+
+    #A loaded iteration ends the batch before it
+    batches.clear()
+    checkpoint = CheckpointStore(tmp_path / "checkpoint")
+    checkpoint.save("t-3", {"dcopf": expected_output["t-3"]["dcopf"]}, {"dcopf": "loaded"})
+    output, result = highs.model(case, checkpoint = checkpoint, batch_size = 4)
+    assert batches == [["t-1", "t-2"], ["t-4", "t-5", "t-6"]]
+    assert list(result) == ["format"] + list(case.iterations) and result["t-3"] == {"dcopf": "loaded"}
+    solved = [t for t in case.iterations if t != "t-3"]
+    assert _objectives(result, solved) == pytest.approx(_objectives(expected, solved), rel = 1e-6)
+    assert "t-6" in checkpoint
+
+
+def test_partial_batch_leaves_unused_copies_free(illustrative_case):
+    engine = highs.BatchedDirectModel(illustrative_case, 4)
+    pairs = engine.solve_iterations(["t-1", "t-2", "t-3"])
+    assert len(pairs) == 3
+
+    #The last stage solved leaves the rows of the unused fourth copy free, at zero cost
+    lp = engine.highs.getLp()
+    n_rows, n_cols = engine.model.rows.n, engine.model.columns.n
+    assert np.all(np.asarray(lp.row_lower_)[3*n_rows:] == -highs.INF)
+    assert np.all(np.asarray(lp.row_upper_)[3*n_rows:] == highs.INF)
+    assert not np.any(np.asarray(lp.col_cost_)[3*n_cols:])
+
+
+def test_batched_warm_starts(illustrative_case):
+    case = illustrative_case
+    _, expected = highs.model(case)
+    warmstart = WarmStartManager()
+    _, result = highs.model(case, warmstart = warmstart, batch_size = 4)
+
+    assert _objectives(result, case.iterations) == pytest.approx(_objectives(expected, case.iterations), rel = 1e-6)
+    #A record per stage of each batch, with the market stage seeded once an earlier batch has solved it
+    records = warmstart.to_dataframe()
+    assert records["iteration"].tolist() == [("t-1", "t-2", "t-3", "t-4")]*3 + [("t-5", "t-6")]*3
+    assert records["seeded"].tolist() == [False, True, True, True, True, True]
@@ -0,0 +1,61 @@
+import numpy as np
+from pyomo.environ import Binary, Block, ConcreteModel, Constraint, Param, Reals, Set, Var
+
+from pyomo_models.build.bigm import BigMTightening, propagate_groups, sum_bounds
+
+
+def test_group_limits_tighten_members_and_sums():
+    lower, upper = np.zeros(3), np.array([4.0, 4.0, 4.0])
+    #At most 5 over generators 0 and 1, at least 1 over generators 1 and 2
+    members = np.array([[True, True, False], [False, True, True]])
+    group_lower, group_upper = np.array([-np.inf, 1.0]), np.array([5.0, np.inf])
+
+    lower, upper = propagate_groups(lower, upper, members, group_lower, group_upper)
+    assert list(upper) == [4, 4, 4] and list(lower) == [0, 0, 0]
+    assert sum_bounds(lower, upper, np.array([True, True, False]), members, group_lower, group_upper) == (0, 5)
+    assert sum_bounds(lower, upper, np.array([True, True, True]), members, group_lower, group_upper) == (1, 9)
+
+    lower, upper = propagate_groups(np.zeros(2), np.array([4.0, np.inf]), np.array([[True, True]]),
+                                    np.array([6.0]), np.array([np.inf]))
+    assert list(lower) == [0, 2] and list(upper) == [4, np.inf]
+
+
+def _instance():
+    #Generators a and b of pro-rata group A, secure at 2 and 4 but limited to 1 by a MUON limit
+    m = ConcreteModel()
+    m.G = Set(initialize = ["a", "b", "c"])
+    m.G_prorata = Set(initialize = ["a", "b"])
+    m.G_prorata_pairs = Set(initialize = [("a", "A"), ("b", "A")], dimen = 2)
+    m.G_wind = Set(initialize = ["a", "b"])
+    m.PGmin = Param(m.G, initialize = 0, mutable = True)
+    m.PGmax = Param(m.G, initialize = {"a": 5, "b": 5, "c": 3}, mutable = True)
+    m.PG_SECURE = Param(m.G, initialize = {"a": 2, "b": 4, "c": 3}, mutable = True)
+    m.M_prorata_xi = Param(m.G_prorata_pairs, initialize = 1, mutable = True)
+    m.pG = Var(m.G, domain = Reals)
+    m.u_g = Var(m.G, domain = Binary)
+    m.xi_prorata = Var(m.G_prorata, bounds = (0, 1))
+    m.gen_uc_min = Constraint(m.G, rule = lambda m, g: m.pG[g] >= m.u_g[g]*m.PGmin[g])
+    m.gen_uc_max = Constraint(m.G, rule = lambda m, g: m.pG[g] <= m.u_g[g]*m.PGmax[g])
+    m.gen_prorata_realpower_max_xi = Constraint(m.G_prorata, rule = lambda m, g: m.pG[g] <= m.PG_SECURE[g]*m.xi_prorata[g])
+    m.gen_prorata_realpower_min_xi = Constraint(m.G_prorata, rule = lambda m, g: m.pG[g] >= m.PG_SECURE[g]*m.xi_prorata[g])
+    m.gen_prorata_xi_min = Constraint(m.G_prorata_pairs, rule = lambda m, g, cg: m.xi_prorata[g] >= 0)
+    m.MUON = Block()
+    m.MUON.limit = Block()
+    m.MUON.limit._UB = Constraint(expr = m.pG["a"] + m.pG["b"] <= 1)
+    m.switch = Block()
+    m.switch.M_L = Param(within = Reals, initialize = 3, mutable = True)
+    m.switch.M_U = Param(within = Reals, initialize = 7, mutable = True)
+    return m
+
+
+def test_tighten_writes_big_m_of_stage():
+    m = _instance()
+    bigm = BigMTightening()
+    bigm.tighten(m, "t-1", "dcopf", [(m.switch.M_L, m.switch.M_U, m.G_wind, 3)])
+
+    #The wind sum lies in [0, 1] (not [0, 10]), and xi is at most 1/2 for a and 1/4 for b
+    assert m.switch.M_L.value == 3 and m.switch.M_U.value == 0
+    assert m.M_prorata_xi["a", "A"].value == 0.5 and m.M_prorata_xi["b", "A"].value == 0.5
+    records = bigm.to_dataframe()
+    assert list(records["param"]) == ["M_L", "M_U", "M_prorata_xi"]
+    assert list(records["tightened"]) == [0, 1, 2]
@@ -87,3 +87,76 @@ def test_build_helpers_accept_dataclasses_and_enums():
     assert len(model.line_cont_realpower_max_pstve) == 2
     assert model.line_cont_realpower_max_pstve.index_set() is model.B
 
+
+
+def test_block_registries_are_reused_per_case(monkeypatch):
+    import gc
+    import weakref
+
+    import pandas as pd
+
+    from data_io import helpers
+    from data_io.load_case import Case
+    from pyomo_models.build import build_functions
+
+    case = Case()
+    case["busses"] = pd.DataFrame({"name": ["b1", "b2"], "type": [3, 1]})
+
+    calls = []
+    get_param_list = helpers.get_param_list
+
+    def counting_get_param_list(*args, **kwargs):
+        calls.append(args)
+        return get_param_list(*args, **kwargs)
+
+    monkeypatch.setattr(helpers, "get_param_list", counting_get_param_list)
+
+    first = ConcreteModel()
+    build_functions.build_sets(first, case, [ComponentName.B, ComponentName.b0])
+    registry = build_functions._get_block_registry(build_functions.Sets_Blocks, case)
+    assert registry is build_functions._get_block_registry(build_functions.Sets_Blocks, case)
+
+    #The registry is reused, but the initial data is read from the case on every build
+    case["busses"].loc[1, "type"] = 3
+    second = ConcreteModel()
+    build_functions.build_sets(second, case, [ComponentName.B, ComponentName.b0])
+    assert len(calls) == 4
+    assert sorted(second.B.data()) == ["b1", "b2"]
+    assert sorted(second.b0.data()) == ["b1", "b2"]
+
+    #Nothing cached keeps the case alive
+    key = (build_functions.Sets_Blocks, id(case))
+    owner = weakref.ref(case)
+    del case, registry
+    gc.collect()
+    assert owner() is None
+    assert key not in build_functions._block_registries
+
+
+def test_build_profiler_records_component_builds():
+    from pyomo_models.build.profiling import profile_build
+
+    model = ConcreteModel()
+    set_a = SetDefDC(name=ComponentName.B, initialize=[1, 2, 3])
+    var_x = VarDefDC(name=ComponentName.pG, index=set_a)
+
+    def rule(m, i):
+        return m.pG[i] >= 0
+
+    constraint_c = ConstraintDefDC(name=ComponentName.gen_uc_min, index=ComponentName.B, rule=rule)
+
+    with profile_build() as profiler:
+        add_sets_to_instance(model, [set_a])
+        add_variables_to_instance(model, [var_x])
+        add_constraints_to_instance(model, [constraint_c])
+        add_constraints_to_instance(model, [constraint_c])
+
+    df = profiler.to_dataframe()
+    assert list(df["phase"]) == ["set", "variable", "constraint", "constraint"]
+    assert list(df["rebuilt"]) == [False, False, False, True]
+    constraints = df[df["phase"] == "constraint"]
+    assert list(constraints["indices"]) == [3, 3]
+    assert list(constraints["nonzeros"]) == [3, 3]
+
+    summary = profiler.summary()
+    assert summary.loc[summary["name"] == "gen_uc_min", "builds"].item() == 2
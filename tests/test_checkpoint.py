@@ -0,0 +1,17 @@
+import pandas as pd
+
+from data_io.checkpoint import CheckpointStore
+
+
+def test_checkpoint_store_save_and_resume(tmp_path):
+    store = CheckpointStore(tmp_path / "run")
+    iteration = pd.Timestamp("2024-01-01 06:00")
+
+    assert iteration not in store
+    store.save(iteration, {"dcopf": {"obj": 1.5}}, {"dcopf": "ok"})
+
+    resumed = CheckpointStore(tmp_path / "run")
+    assert iteration in resumed
+    assert resumed.load(iteration) == ({"dcopf": {"obj": 1.5}}, {"dcopf": "ok"})
+    assert resumed.completed() == [iteration]
+    assert not list((tmp_path / "run").glob("*.tmp"))
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import data_io.curtailment as curtailment
+
+
+def _cache(PGmax, PG_MARKET, PG_SECURE, pG):
+    #Wind units w1 and w2, and a synchronous unit s
+    G = ["w1", "w2", "s"]
+    return SimpleNamespace(G = G, G_ns = ["w1", "w2"], G_s = ["s"], PGmax = dict(zip(G, PGmax)),
+                           PG_MARKET = dict(zip(G, PG_MARKET)), PG_SECURE = dict(zip(G, PG_SECURE)), pG = dict(zip(G, pG)))
+
+
+def test_volumes_of_all_iterations():
+    output = {"format": "iteration",
+              "t-1": {"dcopf": _cache([6, 4, 5], [6, 2, 0], [3, 1, 5], [2, 1, 6])},
+              "t-2": {"dcopf": _cache([1, 1, 5], [0, 0, 4], [0, 0, 4], [0, 0, 4])}}
+    volumes = curtailment.attribute(output)
+    first, second = output["t-1"]["dcopf"], output["t-2"]["dcopf"]
+
+    #Wind is the whole market dispatch of 8, 2 above the SNSP limit, so is curtailed by 2/8, and a further 2 for MUON
+    assert (first.V_Surplus, first.V_SNSP, first.x_SNSP, first.V_MUON, first.x_MUON, first.V_Constraint) \
+        == (2, 2, 0.25, 2, 0.25, 1)
+    assert first.v_SNSP_g == {"w1": 1.5, "w2": 0.5, "s": 0}
+    assert first.v_Constraint_g == {"w1": 1, "w2": 0, "s": 0}
+    assert first.x_Constraint == {"w1": 1/3, "w2": 0}
+    assert sum(first.v_MUON_g.values()) == first.V_MUON
+
+    #Without wind in the market, nothing is shared out
+    assert (second.V_Surplus, second.V_SNSP, second.x_SNSP, second.x_MUON) == (2, 0, 0, 0)
+    assert list(volumes.to_dataframe().index) == ["t-1", "t-2"]
+    assert np.array_equal(volumes.to_dataframe()["V_SNSP"], [2, 0])
@@ -0,0 +1,29 @@
+from pyomo.environ import Binary, ConcreteModel, Constraint, NonNegativeReals, Objective, Param, Var, minimize
+
+from pyomo_models.build.fastmode import CommitmentFixing
+import pyomo_models.build.pyosolve as pyosolve
+
+
+def _instance():
+    m = ConcreteModel()
+    m.D = Param(initialize = 5, mutable = True)
+    m.u = Var(domain = Binary)
+    m.p = Var(domain = NonNegativeReals)
+    m.max = Constraint(expr = m.p <= 10*m.u)
+    m.balance = Constraint(expr = m.p == m.D)
+    m.OBJ = Objective(expr = 10*m.u + m.p, sense = minimize)
+    return m
+
+
+def test_commitment_fixing_paths():
+    m = _instance()
+    fastmode = CommitmentFixing(tolerance = 0.5)
+    solve_mip = lambda opt: pyosolve.solveinstance(m, opt = opt)
+
+    for iteration, demand in [("t-1", 5), ("t-2", 5), ("t-3", 0), ("t-4", 5)]:
+        m.D = demand
+        fastmode.solve(m, "appsi_highs", iteration, "market", solve_mip)
+        assert not m.u.fixed
+
+    assert list(fastmode.report()["market"]) == ["mip", "fixed_lp", "mip_gap", "mip_infeasible"]
+    assert list(fastmode.to_dataframe()["objective"]) == [15, 15, 0, 15]
@@ -0,0 +1,38 @@
+from pyomo.environ import ConcreteModel, Constraint, Objective, Param, Reals, Set, Var, minimize
+
+from pyomo_models.build.lazylimits import LazyLineLimits
+import pyomo_models.build.pyosolve as pyosolve
+
+
+def _instance():
+    #Two parallel lines carrying a demand of 3, with line a cheaper but limited to 1
+    m = ConcreteModel()
+    m.L = Set(initialize = ["a", "b"])
+    m.L_nonzero = Set(initialize = ["a", "b"])
+    m.TRANSF = Set(initialize = [])
+    m.TRANSF_nonzero = Set(initialize = [])
+    m.pL = Var(m.L, domain = Reals, bounds = (-10, 10))
+    m.pLT = Var(m.TRANSF, domain = Reals)
+    m.line_max_continuous_P = Param(m.L, initialize = {"a": 1, "b": 5}, mutable = True)
+    m.transformer_max_continuous_P = Param(m.TRANSF, mutable = True)
+    m.line_cont_realpower_max_pstve = Constraint(m.L, rule = lambda m, l: m.pL[l] <= m.line_max_continuous_P[l])
+    m.line_cont_realpower_max_ngtve = Constraint(m.L, rule = lambda m, l: m.pL[l] >= -m.line_max_continuous_P[l])
+    m.transf_continuous_real_max_pstve = Constraint(m.TRANSF, rule = lambda m, t: m.pLT[t] <= 0)
+    m.transf_continuous_real_max_ngtve = Constraint(m.TRANSF, rule = lambda m, t: m.pLT[t] >= 0)
+    m.demand = Constraint(expr = m.pL["a"] + m.pL["b"] == 3)
+    m.OBJ = Objective(expr = m.pL["a"] + 2*m.pL["b"], sense = minimize)
+    return m
+
+
+def test_lazy_limits_add_violated_limits_and_carry_binding_set():
+    m = _instance()
+    lazy = LazyLineLimits()
+    for iteration in ["t-1", "t-2"]:
+        lazy.solve(m, iteration, lambda: pyosolve.solveinstance(m))
+        assert abs(m.pL["a"].value - 1) < 1e-9 and abs(m.pL["b"].value - 2) < 1e-9
+
+    records = lazy.to_dataframe()
+    assert list(records["rounds"]) == [2, 1]
+    assert list(records["added"]) == [2, 0]
+    assert lazy.binding["line"] == {"a"}
+    assert all(c.active for c in m.line_cont_realpower_max_pstve.values())
@@ -0,0 +1,16 @@
+import pickle
+
+import pandas as pd
+
+from data_io.load_case import Case
+
+
+def test_case_pickle_roundtrip():
+    case = Case()
+    case["generators"] = pd.DataFrame({"name": ["G1", "G2"]})
+    case.baseMVA = 100
+
+    loaded = pickle.loads(pickle.dumps(case))
+
+    assert list(loaded.generators["name"]) == ["G1", "G2"]
+    assert loaded.baseMVA == 100
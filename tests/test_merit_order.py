@@ -0,0 +1,62 @@
+import numpy as np
+from pyomo.environ import (Binary, ConcreteModel, Constraint, NonNegativeReals, Objective, Param, Reals, Set, Var,
+                           minimize, value)
+
+from pyomo_models.build.merit_order import MeritOrderMarket, dispatch
+import pyomo_models.build.pyosolve as pyosolve
+
+
+def test_dispatch_fills_in_merit_order():
+    #Three units from 0 to 2, cheapest last, meeting 3
+    values = dispatch(np.zeros((2, 3)), np.array([[2.0, 2.0, 2.0], [0.0, 0.0, 2.0]]), np.array([2, 0, 1]), 3)
+    assert list(values[0]) == [1, 0, 2]
+    assert np.isnan(values[1]).all()
+
+
+def _instance(PD):
+    #Cheap unit a with a commitment cost and minimum output, flexible unit b, and an expensive peaker c
+    m = ConcreteModel()
+    m.G = Set(initialize = ["a", "b", "c"])
+    m.D = Set(initialize = ["d"])
+    m.PGmin = Param(m.G, initialize = {"a": 2, "b": 0, "c": 0}, mutable = True)
+    m.PGmax = Param(m.G, initialize = {"a": 5, "b": 3, "c": 10}, mutable = True)
+    m.PD = Param(m.D, initialize = {"d": PD}, mutable = True)
+    m.pG = Var(m.G, domain = Reals)
+    m.u_g = Var(m.G, domain = Binary)
+    m.pD = Var(m.D, domain = Reals)
+    m.alpha = Var(m.D, domain = NonNegativeReals)
+    m.KCL_copperplate = Constraint(expr = sum(m.pG[g] for g in m.G) == sum(m.pD[d] for d in m.D))
+    m.demand_real_alpha_controlled = Constraint(m.D, rule = lambda m, d: m.pD[d] == m.alpha[d]*m.PD[d])
+    m.demand_alpha_max = Constraint(m.D, rule = lambda m, d: m.alpha[d] <= 1)
+    m.gen_uc_min = Constraint(m.G, rule = lambda m, g: m.pG[g] >= m.u_g[g]*m.PGmin[g])
+    m.gen_uc_max = Constraint(m.G, rule = lambda m, g: m.pG[g] <= m.u_g[g]*m.PGmax[g])
+    cost = {"a": (1, 4), "b": (3, 0), "c": (10, 0)}
+    m.OBJ = Objective(expr = sum(cost[g][0]*m.pG[g] + cost[g][1]*m.u_g[g] for g in m.G)
+                             + 1000*(1 - m.alpha["d"])*m.PD["d"], sense = minimize)
+    return m
+
+
+def test_merit_order_matches_mip_or_falls_back():
+    market = MeritOrderMarket()
+    for iteration, PD in enumerate([1, 6, 9, 20]):
+        mip = _instance(PD)
+        pyosolve.solveinstance(mip)
+        m = _instance(PD)
+        market.solve(m, iteration, lambda: pyosolve.solveinstance(m))
+        assert abs(value(m.OBJ) - value(mip.OBJ)) < 1e-6
+        assert abs(sum(m.pG[g].value for g in m.G) - m.pD["d"].value) < 1e-9
+
+    #A demand of 1 is met by b alone (a would run at its minimum of 2), which the LP bound, running a at 1,
+    #cannot certify. A demand of 20 sheds 2
+    records = market.to_dataframe()
+    assert list(records["path"]) == ["mip_gap"] + ["merit_order"]*3
+    assert records["heuristic_objective"][0] == 3
+    assert (records["lp_bound"] <= records["objective"] + 1e-9).all()
+
+
+def test_unsupported_stage_falls_back_to_mip():
+    m = _instance(6)
+    m.extra = Constraint(expr = m.pG["c"] >= 1)
+    market = MeritOrderMarket()
+    market.solve(m, 0, lambda: pyosolve.solveinstance(m))
+    assert market.records[0].path == "mip_unsupported" and abs(m.pG["c"].value - 1) < 1e-6
@@ -0,0 +1,30 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from data_io.load_case import Case
+from pyomo_models.build.muon_conditions import ConditionFlags, DemandCondition
+
+
+def test_flags_match_conditions_on_instance():
+    case = Case()
+    case.baseMVA = 100
+    case["demands"] = pd.DataFrame({"name": ["D1", "D2", "D3"], "real": [10.0, 20.0, 30.0]})
+    index = pd.Index(["t-1", "t-2", "t-3", "t-4"], name = "timestep")
+    #D3 is missing from t-1 (keeping its static demand) and t-3 (keeping that of t-2)
+    case["ts_PD"] = pd.DataFrame({"D1": [10.0, 50.0, 50.0, 10.0], "D3": [np.nan, 60.0, np.nan, 10.0]}, index = index)
+    case.iterations = index
+
+    conditions = {"ROI": DemandCondition("D_ROI", 0.6), "NI": DemandCondition("D_NI", 0.25)}
+    sets = {"D_ROI": ["D1", "D3"], "D_NI": ["D2"]}
+    flags = ConditionFlags.from_case(case, conditions, sets)
+
+    assert flags.to_dataframe()["ROI"].tolist() == [False, True, True, False]
+    assert flags.row("t-2") == {"ROI": True, "NI": False}
+    assert flags.groups().tolist() == [0, 1, 1, 0]
+
+    #The same conditions evaluated on the demand held by an instance in t-3
+    PD = {"D1": 0.5, "D2": 0.2, "D3": 0.6}
+    instance = SimpleNamespace(PD = {d: SimpleNamespace(value = v) for d, v in PD.items()}, **sets)
+    assert {name: condition(instance) for name, condition in conditions.items()} == flags.row("t-3")
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from pyomo_models.build.network import NetworkMatrices
+
+
+def test_network_incidence_matrices():
+    network = NetworkMatrices._from_lists(
+        ["b1", "b2", "b3"],
+        ["l1", "l2"], [("b1", "b2"), ("b2", "b3")], [0.1, 0.2],
+        ["t1"], [("b3", "b1")], [0.5],
+        ["g1"], ["b1"],
+        ["d1", "d2"], ["b3", "b3"],
+    )
+
+    np.testing.assert_array_equal(network.line_incidence().toarray(), [[1, 0], [-1, 1], [0, -1]])
+    np.testing.assert_array_equal(network.transformer_incidence().toarray(), [[-1], [0], [1]])
+    np.testing.assert_array_equal(network.generator_incidence().toarray(), [[1], [0], [0]])
+    np.testing.assert_array_equal(network.demand_incidence().toarray(), [[0, 0], [0, 0], [1, 1]])
+
+
+def test_ptdf_flows_satisfy_kirchhoff_laws_per_island():
+    #Ring b1-b2-b3 (with b1 as slack), and an island b4-b5 joined by a transformer
+    network = NetworkMatrices._from_lists(
+        ["b1", "b2", "b3", "b4", "b5"],
+        ["l1", "l2", "l3"], [("b1", "b2"), ("b2", "b3"), ("b3", "b1")], [0.1, 0.2, 0.4],
+        ["t1"], [("b4", "b5")], [0.5],
+        [], [],
+        [], [],
+    )
+    np.testing.assert_array_equal(network.references(0), [0, 0, 0, 3, 3])
+
+    ptdf_lines, ptdf_transformers = network.ptdf(0)
+    injections = np.array([-1.5, 1.0, 0.5, 2.0, -2.0])
+    line_flows, transformer_flows = ptdf_lines @ injections, ptdf_transformers @ injections
+
+    #KCL at every bus, and KVL around the ring
+    outflows = network.line_incidence() @ line_flows + network.transformer_incidence() @ transformer_flows
+    np.testing.assert_allclose(outflows, injections, atol=1e-12)
+    assert abs(line_flows @ network.line_reactance) < 1e-12
+
+    #A line out of service carries no flow, leaving a radial network
+    ptdf_lines, _ = network.ptdf(0, line_mask=[True, True, False])
+    np.testing.assert_allclose(ptdf_lines @ injections, [-1.5, -0.5, 0], atol=1e-12)
+
+
+def test_ptdf_cache_derives_outages_by_lodf():
+    #Meshed square b1-b2-b3-b4 with diagonal b1-b3
+    network = NetworkMatrices._from_lists(
+        ["b1", "b2", "b3", "b4"],
+        ["l1", "l2", "l3", "l4", "l5"], [("b1", "b2"), ("b2", "b3"), ("b3", "b4"), ("b4", "b1"), ("b1", "b3")],
+        [0.1, 0.2, 0.3, 0.4, 0.5],
+        [], [], [],
+        [], [],
+        [], [],
+    )
+    full = network.sensitivities(0)
+    assert network.sensitivities(0) is full
+
+    #Two lines out without splitting the network: LODF update matching a new factorisation
+    line_mask = np.array([True, False, True, True, False])
+    derived = network.sensitivities(0, line_mask)
+    np.testing.assert_allclose(derived.ptdf_lines, network.ptdf(0, line_mask)[0], atol=1e-12)
+
+    #Taking out l1 as well islands b2, which is factorised with its own reference
+    line_mask = np.array([False, False, True, True, False])
+    islanded = network.sensitivities(0, line_mask)
+    np.testing.assert_array_equal(islanded.references, [0, 1, 0, 0])
+    np.testing.assert_allclose(islanded.ptdf_lines, network.ptdf(0, line_mask)[0], atol=1e-12)
+
+    records = network.ptdf_cache.to_dataframe()
+    assert list(records["method"]) == ["factorised", "lodf", "factorised"]
+    assert list(records["hits"]) == [1, 0, 0]
+
+
+def test_topology_finds_islands_once_per_pattern():
+    #Chain b1-b2-b3, where taking out l2 islands b3
+    network = NetworkMatrices._from_lists(
+        ["b1", "b2", "b3"],
+        ["l1", "l2"], [("b1", "b2"), ("b2", "b3")], [0.1, 0.2],
+        [], [], [],
+        [], [],
+        [], [],
+    )
+    line_masks = np.array([[True, True], [True, False], [True, True]])
+    pattern, references = network.topology(0, line_masks, np.zeros((3, 0), dtype=bool))
+
+    assert pattern[0] == pattern[2] != pattern[1]
+    np.testing.assert_array_equal(references[pattern[0]], [0, 0, 0])
+    np.testing.assert_array_equal(references[pattern[1]], [0, 0, 2])
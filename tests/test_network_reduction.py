@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from data_io.load_case import Case
+from data_io.network_reduction import NetworkReduction
+
+
+def _case():
+    #a (slack, generator) - m1 - m2 - b (demand) in series, in parallel with a - b, and a spur m1 - s
+    case = Case()
+    case["busses"] = pd.DataFrame({"name": ["a", "m1", "m2", "b", "s"], "type": [3, 1, 1, 1, 1]})
+    case["generators"] = pd.DataFrame({"name": ["G1"], "busname": ["a"]})
+    case["demands"] = pd.DataFrame({"name": ["D1"], "busname": ["b"]})
+    case["branches"] = pd.DataFrame({"name": ["l1", "l2", "l3", "l4", "l5"],
+                                     "from_busname": ["a", "m2", "m2", "a", "m1"],
+                                     "to_busname": ["m1", "m1", "b", "b", "s"],
+                                     "r": [0.01, 0.02, 0.03, 0.04, 0.05], "x": [0.1, 0.2, 0.3, 0.4, 0.5],
+                                     "ShortTermRating": [120, 110, 130, 100, 100],
+                                     "ContinousRating": [100, 90, 110, 80, 80]})
+    case["transformers"] = pd.DataFrame({"name": [], "from_busname": [], "to_busname": [], "r": [], "x": [],
+                                         "ShortTermRating": [], "ContinousRating": []})
+    case["ts_Lmax"] = pd.DataFrame({"l1": [100, 100], "l2": [90, 0], "l3": [110, 110], "l4": [80, 80], "l5": [80, 80]},
+                                   index = ["t-1", "t-2"])
+    case["ts_TLmax"] = pd.DataFrame(index = ["t-1", "t-2"])
+    return case
+
+
+def test_reduction_collapses_series_branches_and_drops_spurs():
+    reduction = NetworkReduction(_case())
+    case = reduction.case
+
+    assert sorted(case.busses["name"]) == ["a", "b"]
+    assert list(case.branches["name"]) == ["l4", "l1+l2+l3"]
+    equivalent = case.branches.iloc[1]
+    assert (equivalent["from_busname"], equivalent["to_busname"]) == ("a", "b")
+    assert equivalent["x"] == pytest.approx(0.6)
+    assert equivalent["ContinousRating"] == 90
+    #Out of service wherever one of its members is
+    assert list(case.ts_Lmax["l1+l2+l3"]) == [90, 0]
+    assert list(reduction.summary()["removed"]) == [3, 3, 0]
+
+    #A solution of the reduced case, with flow 0.6 from a to b through the equivalent
+    cache = SimpleNamespace(pL = {"l4": 0.9, "l1+l2+l3": 0.6}, pLT = {}, delta = {"a": 0.0, "b": -0.36})
+    reduction.expand({"format": "iteration", "t-1": {"dcopf": cache}})
+    assert cache.pL == pytest.approx({"l1": 0.6, "l2": -0.6, "l3": 0.6, "l4": 0.9, "l5": 0.0})
+    assert cache.delta == pytest.approx({"a": 0.0, "m1": -0.06, "m2": -0.18, "b": -0.36, "s": -0.06})
+    #Each member's flow is its angle difference over its reactance
+    assert all(cache.deltaL[l] == pytest.approx(cache.pL[l]*x)
+               for l, x in zip(["l1", "l2", "l3", "l5"], [0.1, 0.2, 0.3, 0.5]))
@@ -0,0 +1,52 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+import pyomo_models.models.parallel_iterations as parallel_iterations
+from data_io.checkpoint import CheckpointStore
+
+FORK = multiprocessing.get_context("fork")
+
+
+def _objectives(result, iterations):
+    return [result[iteration][stage].problem.upper_bound for iteration in iterations
+            for stage in ("copper_market", "copper_curtailed", "dcopf")]
+
+
+def test_parallel_run_matches_serial_run(illustrative_case, tmp_path):
+    case = illustrative_case
+    case.iterations = case.iterations[:4]
+    #D3 rises in t-2, and is missing from t-3 so that t-3 carries over the demand of t-2
+    case.ts_PD.loc[["t-2", "t-3"], "D3"] = 120
+    serial_output, serial = all_island_iterations.model(case, "appsi_highs")
+    case.ts_PD.loc["t-3", "D3"] = np.nan
+
+    #The second worker is given t-3 and t-4, without having solved t-2
+    checkpoint = CheckpointStore(tmp_path / "checkpoint")
+    checkpoint.save("t-1", {"dcopf": serial_output["t-1"]["dcopf"]}, {"dcopf": "loaded"})
+    output, result = parallel_iterations.model(case, "appsi_highs", processes = 2, chunksize = 2, mp_context = FORK,
+                                               checkpoint = checkpoint)
+
+    assert list(output) == list(result) == ["format", "t-1", "t-2", "t-3", "t-4"]
+    assert result["t-1"] == {"dcopf": "loaded"}
+    assert output["t-3"]["dcopf"].PD["D3"] == pytest.approx(1.2)
+    solved = ["t-2", "t-3", "t-4"]
+    assert _objectives(result, solved) == pytest.approx(_objectives(serial, solved))
+    assert all(iteration in checkpoint for iteration in solved)
+    assert [output[t]["dcopf"].V_MUON for t in case.iterations] \
+        == pytest.approx([serial_output[t]["dcopf"].V_MUON for t in case.iterations])
+
+
+def test_single_process_runs_serially(illustrative_case, monkeypatch):
+    case = illustrative_case
+    case.iterations = case.iterations[:2]
+    def no_pool(*args, **kwargs):
+        raise AssertionError("A single process run should not start a pool")
+    monkeypatch.setattr(parallel_iterations, "ProcessPoolExecutor", no_pool)
+
+    output, result = parallel_iterations.model(case, "appsi_highs", processes = 1)
+    _, serial = all_island_iterations.model(case, "appsi_highs")
+    assert list(output) == ["format", "t-1", "t-2"]
+    assert _objectives(result, case.iterations) == pytest.approx(_objectives(serial, case.iterations))
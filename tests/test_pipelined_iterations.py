@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+import pyomo_models.models.pipelined_iterations as pipelined_iterations
+from data_io.checkpoint import CheckpointStore
+
+#Workers are forked, so that they see the stage models patched in by the failure tests
+FORK = multiprocessing.get_context("fork")
+
+
+def test_pipeline_matches_serial_run(illustrative_case, tmp_path):
+    case = illustrative_case
+    case.iterations = case.iterations[:3]
+    serial, _ = all_island_iterations.model(case, "appsi_highs")
+
+    checkpoint = CheckpointStore(tmp_path / "checkpoint")
+    checkpoint.save("t-2", {"dcopf": serial["t-2"]["dcopf"]}, {"dcopf": "loaded"})
+    output, result, timings = pipelined_iterations.run(case, "appsi_highs", mp_context = FORK, checkpoint = checkpoint)
+
+    assert list(output) == ["format", "t-1", "t-2", "t-3"]
+    assert result["t-2"] == {"dcopf": "loaded"}
+    assert [output[t]["dcopf"].obj for t in case.iterations] == pytest.approx([serial[t]["dcopf"].obj for t in case.iterations])
+    assert sorted(result["t-3"]) == sorted(pipelined_iterations.STAGES)
+    assert sorted(timings["iteration"].unique()) == ["t-1", "t-3"] and len(timings) == 6
+    assert "t-3" in checkpoint
+
+    #The volumes of the solved iterations are calculated as they arrive, so are saved with them
+    volumes = ("V_Surplus", "V_SNSP", "V_MUON", "V_Constraint")
+    saved = checkpoint.load("t-3")[0]["dcopf"]
+    assert [getattr(saved, v) for v in volumes] == pytest.approx([getattr(serial["t-3"]["dcopf"], v) for v in volumes])
+    assert [getattr(output[t]["dcopf"], v) for t in case.iterations for v in volumes] \
+        == pytest.approx([getattr(serial[t]["dcopf"], v) for t in case.iterations for v in volumes])
+
+
+def test_resumed_run_carries_over_loaded_iterations(illustrative_case, tmp_path):
+    case = illustrative_case
+    case.iterations = case.iterations[:3]
+    #D3 rises in t-2, and is missing from t-3 so that t-3 carries over the demand of t-2
+    case.ts_PD.loc[["t-2", "t-3"], "D3"] = 120
+    serial, serial_result = all_island_iterations.model(case, "appsi_highs")
+    case.ts_PD.loc["t-3", "D3"] = np.nan
+
+    #The run resumes with t-2 loaded, so no stage solves it
+    checkpoint = CheckpointStore(tmp_path / "checkpoint")
+    checkpoint.save("t-2", {"dcopf": serial["t-2"]["dcopf"]}, {"dcopf": "loaded"})
+    output, result, _ = pipelined_iterations.run(case, "appsi_highs", mp_context = FORK, checkpoint = checkpoint)
+
+    assert output["t-3"]["dcopf"].PD["D3"] == pytest.approx(1.2)
+    assert [result["t-3"][stage].problem.upper_bound for stage in pipelined_iterations.STAGES] \
+        == pytest.approx([serial_result["t-3"][stage].problem.upper_bound for stage in pipelined_iterations.STAGES])
+
+
+class _FailingStageModel:
+    def __init__(self, case, stage, solver, template = None):
+        if stage == "copper_curtailed":
+            raise ValueError("no model")
+
+
+class _KilledStageModel:
+    def __init__(self, case, stage, solver, template = None):
+        if stage == "dcopf":
+            os._exit(9)
+
+
+@pytest.mark.parametrize("stage_model, message", [(_FailingStageModel, "Stage copper_curtailed failed to build its model"),
+                                                  (_KilledStageModel, "The worker of stage dcopf exited with code 9")])
+def test_failed_worker_raises(illustrative_case, monkeypatch, stage_model, message):
+    monkeypatch.setattr(pipelined_iterations, "StageModel", stage_model)
+    with pytest.raises(RuntimeError, match = message):
+        pipelined_iterations.run(illustrative_case, "appsi_highs", mp_context = FORK)
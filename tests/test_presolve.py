@@ -0,0 +1,27 @@
+from pyomo.environ import ConcreteModel, Constraint, Set, Var
+
+from pyomo_models.build.presolve import Presolve
+
+
+def test_presolve_removes_duplicate_and_bound_rows():
+    m = ConcreteModel()
+    m.G = Set(initialize = ["g1", "g2", "g3"])
+    m.x = Var(m.G, bounds = (0, 10))
+    #Index independent rule: three copies of one row
+    m.system = Constraint(m.G, rule = lambda m, g: sum(m.x[h] for h in m.G) <= 12)
+    #Single variable rows: bounds, other than the row on two variables
+    m.caps = Constraint(["a", "b", "c"], rule = lambda m, i: {"a": 2*m.x["g1"] <= 8,
+                                                              "b": -m.x["g2"] <= -1,
+                                                              "c": m.x["g1"] + m.x["g3"] <= 9}[i])
+    m.caps.deactivate()
+
+    presolve = Presolve()
+    presolve.run(m, bounds = ["caps"])
+
+    assert len(m.system) == 1
+    assert list(m.caps) == ["c"] and not m.caps.active
+    assert (m.x["g1"].lb, m.x["g1"].ub) == (0, 4)
+    assert (m.x["g2"].lb, m.x["g2"].ub) == (1, 10)
+    records = presolve.to_dataframe()
+    assert list(records["reduction"]) == ["duplicate rows", "variable bounds"]
+    assert list(records["removed"]) == [2, 2]
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from data_io.load_case import Case
+from pyomo_models.models.representative_iterations import cluster
+
+
+def test_cluster_expand_and_report():
+    case = Case()
+    index = pd.Index([f"t-{i}" for i in range(1, 9)], name = "timestep")
+    demand = [100.0, 101.0, 99.0, 100.0, 500.0, 502.0, 498.0, 500.0]
+    case["ts_PD"] = pd.DataFrame({"D1": demand, "D2": np.array(demand)/2}, index = index)
+    case["ts_PGUB"] = pd.DataFrame({"G1": [50.0]*8}, index = index)
+    case["ts_Lmax"] = pd.DataFrame({"L1": [np.nan]*8}, index = index)
+    case.iterations = index
+
+    reduction = cluster(case, 2)
+
+    assert reduction.medoids == ["t-1", "t-5"]
+    assert sorted(reduction.weights) == [4, 4]
+    assert set(reduction.assignment[:4]) == {reduction.medoids[0]}
+
+    output, result = reduction.expand(case, {"format": "iteration"} | {m: m for m in reduction.medoids},
+                                      {"format": "iteration"} | {m: None for m in reduction.medoids})
+    assert [output[t] for t in index] == list(reduction.assignment)
+
+    report = reduction.report(case)
+    assert report.loc["ts_PGUB", "total MAE"] == 0
+    assert report.loc["ts_PD", "total max abs error"] == 3.0
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from data_io.load_case import Case
+from data_io.solve_cache import SolveCache, fingerprints
+
+
+def _case():
+    case = Case()
+    case["generators"] = pd.DataFrame({"name": ["G1", "G2"], "PGUB": [100.0, 50.0]})
+    case["ts_PD"] = pd.DataFrame({"D1": [10.0, 20.0, 30.0]}, index = ["t-1", "t-2", "t-3"])
+    case["ts_PGUB"] = pd.DataFrame({"G1": [100.0, 90.0, 90.0]}, index = ["t-1", "t-2", "t-3"])
+    case.iterations = case.ts_PD.index
+    return case
+
+
+def test_fingerprints_follow_inputs(tmp_path):
+    case = _case()
+    config = {"MUON_MW": ["S_MWMAX_NI_GT"], "limit": lambda instance: 1370/100}
+    base = fingerprints(case, config)
+    assert base == fingerprints(_case(), {"MUON_MW": ["S_MWMAX_NI_GT"], "limit": lambda instance: 1370/100})
+    assert base["t-2"] != base["t-3"]
+
+    #A changed ts row only affects its own timestep
+    case.ts_PD.loc["t-2", "D1"] = 25.0
+    changed = fingerprints(case, config)
+    assert [changed[t] == base[t] for t in case.iterations] == [True, False, True]
+
+    #A missing value takes the previous timestep's value
+    case.ts_PGUB.loc["t-3", "G1"] = np.nan
+    assert fingerprints(case, config)["t-3"] == changed["t-3"]
+
+    #Static data and constraint configuration affect every timestep
+    assert all(fingerprints(case, config | {"limit": lambda instance: 1400/100})[t] != changed[t] for t in case.iterations)
+    case.generators.loc[0, "PGUB"] = 120.0
+    assert all(fingerprints(case, config)[t] != changed[t] for t in case.iterations)
+
+    cache = SolveCache(tmp_path / "cache")
+    cache.save(base["t-1"], {"dcopf": 1}, {"dcopf": "ok"})
+    assert base["t-1"] in cache and cache.load(base["t-1"]) == ({"dcopf": 1}, {"dcopf": "ok"})
@@ -0,0 +1,50 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import pyomo_models.models.all_island_iterations_PSCC as all_island_iterations
+import pyomo_models.models.stage_major_iterations as stage_major_iterations
+
+FORK = multiprocessing.get_context("fork")
+
+
+def _objectives(result, iterations):
+    return [result[iteration][stage].problem.upper_bound for iteration in iterations for stage in stage_major_iterations.STAGES]
+
+
+def test_stage_major_run_matches_serial_run(illustrative_case):
+    case = illustrative_case
+    case.iterations = case.iterations[:3]
+    serial_output, serial = all_island_iterations.model(case, "appsi_highs")
+    output, result, solutions = stage_major_iterations.run(case, "appsi_highs")
+
+    #Stage results and outputs are keyed by iteration, then stage, as in all_island_iterations_PSCC
+    assert list(result) == list(serial) == ["format", "t-1", "t-2", "t-3"]
+    assert all(list(result[t]) == list(serial[t]) == list(stage_major_iterations.STAGES) for t in case.iterations)
+    assert list(output) == list(serial_output) and all(list(output[t]) == ["dcopf"] for t in case.iterations)
+    assert _objectives(result, case.iterations) == pytest.approx(_objectives(serial, case.iterations))
+
+    #Solutions are iterations x generators
+    generators = list(case.generators["name"])
+    assert list(solutions) == ["PG_MARKET", "UG_MARKET", "PG_SECURE", "UG_SECURE"]
+    for name, values in solutions.items():
+        assert values.shape == (3, 8)
+        assert list(values.index) == list(case.iterations) and list(values.columns) == generators
+    assert solutions["PG_SECURE"].loc["t-2"].to_dict() == pytest.approx(serial_output["t-2"]["dcopf"].PG_SECURE)
+
+
+def test_stage_major_processes_carry_over_the_case(illustrative_case):
+    case = illustrative_case
+    case.iterations = case.iterations[:4]
+    #D3 rises in t-2, and is missing from t-3 so that t-3 carries over the demand of t-2
+    case.ts_PD.loc[["t-2", "t-3"], "D3"] = 120
+    _, serial = all_island_iterations.model(case, "appsi_highs")
+    case.ts_PD.loc["t-3", "D3"] = np.nan
+
+    #The second worker of each stage is given t-3 and t-4, without having solved t-2
+    output, result, solutions = stage_major_iterations.run(case, "appsi_highs", processes = 2, chunksize = 2,
+                                                           mp_context = FORK)
+    assert output["t-3"]["dcopf"].PD["D3"] == pytest.approx(1.2)
+    assert _objectives(result, case.iterations) == pytest.approx(_objectives(serial, case.iterations))
+    assert solutions["PG_MARKET"].shape == (4, 8)
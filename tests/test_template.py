@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("pyomo")
+from pyomo.environ import ConcreteModel, Constraint, Param, Set, Var
+
+from pyomo_models.build.template import ModelTemplate
+
+
+def _builder(case):
+    model = ConcreteModel()
+    model.I = Set(initialize=case["I"])
+    model.p = Param(model.I, initialize=lambda m, i: 2 * i, mutable=True)
+    model.x = Var(model.I, bounds=lambda m, i: (0, i))
+    model.c = Constraint(model.I, rule=lambda m, i: m.x[i] >= m.p[i])
+    return model
+
+
+def test_template_clone_and_save_roundtrip(tmp_path):
+    template = ModelTemplate.build(_builder, {"I": [1, 2, 3]})
+
+    clone = template.clone()
+    clone.p[1] = 10
+    assert template.instance.p[1].value == 2
+
+    template.save(tmp_path / "model.template")
+    loaded = ModelTemplate.load(tmp_path / "model.template").clone()
+
+    assert sorted(loaded.I.data()) == [1, 2, 3]
+    assert loaded.p[3].value == 6
+    assert loaded.x[2].ub == 2
+    assert len(loaded.c) == 3
+    assert loaded.c[2].lower.value == 4
+    loaded.p[2] = 1
+    assert loaded.c[2].lower.value == 1
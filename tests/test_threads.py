@@ -0,0 +1,39 @@
+import os
+
+from pyomo.environ import ConcreteModel, Objective, Var
+
+import pyomo_models.build.pyosolve as pyosolve
+from pyomo_models.build.threads import BLAS_ENV_VARS, ThreadBudget, blas_environment, measure
+
+
+def test_split_and_candidates():
+    assert ThreadBudget.split(cores = 8) == ThreadBudget(8, 1)
+    assert ThreadBudget.split(cores = 8, solver_threads = 2) == ThreadBudget(4, 2)
+    assert ThreadBudget.split(cores = 8, processes = 3) == ThreadBudget(3, 2)
+    assert [(b.processes, b.solver_threads) for b in ThreadBudget.candidates(cores = 4)] == [(1, 4), (2, 2), (4, 1)]
+
+
+def test_blas_environment_restores_variables():
+    before = {name: os.environ.get(name) for name in BLAS_ENV_VARS}
+    with blas_environment(1):
+        assert all(os.environ[name] == "1" for name in BLAS_ENV_VARS)
+    assert {name: os.environ.get(name) for name in BLAS_ENV_VARS} == before
+
+
+def test_apply_sets_solver_threads_and_measure():
+    m = ConcreteModel()
+    m.x = Var(bounds = (1, 2))
+    m.OBJ = Objective(expr = m.x)
+
+    def run(budget):
+        budget.apply()
+        pyosolve.solveinstance(m)
+
+    try:
+        report = measure(run, [ThreadBudget(1, 1), ThreadBudget(1, 2)], iterations = 1)
+        assert pyosolve.solver_threads == 2
+    finally:
+        pyosolve.set_solver_threads(None)
+    assert m.x.value == 1
+    assert sorted(report["solver_threads"]) == [1, 2]
+    assert (report["iterations_per_s"] > 0).all()
@@ -0,0 +1,21 @@
+from pyomo_models.build.warmstart import WarmStartManager, start_accepted
+
+
+def test_start_accepted_reads_highs_log():
+    assessed = "Assessing feasibility of MIP using primal feasibility and integrality tolerance of 1e-06"
+    assert start_accepted([assessed, "MIP start solution is feasible, objective value is -12.5"]) == (True, -12.5)
+    assert start_accepted([assessed, "Attempting to find feasible solution by solving LP"]) == (False, None)
+    assert start_accepted(["Solving LP without presolve"]) == (None, None)
+
+
+def test_record_summary():
+    warmstart = WarmStartManager()
+    for stage in ("copper_market", "dcopf"):
+        with warmstart.record("t-1", stage, seeded = stage == "dcopf") as lines:
+            lines.append("Assessing feasibility of MIP")
+            lines.append("MIP start solution is feasible, objective value is 3")
+
+    summary = warmstart.summary()
+    assert list(summary.index) == ["copper_market", "dcopf"]
+    assert summary.loc["dcopf", "seeded"] == 1
+    assert summary.loc["copper_market", "accepted"] == 1